@@ -1,16 +1,93 @@
+import time
+
+# Момент запуска процесса - для отчета о времени старта
+PROCESS_STARTED_AT = time.monotonic()
+
 import os
 import json
-from typing import List, Dict, Any
-from fastapi import FastAPI
+import uuid
+import asyncio
+import hashlib
+from datetime import datetime
+import threading
+from collections import OrderedDict
+from contextlib import asynccontextmanager
+from typing import List, Dict, Any, Optional
+from fastapi import FastAPI, Query, Request, WebSocket, WebSocketDisconnect
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import StreamingResponse, JSONResponse, Response
 from fastapi.middleware.cors import CORSMiddleware
 from pydantic import BaseModel
-from src.model_analyze import save_models_results
-from src.model_summarize import save_summarized_result
-from src.model_improve import improve_analysis_with_user_query
-from src.prompts import get_product_analysis_prompt
+from src.model_analyze import iter_models_results, get_models_status, OPENROUTER_MODELS
+from src.model_summarize import save_summarized_result, stream_summarized_result, SUMMARY_MODE
+from src.model_improve import improve_analysis_with_user_query, stream_improved_analysis
+from src.prompts import get_product_analysis_prompt, get_analysis_data_digest, BASE_BANK
+from src.dataset import (
+    get_dataset, get_dataset_version, get_dataset_changes, get_comparison_data_for_criteria,
+    get_numeric_comparison_data, get_numeric_aggregates, add_dataset_listener, changes_affect
+)
+from src.result_cache import ResultCache, make_cache_key, RESULT_CACHE_SIZE
+from src.provider_health import get_providers_snapshot
+from src.single_flight import SingleFlight
+from src.store import get_history, sync_dataset
+from src.jobs import JobManager, JobQueueFullError, DONE as JOB_DONE, ERROR as JOB_ERROR
+from src.providers import registry as provider_registry, READY as PROVIDER_READY
 import re
 
-app = FastAPI()
+# Сколько заняли импорты модулей приложения
+IMPORT_SECONDS = round(time.monotonic() - PROCESS_STARTED_AT, 3)
+
+# Кэш результатов анализа моделей и суммаризации
+result_cache = ResultCache()
+
+# Сравнения, результаты которых лежат в кэше: параметры -> ключи записей кэша.
+# По ним при изменении данных сбрасываются только затронутые анализы
+cached_comparisons: "OrderedDict[str, Dict[str, Any]]" = OrderedDict()
+cached_comparisons_lock = threading.Lock()
+
+# Пересчитывать ли затронутые изменением данных сравнения в фоне (иначе только сброс)
+DATASET_RECOMPUTE = os.getenv("DATASET_RECOMPUTE", "0") == "1"
+
+# Сохранять ли каждую загруженную версию данных снимком в хранилище продуктов (src/store.py)
+PRODUCT_STORE_SYNC = os.getenv("PRODUCT_STORE_SYNC", "1") == "1"
+
+# Итог обработки последнего изменения данных (см. /api/dataset/changes)
+dataset_refresh_report: Dict[str, Any] = {"invalidated": 0, "recomputed": 0, "kept": 0}
+
+# Сессии анализа: результаты моделей хранятся на сервере, клиент получает только id
+ANALYSIS_SESSION_SIZE = int(os.getenv("ANALYSIS_SESSION_SIZE", "1000"))
+ANALYSIS_SESSION_TTL = float(os.getenv("ANALYSIS_SESSION_TTL", "3600"))
+analysis_sessions = ResultCache(max_size=ANALYSIS_SESSION_SIZE, ttl=ANALYSIS_SESSION_TTL, cache_dir="")
+
+# Объединение одинаковых одновременных сравнений
+comparison_flight = SingleFlight()
+
+# Как часто websocket проверяет состояние задачи, сек.
+JOB_POLL_INTERVAL = 0.5
+
+# Сколько браузер и nginx могут отдавать данные сравнения без ревалидации, сек.
+COMPARISON_MAX_AGE = int(os.getenv("COMPARISON_MAX_AGE", "60"))
+
+# Отчет о времени старта (см. /ready)
+startup_report = {"importSeconds": IMPORT_SECONDS, "startupSeconds": None}
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """Запускает фоновые задачи и прогрев провайдеров; при остановке всё закрывает.
+
+    Прогрев идет в фоне: процесс сразу начинает принимать запросы, а
+    готовность провайдеров отражается в /ready.
+    """
+    job_manager.start()
+    provider_registry.start_warm_up()
+    start_product_store_sync()
+    startup_report["startupSeconds"] = round(time.monotonic() - PROCESS_STARTED_AT, 3)
+    print(f"=== Старт приложения: импорты {IMPORT_SECONDS} с, всего {startup_report['startupSeconds']} с ===")
+    yield
+    job_manager.stop()
+    provider_registry.close_all()
+
+app = FastAPI(lifespan=lifespan)
 
 app.add_middleware(
     CORSMiddleware,
@@ -33,72 +110,287 @@ def fix_json_trailing_commas(text):
     fixed_text = re.sub(r',\s*]', ']', fixed_text)
     return fixed_text
 
-def load_analysis_data() -> Dict[str, Any]:
-    """Загружает данные из analysis_data.json"""
-    data_path = os.path.join(os.path.dirname(__file__), "src", "data", "analysis_data.json")
-    with open(data_path, 'r', encoding='utf-8') as f:
-        return json.load(f)
+def extract_response_text(result_dict) -> str:
+    """Извлекает текст ответа модели из словаря результата"""
+    if isinstance(result_dict, dict):
+        return result_dict.get('response', 'Результат не получен')
+    return fix_json_trailing_commas(str(result_dict))
 
-def get_comparison_data_for_criteria(banks: List[str], criteria: List[str]) -> Dict[str, Dict[str, Any]]:
-    """Извлекает данные для выбранных банков и критериев из JSON"""
-    analysis_data = load_analysis_data()
-    comparison_table = analysis_data.get("comparison_table", [])
-    
-    result = {}
-    
-    for criterion in criteria:
-        # Ищем критерий в таблице (может быть "criteria" или "criterion")
-        criterion_data = None
-        
-        # Нормализуем название критерия для поиска
-        criterion_normalized = criterion.replace("(", "").replace(")", "").strip().lower()
-        
-        for item in comparison_table:
-            criterion_name = item.get("criteria") or item.get("criterion")
-            if criterion_name:
-                # Нормализуем название из JSON
-                criterion_name_normalized = criterion_name.replace("(", "").replace(")", "").strip().lower()
-                # Проверяем совпадение
-                if (criterion_normalized in criterion_name_normalized or 
-                    criterion_name_normalized in criterion_normalized or
-                    criterion in criterion_name or 
-                    criterion_name in criterion):
-                    criterion_data = item.get("info", {})
+def format_sse_event(event: str, data: Any) -> str:
+    """Формирует событие в формате Server-Sent Events"""
+    return f"event: {event}\ndata: {json.dumps(data, ensure_ascii=False)}\n\n"
+
+def iter_cached_models_results(card_types: List[str], banks: List[str], criteria: List[str],
+                               deadline: Optional[float] = None, quorum: Optional[int] = None):
+    """
+    Отдает результаты моделей из кэша или запускает анализ и сохраняет его в кэш.
+
+    В кэш попадает только полный анализ: ответили все модели. Ответ по кворуму
+    или дедлайну (с опоздавшими моделями) не кэшируется, иначе следующие
+    запросы без deadline/quorum получали бы неполный анализ.
+    """
+    # Ключ зависит только от данных выбранных банков и критериев: изменение
+    # других ячеек не сбрасывает этот анализ
+    key = make_cache_key("analysis", card_types, banks, criteria,
+                         get_analysis_data_digest(banks, card_types, criteria))
+    cached = result_cache.get(key)
+    if cached is not None:
+        print("=== Результаты анализа взяты из кэша ===")
+        yield from enumerate(cached)
+        return
+
+    prompt = get_product_analysis_prompt(banks, card_types, criteria)
+    models_results = [None] * (len(OPENROUTER_MODELS) + 1)
+    for index, result in iter_models_results(prompt, deadline, quorum):
+        models_results[index] = result
+        yield index, result
+
+    models_status = get_models_status(models_results)
+    if len(models_status["completed"]) == len(models_results):
+        result_cache.set(key, models_results)
+        track_cached_comparison(card_types, banks, criteria, key)
+
+def iter_coalesced_models_results(card_types: List[str], banks: List[str], criteria: List[str],
+                                  deadline: Optional[float] = None, quorum: Optional[int] = None):
+    """
+    iter_cached_models_results, объединенный для одновременных одинаковых сравнений.
+
+    /api/params, /api/params/stream и задачи с теми же параметрами делят один
+    анализ моделями: каждый получает результаты моделей по мере готовности.
+    """
+    key = make_cache_key(
+        "analysis-flight", card_types, banks, criteria,
+        f"{get_analysis_data_digest(banks, card_types, criteria)}:{deadline}:{quorum}"
+    )
+    yield from comparison_flight.stream(
+        key, iter_cached_models_results, card_types, banks, criteria, deadline, quorum
+    )
+
+def track_cached_comparison(card_types: List[str], banks: List[str], criteria: List[str], key: str):
+    """Запоминает ключ кэша сравнения, чтобы сбросить его при изменении его данных"""
+    comparison_key = make_cache_key("comparison", card_types, banks, criteria, "")
+    with cached_comparisons_lock:
+        entry = cached_comparisons.setdefault(comparison_key, {
+            "cardType": list(card_types), "banks": list(banks), "criteria": list(criteria), "keys": set()
+        })
+        entry["keys"].add(key)
+        cached_comparisons.move_to_end(comparison_key)
+        while len(cached_comparisons) > RESULT_CACHE_SIZE:
+            cached_comparisons.popitem(last=False)
+
+def sync_product_store():
+    """Сохраняет текущую версию данных снимком в хранилище продуктов (для /api/history)"""
+    index = get_dataset()
+    try:
+        sync_dataset(index.data, index.version)
+    except Exception as e:
+        print(f"Не удалось сохранить снимок данных в хранилище: {type(e).__name__}: {e}")
+
+def start_product_store_sync(changes: Optional[Dict[str, Any]] = None):
+    """Запускает sync_product_store в фоне, чтобы не задерживать старт и запросы"""
+    if PRODUCT_STORE_SYNC:
+        threading.Thread(target=sync_product_store, name="product-store-sync", daemon=True).start()
+
+def handle_dataset_changes(changes: Dict[str, Any]):
+    """
+    Сбрасывает кэш сравнений, в данные которых попали измененные ячейки.
+
+    Остальные записи остаются действительными: их ключ строится по отпечатку
+    данных выбранных банков и критериев, который не изменился. При
+    DATASET_RECOMPUTE=1 затронутые сравнения пересчитываются фоновыми задачами.
+    """
+    with cached_comparisons_lock:
+        entries = list(cached_comparisons.items())
+
+    affected = [
+        (comparison_key, entry) for comparison_key, entry in entries
+        if changes_affect(changes, [BASE_BANK] + entry["banks"], entry["criteria"])
+    ]
+    recomputed = 0
+    for comparison_key, entry in affected:
+        with cached_comparisons_lock:
+            cached_comparisons.pop(comparison_key, None)
+        for key in entry["keys"]:
+            result_cache.invalidate(key)
+        if DATASET_RECOMPUTE:
+            try:
+                job_manager.submit(ComparisonRequest(
+                    cardType=entry["cardType"], banks=entry["banks"], criteria=entry["criteria"]
+                ))
+                recomputed += 1
+            except JobQueueFullError:
+                print("=== Очередь задач переполнена, пересчет отложен до первого запроса ===")
+
+    dataset_refresh_report.update({
+        "invalidated": len(affected),
+        "recomputed": recomputed,
+        "kept": len(entries) - len(affected),
+    })
+    print(f"=== Изменение данных: сброшено сравнений {len(affected)}, "
+          f"поставлено на пересчет {recomputed}, сохранено {len(entries) - len(affected)} ===")
+
+def create_analysis_session(models_results_list: List[str]) -> str:
+    """Сохраняет результаты анализа моделей и возвращает непрозрачный id сессии"""
+    analysis_id = uuid.uuid4().hex
+    analysis_sessions.set(analysis_id, models_results_list)
+    return analysis_id
+
+def summary_cache_key(card_types: List[str], banks: List[str], criteria: List[str],
+                      models_results_list: List[str], summary_mode: Optional[str] = None) -> str:
+    """Ключ кэша суммаризации: режим, параметры сравнения и отпечаток результатов анализа"""
+    analysis_digest = hashlib.sha256("".join(models_results_list).encode("utf-8")).hexdigest()
+    return make_cache_key(f"summary:{summary_mode or SUMMARY_MODE}", card_types, banks, criteria, analysis_digest)
+
+def get_session_results(request) -> List[str]:
+    """Результаты анализа для /api/improve: из сессии или из запроса для старых клиентов"""
+    if request.analysisId:
+        models_analysis_results = analysis_sessions.get(request.analysisId)
+        if models_analysis_results is None:
+            raise ValueError("сессия анализа не найдена или истекла, выполните сравнение заново")
+        return models_analysis_results
+    if request.modelsAnalysisResults:
+        return request.modelsAnalysisResults
+    raise ValueError("не передан analysisId")
+
+async def forward_events(http_request: Request, events, cancel_event: threading.Event):
+    """
+    Отдает клиенту события синхронного генератора, который выполняется в отдельном потоке.
+
+    При отключении клиента устанавливается cancel_event, а генератор
+    закрывается: потоковый запрос к провайдеру обрывается, и генерация
+    останавливается.
+    """
+    loop = asyncio.get_running_loop()
+    queue: asyncio.Queue = asyncio.Queue()
+
+    def produce():
+        try:
+            for event in events:
+                if cancel_event.is_set():
                     break
-        
-        if criterion_data:
-            result[criterion] = {}
-            for bank in banks:
-                # Ищем точное совпадение или частичное
-                bank_value = None
-                for bank_key, value in criterion_data.items():
-                    # Нормализуем названия банков для сравнения
-                    bank_normalized = bank.lower().strip()
-                    bank_key_normalized = bank_key.lower().strip()
-                    if (bank_normalized in bank_key_normalized or 
-                        bank_key_normalized in bank_normalized or
-                        bank in bank_key or 
-                        bank_key in bank):
-                        bank_value = value
-                        break
-                
-                result[criterion][bank] = bank_value if bank_value is not None else "Нет данных"
-        else:
-            # Если критерий не найден, заполняем пустыми значениями
-            result[criterion] = {bank: "Нет данных" for bank in banks}
-    
-    return result
+                loop.call_soon_threadsafe(queue.put_nowait, event)
+        finally:
+            # Закрытие генератора закрывает и вложенный потоковый запрос
+            events.close()
+            loop.call_soon_threadsafe(queue.put_nowait, None)
+
+    threading.Thread(target=produce, daemon=True).start()
+    try:
+        while True:
+            event = await queue.get()
+            if event is None:
+                break
+            if await http_request.is_disconnected():
+                print("=== Клиент отключился, отменяем генерацию ===")
+                break
+            yield event
+    finally:
+        cancel_event.set()
+
+def run_summarization(card_types: List[str], banks: List[str], criteria: List[str],
+                      models_results_list: List[str], summary_mode: Optional[str] = None):
+    """Возвращает суммаризацию из кэша или строит её выбранным способом"""
+    key = summary_cache_key(card_types, banks, criteria, models_results_list, summary_mode)
+    cached = result_cache.get(key)
+    if cached is not None:
+        print("=== Итоговый результат взят из кэша ===")
+        return cached
+
+    summarized_result_dict = save_summarized_result(models_results_list, summary_mode)
+    if isinstance(summarized_result_dict, dict) and summarized_result_dict.get("status_code") == 200:
+        result_cache.set(key, summarized_result_dict)
+        track_cached_comparison(card_types, banks, criteria, key)
+    return summarized_result_dict
 
 # Модель данных для запроса
 class ComparisonRequest(BaseModel):
     cardType: List[str]
     banks: List[str]
     criteria: List[str]
+    deadline: Optional[float] = None  # Бюджет времени на анализ моделями, сек.
+    quorum: Optional[int] = None  # Сколько успешных ответов моделей достаточно
+    summaryMode: Optional[str] = None  # Режим суммаризации: remote, local или auto
 
 # Модель данных для запроса пользователя
 class UserQueryRequest(BaseModel):
     userQuery: str
-    modelsAnalysisResults: List[str]  # Результаты анализа от моделей
+    analysisId: Optional[str] = None  # id сессии анализа из ответа /api/params
+    modelsAnalysisResults: Optional[List[str]] = None  # Результаты анализа от моделей (устаревший способ)
+
+def run_comparison(card_types: List[str], banks: List[str], criteria: List[str],
+                   deadline: Optional[float] = None, quorum: Optional[int] = None,
+                   summary_mode: Optional[str] = None) -> Dict[str, Any]:
+    """
+    Выполняет полный пайплайн сравнения: анализ моделями, суммаризацию
+    и выборку данных для графика. Возвращает поле data ответа /api/params.
+    """
+    # Запускаем анализ моделей (или берем его из кэша)
+    print("=== Запуск анализа моделей ===")
+    models_results = [None] * (len(OPENROUTER_MODELS) + 1)
+    for index, result in iter_coalesced_models_results(card_types, banks, criteria, deadline, quorum):
+        models_results[index] = result
+    models_status = get_models_status(models_results)
+    
+    # Преобразуем результаты в список строк для передачи на фронтенд
+    models_results_list = [str(result) for result in models_results]
+    
+    # Получаем суммаризированный результат
+    print("=== Генерация итогового результата ===")
+    summarized_result_dict = run_summarization(
+        card_types, banks, criteria, models_results_list, summary_mode
+    )
+    
+    # Извлекаем текст ответа из словаря
+    summarized_result = extract_response_text(summarized_result_dict)
+    
+    print("=== Анализ завершен ===")
+    print(f"Результат: {summarized_result[:200]}...")  # Выводим первые 200 символов
+
+    # Загружаем данные для графика из JSON
+    print("=== Загрузка данных для графика ===")
+    comparison_data = get_comparison_data_for_criteria(banks, criteria)
+
+    return {
+        "cardTypes": card_types,
+        "banks": banks,
+        "criteria": criteria,
+        "summarizedResult": summarized_result,  # Передаем результат на фронтенд
+        "comparisonData": comparison_data,  # Данные для графика и таблицы
+        "comparisonNumeric": get_numeric_comparison_data(banks, criteria),  # Разобранные числовые значения
+        "modelsAnalysisResults": models_results_list,  # Результаты анализа моделей
+        "modelsStatus": models_status,  # Какие модели ответили, упали или опоздали
+        "analysisId": create_analysis_session(models_results_list)  # Сессия для /api/improve
+    }
+
+def run_coalesced_comparison(card_types: List[str], banks: List[str], criteria: List[str],
+                             deadline: Optional[float] = None, quorum: Optional[int] = None,
+                             summary_mode: Optional[str] = None) -> Dict[str, Any]:
+    """
+    Выполняет run_comparison, объединяя одновременные запросы с одинаковыми параметрами.
+
+    Порядок банков, критериев и типов карт не важен: ключ строится по каноническому виду.
+    """
+    key = make_cache_key(
+        "comparison", card_types, banks, criteria,
+        f"{get_analysis_data_digest(banks, card_types, criteria)}:{deadline}:{quorum}:{summary_mode}"
+    )
+    return comparison_flight.do(
+        key, run_comparison, card_types, banks, criteria, deadline, quorum, summary_mode
+    )
+
+def run_comparison_job(request: ComparisonRequest) -> Dict[str, Any]:
+    """Обработчик фоновой задачи сравнения"""
+    return run_coalesced_comparison(
+        request.cardType, request.banks, request.criteria,
+        request.deadline, request.quorum, request.summaryMode
+    )
+
+# Очередь фоновых задач сравнения
+job_manager = JobManager(run_comparison_job)
+
+# Точечный сброс кэша и новый снимок в хранилище при изменении analysis_data.json
+add_dataset_listener(handle_dataset_changes)
+add_dataset_listener(start_product_store_sync)
 
 # Эндпоинт для сравнения продуктов
 @app.post("/api/params")
@@ -112,57 +404,18 @@ async def compare_products(request: ComparisonRequest):
         print(f"Банки: {request.banks}")
         print(f"Критерии: {request.criteria}")
 
-        # Преобразуем в массивы Python
-        card_types = request.cardType
-        banks = request.banks
-        criteria = request.criteria
-
-        # Генерируем промпт для анализа
-        prompt = get_product_analysis_prompt(banks, card_types, criteria)
-        
-        # Запускаем анализ моделей
-        print("=== Запуск анализа моделей ===")
-        models_analysis_results = save_models_results(prompt)
-        
-        # Преобразуем результаты в список строк для передачи на фронтенд
-        models_results_list = []
-        if isinstance(models_analysis_results, list):
-            models_results_list = [str(result) if not isinstance(result, str) else result for result in models_analysis_results]
-        else:
-            models_results_list = [str(models_analysis_results)]
-        
-        # Получаем суммаризированный результат
-        print("=== Генерация итогового результата ===")
-        summarized_result_dict = save_summarized_result(models_analysis_results)
-        
-        # Извлекаем текст ответа из словаря
-        if isinstance(summarized_result_dict, dict):
-            summarized_result = summarized_result_dict.get('response', 'Результат не получен')
-        else:
-            summarized_result = str(summarized_result_dict)
-            summarized_result = fix_json_trailing_commas(summarized_result)
-    
-    
-        
-        print("=== Анализ завершен ===")
-        print(f"Результат: {summarized_result[:200]}...")  # Выводим первые 200 символов
-
-        # Загружаем данные для графика из JSON
-        print("=== Загрузка данных для графика ===")
-        comparison_data = get_comparison_data_for_criteria(banks, criteria)
+        # Пайплайн блокирующий - выполняем его вне event loop
+        data = await run_in_threadpool(
+            run_coalesced_comparison,
+            request.cardType, request.banks, request.criteria,
+            request.deadline, request.quorum, request.summaryMode
+        )
 
         # Возвращаем успешный ответ с результатом
         return {
             "status": "success",
             "message": "Анализ успешно выполнен",
-            "data": {
-                "cardTypes": card_types,
-                "banks": banks,
-                "criteria": criteria,
-                "summarizedResult": summarized_result,  # Передаем результат на фронтенд
-                "comparisonData": comparison_data,  # Данные для графика и таблицы
-                "modelsAnalysisResults": models_results_list  # Результаты анализа для улучшения
-            }
+            "data": data
         }
     
     except Exception as e:
@@ -182,13 +435,167 @@ async def compare_products(request: ComparisonRequest):
             }
         }
 
+# Эндпоинт для запуска сравнения в фоне
+@app.post("/api/jobs", status_code=202)
+async def create_comparison_job(request: ComparisonRequest):
+    """
+    Ставит сравнение в очередь и сразу возвращает id задачи
+    """
+    try:
+        job_id = job_manager.submit(request)
+    except JobQueueFullError as e:
+        return JSONResponse(status_code=503, content={
+            "status": "error",
+            "message": str(e)
+        })
+
+    return {
+        "status": "accepted",
+        "message": "Задача поставлена в очередь",
+        "data": {
+            "jobId": job_id,
+            "statusUrl": f"/api/jobs/{job_id}",
+            "websocketUrl": f"/api/jobs/{job_id}/ws"
+        }
+    }
+
+@app.get("/api/jobs/{job_id}")
+async def get_comparison_job(job_id: str):
+    """
+    Возвращает состояние задачи и, если она завершена, результат
+    """
+    job = job_manager.get(job_id)
+    if job is None:
+        return JSONResponse(status_code=404, content={
+            "status": "error",
+            "message": "Задача не найдена"
+        })
+    return {
+        "status": "success",
+        "data": job
+    }
+
+@app.websocket("/api/jobs/{job_id}/ws")
+async def watch_comparison_job(websocket: WebSocket, job_id: str):
+    """
+    Присылает состояние задачи при каждом изменении и закрывается после её завершения
+    """
+    await websocket.accept()
+    last_status = None
+    try:
+        while True:
+            job = job_manager.get(job_id)
+            if job is None:
+                await websocket.send_json({"status": "error", "message": "Задача не найдена"})
+                break
+            if job["status"] != last_status:
+                last_status = job["status"]
+                await websocket.send_json({"status": "success", "data": job})
+            if job["status"] in (JOB_DONE, JOB_ERROR):
+                break
+            await asyncio.sleep(JOB_POLL_INTERVAL)
+        await websocket.close()
+    except WebSocketDisconnect:
+        pass
+
+def stream_comparison_events(card_types: List[str], banks: List[str], criteria: List[str],
+                             deadline: Optional[float] = None, quorum: Optional[int] = None,
+                             summary_mode: Optional[str] = None,
+                             cancel_event: Optional[threading.Event] = None):
+    """
+    Генератор SSE-событий для потокового сравнения.
+
+    Порядок событий:
+        - comparisonData   - данные для графика и таблицы (без LLM, сразу);
+        - modelResult      - анализ очередной модели по мере готовности;
+        - summaryDelta     - очередной фрагмент итогового отчета (если его нет в кэше);
+        - summarizedResult - итоговый результат;
+        - done / error     - завершение потока.
+    """
+    try:
+        comparison_data = get_comparison_data_for_criteria(banks, criteria)
+        yield format_sse_event("comparisonData", comparison_data)
+
+        print("=== Запуск анализа моделей (поток) ===")
+        models_results = [None] * (len(OPENROUTER_MODELS) + 1)
+        models_results_list = [None] * (len(OPENROUTER_MODELS) + 1)
+        for index, result in iter_coalesced_models_results(card_types, banks, criteria, deadline, quorum):
+            models_results[index] = result
+            models_results_list[index] = str(result)
+            yield format_sse_event("modelResult", {
+                "index": index,
+                "model": result["model"],
+                "statusCode": result["status_code"],
+                "result": models_results_list[index]
+            })
+
+        print("=== Генерация итогового результата (поток) ===")
+        key = summary_cache_key(card_types, banks, criteria, models_results_list, summary_mode)
+        summarized_result_dict = result_cache.get(key)
+        if summarized_result_dict is None:
+            for event, payload in stream_summarized_result(models_results_list, summary_mode, cancel_event):
+                if event == "delta":
+                    yield format_sse_event("summaryDelta", {"text": payload})
+                else:
+                    summarized_result_dict = payload
+            if summarized_result_dict.get("status_code") == 200:
+                result_cache.set(key, summarized_result_dict)
+                track_cached_comparison(card_types, banks, criteria, key)
+        else:
+            print("=== Итоговый результат взят из кэша ===")
+        summarized_result = extract_response_text(summarized_result_dict)
+        yield format_sse_event("summarizedResult", {
+            "summarizedResult": summarized_result,
+            "modelsAnalysisResults": models_results_list,
+            "modelsStatus": get_models_status(models_results),
+            "analysisId": create_analysis_session(models_results_list)
+        })
+        yield format_sse_event("done", {"status": "success"})
+
+    except Exception as e:
+        print(f"=== ОШИБКА ===")
+        print(f"Тип ошибки: {type(e).__name__}")
+        print(f"Сообщение: {str(e)}")
+        yield format_sse_event("error", {
+            "status": "error",
+            "message": f"Произошла ошибка при анализе: {str(e)}"
+        })
+
+# Потоковый вариант эндпоинта сравнения (Server-Sent Events)
+@app.post("/api/params/stream")
+async def compare_products_stream(request: ComparisonRequest, http_request: Request):
+    """
+    То же, что /api/params, но отдает результаты по мере готовности
+    """
+    print("=== Получены данные (поток) ===")
+    print(f"Типы карт: {request.cardType}")
+    print(f"Банки: {request.banks}")
+    print(f"Критерии: {request.criteria}")
+
+    cancel_event = threading.Event()
+    return StreamingResponse(
+        forward_events(http_request, stream_comparison_events(
+            request.cardType, request.banks, request.criteria,
+            request.deadline, request.quorum, request.summaryMode, cancel_event
+        ), cancel_event),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
 @app.get("/")
 async def read_root():
     return {
         "message": "ИИ-Агент",
         "version": "1.0",
         "endpoints": {
-            "compare": "/api/params (POST)"
+            "compare": "/api/params (POST)",
+            "compare_stream": "/api/params/stream (POST, text/event-stream)",
+            "compare_job": "/api/jobs (POST), /api/jobs/{id} (GET), /api/jobs/{id}/ws (WebSocket)",
+            "comparison": "/api/comparison?banks=...&criteria=...&cardType=... (GET, ETag)",
+            "datasetChanges": "/api/dataset/changes (GET)",
+            "history": "/api/history?bank=...&criterion=...&since=... (GET)",
+            "improve": "/api/improve (POST)",
+            "improve_stream": "/api/improve/stream (POST, text/event-stream)"
         }
     }
 
@@ -200,21 +607,21 @@ async def improve_analysis(request: UserQueryRequest):
     try:
         print("=== Получен запрос пользователя ===")
         print(f"Запрос: {request.userQuery}")
-        print(f"Количество результатов анализа: {len(request.modelsAnalysisResults)}")
+
+        # Берем результаты анализа из сессии (или из запроса для старых клиентов)
+        models_analysis_results = get_session_results(request)
+        print(f"Количество результатов анализа: {len(models_analysis_results)}")
         
         # Улучшаем анализ на основе запроса пользователя
         print("=== Улучшение анализа ===")
-        improved_result_dict = improve_analysis_with_user_query(
-            request.modelsAnalysisResults,
+        improved_result_dict = await run_in_threadpool(
+            improve_analysis_with_user_query,
+            models_analysis_results,
             request.userQuery
         )
         
         # Извлекаем текст ответа из словаря
-        if isinstance(improved_result_dict, dict):
-            improved_result = improved_result_dict.get('response', 'Результат не получен')
-        else:
-            improved_result = str(improved_result_dict)
-            improved_result = fix_json_trailing_commas(improved_result)
+        improved_result = extract_response_text(improved_result_dict)
         
         print("=== Улучшение завершено ===")
         print(f"Результат: {improved_result[:200]}...")
@@ -240,10 +647,168 @@ async def improve_analysis(request: UserQueryRequest):
             }
         }
 
+def stream_improve_events(models_analysis_results: List[str], user_query: str,
+                          cancel_event: Optional[threading.Event] = None):
+    """
+    Генератор SSE-событий для потокового улучшения анализа.
+
+    Порядок событий:
+        - improveDelta   - очередной фрагмент ответа;
+        - improvedResult - итоговый ответ целиком;
+        - done / error   - завершение потока.
+    """
+    try:
+        for event, payload in stream_improved_analysis(models_analysis_results, user_query, cancel_event):
+            if event == "delta":
+                yield format_sse_event("improveDelta", {"text": payload})
+            else:
+                yield format_sse_event("improvedResult", {"improvedResult": extract_response_text(payload)})
+        yield format_sse_event("done", {"status": "success"})
+
+    except Exception as e:
+        print(f"=== ОШИБКА ===")
+        print(f"Тип ошибки: {type(e).__name__}")
+        print(f"Сообщение: {str(e)}")
+        yield format_sse_event("error", {
+            "status": "error",
+            "message": f"Произошла ошибка при улучшении анализа: {str(e)}"
+        })
+
+@app.post("/api/improve/stream")
+async def improve_analysis_stream(request: UserQueryRequest, http_request: Request):
+    """
+    То же, что /api/improve, но отдает ответ по мере генерации
+    """
+    print("=== Получен запрос пользователя (поток) ===")
+    print(f"Запрос: {request.userQuery}")
+    try:
+        models_analysis_results = get_session_results(request)
+    except ValueError as e:
+        return JSONResponse(status_code=404, content={
+            "status": "error",
+            "message": f"Произошла ошибка при улучшении анализа: {str(e)}",
+            "data": None
+        })
+
+    cancel_event = threading.Event()
+    return StreamingResponse(
+        forward_events(http_request, stream_improve_events(
+            models_analysis_results, request.userQuery, cancel_event
+        ), cancel_event),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+def comparison_etag(card_types: List[str], banks: List[str], criteria: List[str]) -> str:
+    """Сильный ETag: версия данных и параметры запроса (в исходном порядке)"""
+    payload = json.dumps([get_dataset_version(), card_types, banks, criteria], ensure_ascii=False)
+    return '"' + hashlib.sha256(payload.encode("utf-8")).hexdigest()[:32] + '"'
+
+def etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    """Совпадает ли ETag с заголовком If-None-Match (слабое сравнение, RFC 7232)"""
+    if not if_none_match:
+        return False
+    # nginx при сжатии ответа ослабляет валидатор до W/"..."
+    candidates = [value.strip().removeprefix("W/") for value in if_none_match.split(",")]
+    return "*" in candidates or etag.removeprefix("W/") in candidates
+
+@app.get("/api/comparison")
+async def get_comparison(http_request: Request,
+                         banks: List[str] = Query(...),
+                         criteria: List[str] = Query(...),
+                         cardType: List[str] = Query(default=[])):
+    """
+    Данные для графика и таблицы без обращения к моделям.
+
+    Ответ зависит только от версии данных и параметров, поэтому отдается с
+    ETag: повторный запрос с If-None-Match получает 304 без тела.
+    """
+    etag = comparison_etag(cardType, banks, criteria)
+    headers = {"ETag": etag, "Cache-Control": f"public, max-age={COMPARISON_MAX_AGE}"}
+    if etag_matches(http_request.headers.get("if-none-match"), etag):
+        return Response(status_code=304, headers=headers)
+
+    return JSONResponse(headers=headers, content={
+        "status": "success",
+        "message": "Данные сравнения получены",
+        "data": {
+            "cardTypes": cardType,
+            "banks": banks,
+            "criteria": criteria,
+            "comparisonData": get_comparison_data_for_criteria(banks, criteria),
+            "comparisonNumeric": get_numeric_comparison_data(banks, criteria),
+            "comparisonAggregates": get_numeric_aggregates(banks, criteria),  # Мин./медиана/макс. по единицам
+            "datasetVersion": get_dataset_version()
+        }
+    })
+
+@app.get("/api/history")
+async def product_history(bank: str, criterion: str, since: Optional[datetime] = None):
+    """История значений критерия банка по снимкам хранилища продуктов"""
+    history = await run_in_threadpool(get_history, bank, criterion, since)
+    return {
+        "status": "success",
+        "message": f"Найдено значений: {len(history)}",
+        "data": {
+            "bank": bank,
+            "criterion": criterion,
+            "history": history
+        }
+    }
+
+@app.get("/api/dataset/changes")
+async def dataset_changes():
+    """Последнее изменение данных сравнения по ячейкам и сколько сравнений из-за него сброшено"""
+    changes = get_dataset_changes()
+    return {
+        "status": "success",
+        "message": "Изменений данных не было" if changes is None else f"Изменено ячеек: {len(changes['cells'])}",
+        "data": {
+            "datasetVersion": get_dataset_version(),
+            "changes": changes,
+            "refresh": dataset_refresh_report,
+            "recompute": DATASET_RECOMPUTE
+        }
+    }
+
+@app.get("/api/cache/stats")
+async def cache_stats():
+    """Счетчики попаданий и промахов кэша результатов"""
+    return result_cache.stats()
+
+@app.get("/api/coalescing/stats")
+async def coalescing_stats():
+    """Счетчики объединения одинаковых одновременных сравнений"""
+    return comparison_flight.stats()
+
+@app.get("/api/jobs")
+async def jobs_stats():
+    """Состояние очереди фоновых задач"""
+    return job_manager.stats()
+
+@app.get("/api/providers/health")
+async def providers_health():
+    """Задержки, адаптивные таймауты и состояние выключателей провайдеров"""
+    return get_providers_snapshot()
+
 @app.get("/health")
 async def health_check():
     """Проверка работоспособности сервера"""
     return {
         "status": "healthy",
         "message": "Backend is running"
-    }
\ No newline at end of file
+    }
+
+@app.get("/ready")
+async def readiness_check():
+    """Готовность к обработке запросов: все провайдеры успешно прошли прогрев"""
+    # ready, warming или failed; состояние каждого провайдера - в поле providers
+    status = provider_registry.overall_status()
+    return JSONResponse(
+        status_code=200 if status == PROVIDER_READY else 503,
+        content={
+            "status": status,
+            "startup": startup_report,
+            "providers": provider_registry.status()
+        }
+    )
\ No newline at end of file
@@ -0,0 +1,162 @@
+"""catalog.py - справочник банков, типов карт и критериев сравнения.
+
+Общий для парсера banki.ru (src/parser.py) и бэкенда (src/dataset.py):
+здесь заданы канонические названия, таблицы синонимов и индекс названий
+(NameIndex), который сопоставляет произвольное написание с каноническим
+названием:
+    1. точное совпадение нормализованного названия или синонима - O(1);
+    2. иначе - нечеткий поиск по индексу символьных триграмм (коэффициент
+       Дайса не ниже FUZZY_THRESHOLD); при равенстве побеждает название,
+       добавленное в индекс раньше, поэтому результат детерминирован.
+Результаты нечеткого поиска запоминаются.
+
+Модуль не зависит от сторонних библиотек, чтобы его можно было
+импортировать и из бэкенда, и из скрипта парсера.
+"""
+
+import re
+from collections import defaultdict
+from functools import lru_cache
+from typing import Dict, Iterable, List, Optional, Set
+
+card_types: Set[str] = {"Дебетовая карта", "Кредитная карта"}
+banks: Set[str] = {
+    "Альфа-Банк", "ВТБ", "Газпромбанк", "Московский Кредитный Банк (МКБ)",
+    "Промсвязьбанк (ПСБ)", "ПСБ", "Райффайзенбанк", "Россельхозбанк",
+    "Совкомбанк", "Т-Банк", "Банк ДОМ.РФ", "ЮниКредит Банк"
+}
+criterias: Set[str] = {
+    "Стоимость обслуживания (дебетовая)", "Стоимость обслуживания (кредитная)",
+    "СМС-уведомления", "Снятие наличных в других банках",
+    "Переводы по реквизитам в другие банки", "Процент на остаток",
+    "Кредитный лимит", "Процентные ставки", "Первоначальный взнос",
+    "Программа лояльности (дебетовая)", "Программа лояльности (кредитная)"
+}
+
+# Маппинг реальных названий из popup на criterias
+CRITERIA_MAP = {
+    'Годовое обслуживание': 'Стоимость обслуживания (кредитная)',
+    'Кредитный лимит': 'Кредитный лимит',
+    'Процентная ставка': 'Процентные ставки',
+    'Снятие наличных в любых банкоматах': 'Снятие наличных в других банках',
+    'Баллы': 'Программа лояльности (кредитная)',
+    'Льготный период': 'Льготный период',  # Можно добавить в criterias если нужно
+}
+
+# Синонимы банков: каноническое название -> другие написания
+BANK_ALIASES: Dict[str, List[str]] = {
+    "Сбербанк": ["Сбер", "СберБанк", "ПАО Сбербанк"],
+    "Альфа-Банк": ["Альфа", "Альфа Банк"],
+    "ВТБ": ["Банк ВТБ"],
+    "Газпромбанк": ["ГПБ"],
+    "Московский Кредитный Банк (МКБ)": ["МКБ", "Московский Кредитный Банк"],
+    "Промсвязьбанк (ПСБ)": ["ПСБ", "Промсвязьбанк"],
+    "Райффайзенбанк": ["Райффайзен"],
+    "Россельхозбанк": ["РСХБ"],
+    "Т-Банк": ["Тинькофф", "Тинькофф Банк", "Т Банк"],
+    "Банк ДОМ.РФ": ["ДОМ.РФ"],
+    "ЮниКредит Банк": ["ЮниКредит"],
+}
+
+# Синонимы критериев: названия из popup banki.ru (CRITERIA_MAP) и распространенные варианты
+CRITERIA_ALIASES: Dict[str, List[str]] = defaultdict(list)
+for _popup_name, _criterion in CRITERIA_MAP.items():
+    if _popup_name != _criterion:
+        CRITERIA_ALIASES[_criterion].append(_popup_name)
+CRITERIA_ALIASES["СМС-уведомления"] += ["SMS-уведомления", "СМС-информирование"]
+CRITERIA_ALIASES["Процент на остаток"] += ["Ставка на остаток", "Начисление процентов на остаток"]
+CRITERIA_ALIASES = dict(CRITERIA_ALIASES)
+
+# Нечеткое совпадение принимается только с высоким сходством и явным отрывом
+# от следующего кандидата: у названий банков общие триграммы "банк", и при
+# низком пороге "ОТП Банк" совпадал бы с "Т-Банк"
+FUZZY_THRESHOLD = 0.8
+FUZZY_MARGIN = 0.1
+FUZZY_CACHE_SIZE = 4096
+
+
+@lru_cache(maxsize=4096)
+def normalize_name(name: str) -> str:
+    """Ключ для сравнения названий: без скобок, лишних пробелов и регистра"""
+    return re.sub(r"\s+", " ", name.replace("(", "").replace(")", "")).strip().lower().replace("ё", "е")
+
+
+def _trigrams(key: str) -> Set[str]:
+    padded = f"  {key} "
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+
+class NameIndex:
+    """Сопоставление написаний названий с каноническими названиями."""
+
+    def __init__(self, names: Iterable[str], aliases: Optional[Dict[str, List[str]]] = None):
+        alias_keys: Dict[str, str] = {}
+        for canonical, alias_list in (aliases or {}).items():
+            for alias in [canonical] + alias_list:
+                alias_keys.setdefault(normalize_name(alias), canonical)
+
+        # Нормализованное написание -> каноническое название. Названия идут
+        # первыми (в исходном порядке), синонимы имеют приоритет при совпадении
+        self._keys: Dict[str, str] = {}
+        for name in names:
+            key = normalize_name(name)
+            self._keys.setdefault(key, alias_keys.get(key, name))
+        for key, canonical in alias_keys.items():
+            self._keys.setdefault(key, canonical)
+
+        # Порядок добавления решает ничьи нечеткого поиска
+        self._order = {key: position for position, key in enumerate(self._keys)}
+        self._trigram_sizes = {key: len(_trigrams(key)) for key in self._keys}
+        # Триграмма -> нормализованные написания, в которых она встречается
+        self._trigram_index: Dict[str, List[str]] = defaultdict(list)
+        for key in self._keys:
+            for trigram in _trigrams(key):
+                self._trigram_index[trigram].append(key)
+        self._fuzzy_matches: Dict[str, Optional[str]] = {}
+
+    def resolve(self, name: str, fuzzy: bool = True) -> Optional[str]:
+        """Каноническое название для написания name или None"""
+        key = normalize_name(name)
+        canonical = self._keys.get(key)
+        if canonical is not None or not fuzzy:
+            return canonical
+        if key not in self._fuzzy_matches:
+            if len(self._fuzzy_matches) >= FUZZY_CACHE_SIZE:
+                self._fuzzy_matches.clear()
+            self._fuzzy_matches[key] = self._fuzzy_resolve(key)
+        return self._fuzzy_matches[key]
+
+    def _fuzzy_resolve(self, key: str) -> Optional[str]:
+        trigrams = _trigrams(key)
+        shared = defaultdict(int)
+        for trigram in trigrams:
+            for candidate in self._trigram_index.get(trigram, ()):
+                shared[candidate] += 1
+
+        # Лучшее сходство для каждого канонического названия (синонимы одного названия не соперничают)
+        scores: Dict[str, float] = {}
+        best_keys: Dict[str, str] = {}
+        for candidate, count in sorted(shared.items(), key=lambda item: self._order[item[0]]):
+            score = 2 * count / (len(trigrams) + self._trigram_sizes[candidate])
+            canonical = self._keys[candidate]
+            if score > scores.get(canonical, 0.0):
+                scores[canonical], best_keys[canonical] = score, candidate
+        if not scores:
+            return None
+
+        ranked = sorted(scores, key=lambda canonical: (-scores[canonical], self._order[best_keys[canonical]]))
+        best_score = scores[ranked[0]]
+        second_score = scores[ranked[1]] if len(ranked) > 1 else 0.0
+        if best_score < FUZZY_THRESHOLD or best_score - second_score < FUZZY_MARGIN:
+            return None
+        return ranked[0]
+
+    def __contains__(self, name: str) -> bool:
+        return self.resolve(name, fuzzy=False) is not None
+
+
+# Индексы справочника для парсера: только банки и критерии из множеств выше.
+# Порядок множеств зависит от PYTHONHASHSEED, поэтому названия сортируются -
+# иначе ничьи нечеткого поиска решались бы по-разному в разных процессах
+BANK_INDEX = NameIndex(sorted(banks), {name: aliases for name, aliases in BANK_ALIASES.items() if name in banks})
+CRITERIA_INDEX = NameIndex(sorted(criterias), CRITERIA_ALIASES)
@@ -0,0 +1,224 @@
+"""dataset.py - доступ к сравнительным данным банковских продуктов.
+
+Данные хранятся в src/data/analysis_data.json и используются как для
+графика и таблицы на фронтенде, так и для построения промпта анализа.
+
+Файл загружается один раз в индекс (DatasetIndex), где значения доступны по
+каноническим названиям критерия и банка; написания из запроса сопоставляются
+с ними через справочник синонимов (банки - только точно, после нормализации),
+критерии - дополнительно через триграммный индекс (см. src/catalog.py).
+Несопоставленное название дает "Нет данных". Индекс перезагружается, если
+изменились mtime и хэш содержимого файла: новый индекс строится целиком и
+подменяет старый одним присваиванием, поэтому запросы всегда видят
+согласованную версию данных.
+
+При перезагрузке новая версия сравнивается со старой по ячейкам
+(критерий, банк): список изменений сохраняется (get_dataset_changes) и
+передается подписчикам (add_dataset_listener), чтобы сбросить или
+пересчитать только те анализы, в данные которых попали измененные ячейки.
+
+Параметры задаются переменными окружения:
+    - DATASET_CHECK_INTERVAL - как часто проверять изменение файла, сек.
+"""
+
+import hashlib
+import json
+import os
+import threading
+import time
+from typing import Callable, List, Dict, Any, Optional
+
+from src.catalog import NameIndex, BANK_ALIASES, CRITERIA_ALIASES
+from src.numeric import NumericTable
+
+ANALYSIS_DATA_PATH = os.path.join(os.path.dirname(__file__), "data", "analysis_data.json")
+DATASET_CHECK_INTERVAL = float(os.getenv("DATASET_CHECK_INTERVAL", "1"))
+
+NO_DATA = "Нет данных"
+
+
+class DatasetIndex:
+    """Неизменяемый снимок analysis_data.json с индексом по критериям и банкам."""
+
+    def __init__(self, data: Dict[str, Any], version: str, mtime: float):
+        self.data = data
+        self.version = version
+        self.mtime = mtime
+
+        table = [
+            # Критерий может называться "criteria" или "criterion"
+            (item.get("criteria") or item.get("criterion"), item.get("info", {}))
+            for item in data.get("comparison_table", [])
+        ]
+        table = [(criterion_name, info) for criterion_name, info in table if criterion_name]
+
+        self.criteria_names = NameIndex([name for name, _ in table], CRITERIA_ALIASES)
+        self.bank_names = NameIndex([bank for _, info in table for bank in info], BANK_ALIASES)
+
+        # Каноническое название критерия -> {каноническое название банка: значение}
+        self.values: Dict[str, Dict[str, Any]] = {}
+        for criterion_name, info in table:
+            values = self.values.setdefault(self.criteria_names.resolve(criterion_name), {})
+            for bank_name, value in info.items():
+                values.setdefault(self.bank_names.resolve(bank_name), value)
+
+        # Разобранные числовые значения в столбцовом виде (см. src/numeric.py)
+        self.numeric = NumericTable(self.values)
+
+    def resolve_bank(self, bank: str) -> Optional[str]:
+        """Каноническое название банка без нечеткого поиска: похожий банк - это другой банк"""
+        return self.bank_names.resolve(bank, fuzzy=False)
+
+    def resolve_criterion(self, criterion: str) -> Optional[str]:
+        return self.criteria_names.resolve(criterion)
+
+    def get_value(self, criterion: str, bank: str) -> Any:
+        """Значение критерия для банка или "Нет данных" """
+        values = self.values.get(self.resolve_criterion(criterion), {})
+        value = values.get(self.resolve_bank(bank))
+        return value if value is not None else NO_DATA
+
+
+_dataset: Dict[str, Any] = {"index": None, "checked_at": 0.0, "changes": None}
+_dataset_lock = threading.Lock()
+_dataset_listeners: List[Callable[[Dict[str, Any]], None]] = []
+
+
+def diff_values(old: Dict[str, Dict[str, Any]], new: Dict[str, Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """
+    Сравнивает значения двух версий данных по ячейкам (критерий, банк).
+
+    Returns:
+        Список измененных, добавленных и удаленных ячеек
+        (отсутствующее значение - None)
+    """
+    cells = []
+    for criterion in list(old) + [c for c in new if c not in old]:
+        old_row, new_row = old.get(criterion, {}), new.get(criterion, {})
+        for bank in list(old_row) + [b for b in new_row if b not in old_row]:
+            old_value, new_value = old_row.get(bank), new_row.get(bank)
+            if old_value != new_value:
+                cells.append({"criterion": criterion, "bank": bank, "old": old_value, "new": new_value})
+    return cells
+
+
+def add_dataset_listener(listener: Callable[[Dict[str, Any]], None]):
+    """Подписывает функцию на изменения данных: она получает список изменений (см. get_dataset_changes)"""
+    _dataset_listeners.append(listener)
+
+
+def _notify_listeners(changes: Dict[str, Any]):
+    for listener in _dataset_listeners:
+        try:
+            listener(changes)
+        except Exception as e:
+            print(f"Ошибка обработчика изменения данных: {type(e).__name__}: {e}")
+
+
+def _read_dataset(previous: Optional[DatasetIndex]) -> DatasetIndex:
+    """Строит новый индекс, если содержимое файла изменилось"""
+    mtime = os.path.getmtime(ANALYSIS_DATA_PATH)
+    with open(ANALYSIS_DATA_PATH, 'rb') as f:
+        raw = f.read()
+    version = hashlib.sha256(raw).hexdigest()
+    if previous is not None and previous.version == version:
+        previous.mtime = mtime
+        return previous
+    print(f"=== Загружены данные сравнения (версия {version[:12]}) ===")
+    return DatasetIndex(json.loads(raw.decode('utf-8')), version, mtime)
+
+
+def get_dataset() -> DatasetIndex:
+    """Возвращает актуальный индекс данных, перезагружая его при изменении файла"""
+    now = time.monotonic()
+    index = _dataset["index"]
+    if index is not None and now - _dataset["checked_at"] < DATASET_CHECK_INTERVAL:
+        return index
+
+    changes = None
+    with _dataset_lock:
+        previous = _dataset["index"]
+        index = previous
+        if index is None or os.path.getmtime(ANALYSIS_DATA_PATH) != index.mtime:
+            index = _read_dataset(index)
+            if previous is not None and index is not previous:
+                cells = diff_values(previous.values, index.values)
+                changes = {
+                    "fromVersion": previous.version,
+                    "toVersion": index.version,
+                    "detectedAt": time.time(),
+                    "cells": cells,
+                }
+                _dataset["changes"] = changes
+                print(f"=== Изменено ячеек данных: {len(cells)} ===")
+            # Атомарная подмена: читатели видят либо старый, либо новый индекс целиком
+            _dataset["index"] = index
+        _dataset["checked_at"] = now
+
+    # Подписчики вызываются вне блокировки: они могут сами обращаться к данным
+    if changes is not None:
+        _notify_listeners(changes)
+    return index
+
+
+def load_analysis_data() -> Dict[str, Any]:
+    """Возвращает данные из analysis_data.json (общий объект, изменять нельзя)"""
+    return get_dataset().data
+
+
+def get_dataset_version() -> str:
+    """Возвращает хэш содержимого analysis_data.json (пересчитывается при изменении файла)"""
+    return get_dataset().version
+
+
+def get_dataset_changes() -> Optional[Dict[str, Any]]:
+    """Последние изменения данных: версии до и после и список измененных ячеек"""
+    # Сначала проверяем файл: изменение, обнаруженное этим вызовом, тоже должно попасть в ответ
+    get_dataset()
+    return _dataset["changes"]
+
+
+def changes_affect(changes: Dict[str, Any], banks: List[str], criteria: List[str]) -> bool:
+    """Затрагивают ли изменения хотя бы одну ячейку выбранных банков и критериев"""
+    index = get_dataset()
+    selected_banks = {index.resolve_bank(bank) for bank in banks}
+    selected_criteria = {index.resolve_criterion(criterion) for criterion in criteria}
+    return any(
+        cell["bank"] in selected_banks and cell["criterion"] in selected_criteria
+        for cell in changes["cells"]
+    )
+
+
+def get_comparison_data_for_criteria(banks: List[str], criteria: List[str]) -> Dict[str, Dict[str, Any]]:
+    """Извлекает данные для выбранных банков и критериев из индекса"""
+    index = get_dataset()
+    return {
+        criterion: {bank: index.get_value(criterion, bank) for bank in banks}
+        for criterion in criteria
+    }
+
+
+def get_numeric_comparison_data(banks: List[str], criteria: List[str]) -> Dict[str, Dict[str, Any]]:
+    """Разобранные значения (min/max/unit/period) для выбранных банков и критериев"""
+    index = get_dataset()
+    canonical_criteria = [index.resolve_criterion(criterion) for criterion in criteria]
+    canonical_banks = [index.resolve_bank(bank) for bank in banks]
+    numeric = index.numeric.slice(canonical_criteria, canonical_banks)
+    # Ключи ответа - названия из запроса, как в get_comparison_data_for_criteria
+    return {
+        criterion: {bank: numeric[canonical_criterion][canonical_bank]
+                    for bank, canonical_bank in zip(banks, canonical_banks)}
+        for criterion, canonical_criterion in zip(criteria, canonical_criteria)
+    }
+
+
+def get_numeric_aggregates(banks: List[str], criteria: List[str]) -> Dict[str, Dict[str, Dict[str, Any]]]:
+    """Минимум, медиана и максимум по выбранным банкам для каждого критерия, отдельно по единицам"""
+    index = get_dataset()
+    canonical_criteria = [index.resolve_criterion(criterion) for criterion in criteria]
+    canonical_banks = [index.resolve_bank(bank) for bank in banks]
+    aggregates = index.numeric.aggregate(canonical_criteria, canonical_banks)
+    return {
+        criterion: aggregates[canonical_criterion]
+        for criterion, canonical_criterion in zip(criteria, canonical_criteria)
+    }
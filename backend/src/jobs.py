@@ -0,0 +1,143 @@
+"""jobs.py - фоновые задачи сравнения.
+
+Сравнение может занимать минуты, поэтому клиент может не держать соединение:
+POST создает задачу и сразу возвращает её id, а работу выполняет ограниченный
+пул рабочих потоков внутри процесса. Завершенные задачи хранятся заданное
+время, после чего удаляются.
+
+Параметры задаются переменными окружения:
+    - JOB_WORKERS   - число рабочих потоков;
+    - JOB_QUEUE_MAX - макс. число задач в очереди;
+    - JOB_RETENTION - сколько секунд хранить завершенные задачи.
+"""
+
+import os
+import queue
+import threading
+import time
+import uuid
+
+JOB_WORKERS = int(os.getenv("JOB_WORKERS", "2"))
+JOB_QUEUE_MAX = int(os.getenv("JOB_QUEUE_MAX", "100"))
+JOB_RETENTION = float(os.getenv("JOB_RETENTION", "3600"))
+
+QUEUED = "queued"
+RUNNING = "running"
+DONE = "done"
+ERROR = "error"
+
+
+class JobQueueFullError(Exception):
+    """Очередь задач переполнена."""
+
+
+class JobManager:
+    """Очередь задач с пулом рабочих потоков и хранением результатов."""
+
+    def __init__(self, handler, workers=JOB_WORKERS, max_queue=JOB_QUEUE_MAX, retention=JOB_RETENTION):
+        """
+        Args:
+            handler: Функция, выполняющая задачу: принимает payload, возвращает результат
+            workers: Число рабочих потоков
+            max_queue: Макс. размер очереди
+            retention: Время хранения завершенных задач, сек.
+        """
+        self.handler = handler
+        self.workers = workers
+        self.retention = retention
+        self._queue = queue.Queue(maxsize=max_queue)
+        self._jobs = {}
+        self._lock = threading.Lock()
+        self._threads = []
+
+    def start(self):
+        """Запускает рабочие потоки."""
+        for index in range(self.workers):
+            thread = threading.Thread(target=self._worker, name=f"job-worker-{index}", daemon=True)
+            thread.start()
+            self._threads.append(thread)
+
+    def stop(self):
+        """Останавливает рабочие потоки после текущих задач."""
+        for _ in self._threads:
+            self._queue.put(None)
+        for thread in self._threads:
+            thread.join(timeout=5)
+        self._threads = []
+
+    def submit(self, payload):
+        """
+        Ставит задачу в очередь.
+
+        Returns:
+            id задачи
+
+        Raises:
+            JobQueueFullError: если очередь переполнена
+        """
+        self._cleanup()
+        job_id = uuid.uuid4().hex
+        job = {
+            "id": job_id,
+            "status": QUEUED,
+            "createdAt": time.time(),
+            "startedAt": None,
+            "finishedAt": None,
+            "result": None,
+            "error": None,
+        }
+        with self._lock:
+            self._jobs[job_id] = job
+        try:
+            self._queue.put_nowait((job_id, payload))
+        except queue.Full:
+            with self._lock:
+                del self._jobs[job_id]
+            raise JobQueueFullError("Очередь задач переполнена")
+        return job_id
+
+    def get(self, job_id):
+        """Возвращает копию задачи или None, если её нет (или срок хранения истек)."""
+        self._cleanup()
+        with self._lock:
+            job = self._jobs.get(job_id)
+            return dict(job) if job is not None else None
+
+    def stats(self):
+        with self._lock:
+            statuses = [job["status"] for job in self._jobs.values()]
+        return {
+            "workers": self.workers,
+            "queued": self._queue.qsize(),
+            "jobs": {status: statuses.count(status) for status in (QUEUED, RUNNING, DONE, ERROR)},
+        }
+
+    def _update(self, job_id, **fields):
+        with self._lock:
+            if job_id in self._jobs:
+                self._jobs[job_id].update(fields)
+
+    def _worker(self):
+        while True:
+            item = self._queue.get()
+            if item is None:
+                break
+            job_id, payload = item
+            self._update(job_id, status=RUNNING, startedAt=time.time())
+            try:
+                result = self.handler(payload)
+                self._update(job_id, status=DONE, result=result, finishedAt=time.time())
+            except Exception as e:
+                print(f"Ошибка в задаче {job_id}: {type(e).__name__}: {e}")
+                self._update(job_id, status=ERROR, error=str(e), finishedAt=time.time())
+
+    def _cleanup(self):
+        """Удаляет завершенные задачи, срок хранения которых истек."""
+        expired_before = time.time() - self.retention
+        with self._lock:
+            expired = [
+                job_id for job_id, job in self._jobs.items()
+                if job["finishedAt"] is not None and job["finishedAt"] < expired_before
+            ]
+            for job_id in expired:
+                del self._jobs[job_id]
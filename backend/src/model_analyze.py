@@ -1,107 +1,97 @@
-import requests
-import json
 import os
-from gigachat import GigaChat
+import time
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED, TimeoutError as FutureTimeoutError
+from src.openrouter_client import make_openrouter_request
+from src.provider_health import get_provider_health, STATUS_CIRCUIT_OPEN, PROVIDER_TIMEOUT_MAX
+from src.providers import registry
 
 # Конфигурация для OpenRouter
-OPENROUTER_API_KEY = os.getenv("OPENROUTER_API_KEY") or "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"
 OPENROUTER_MODELS = ["x-ai/grok-4.1-fast:free", "deepseek/deepseek-r1-0528-qwen3-8b"]
 
+# Конфигурация бюджета этапа анализа:
+#   - ANALYSIS_DEADLINE - сколько секунд ждём ответы моделей (0 - без ограничения);
+#   - ANALYSIS_QUORUM   - сколько успешных ответов достаточно, чтобы перейти
+#                         к суммаризации (0 - ждём все модели).
+ANALYSIS_DEADLINE = float(os.getenv("ANALYSIS_DEADLINE", "0"))
+ANALYSIS_QUORUM = int(os.getenv("ANALYSIS_QUORUM", "0"))
+
+# Код статуса для моделей, не уложившихся в бюджет
+STATUS_LATE = -4
+
+# Сколько сравнений одновременно может анализироваться без ожидания в очереди пула
+ANALYSIS_CONCURRENCY = int(os.getenv("ANALYSIS_CONCURRENCY", "16"))
+
+# Общий пул потоков: запоздавшие запросы дорабатывают в фоне и не держат ответ.
+# По потоку на каждого провайдера каждого одновременного сравнения
+# (OPENROUTER_MODELS + GigaChat); ANALYSIS_WORKERS задает размер явно
+_executor = ThreadPoolExecutor(max_workers=int(
+    os.getenv("ANALYSIS_WORKERS", str(ANALYSIS_CONCURRENCY * (len(OPENROUTER_MODELS) + 1)))
+))
+
 # Конфигурация для GigaChat
+GIGACHAT_MODEL_NAME = "giga-chat"
 GIGACHAT_CREDENTIALS = 'MDE5YWFiZTAtNjE1Zi03ZGNiLWJlMGItZjlkMzA5NWI0MTVmOjY5NWZmZDQ1LTdhYWEtNDdiOC1hMWMwLTRmZWYwYzYxNTNhOA=='
-giga = GigaChat(
-    credentials=GIGACHAT_CREDENTIALS,
-    verify_ssl_certs=False 
-)
 
-def make_openrouter_request(model, prompt):
-    """Выполняет запрос к OpenRouter API для указанной модели и возвращает результаты."""
-    try:
-        print(f"=== Запрос для модели {model} (OpenRouter) ===")
-        response = requests.post(
-            url="https://openrouter.ai/api/v1/chat/completions",
-            headers={
-                "Authorization": f"Bearer {OPENROUTER_API_KEY}",
-                "Content-Type": "application/json",
-            },
-            data=json.dumps({
-                "model": model,
-                "messages": [
-                    {
-                        "role": "user",
-                        "content": prompt
-                    }
-                ],
-                "extra_body": {"reasoning": {"enabled": True}}
-            }),
-            timeout=30
-        )
-        
-        status_code = response.status_code
-        if status_code != 200:
-            print(f"Ошибка для {model}: {status_code}")
-            print(response.text if hasattr(response, 'text') else "Нет текста ошибки")
-            return {
-                "model": model,
-                "response": f"Ошибка: {status_code}",
-                "reasoning_present": False,
-                "status_code": status_code
-            }
-        
-        data = response.json()
-        assistant_message = data['choices'][0]['message']
-        content = assistant_message.get('content', 'Нет содержимого')
-        reasoning_present = 'reasoning_details' in assistant_message
-        
-        print(f"Ответ: {content}")
-        print(f"Reasoning details присутствуют: {reasoning_present}")
-        
+# Вызовы SDK GigaChat: таймаут клиента задается один раз при создании, поэтому
+# адаптивный таймаут каждого запроса ограничивает ожидание результата из этого пула
+_gigachat_executor = ThreadPoolExecutor(max_workers=ANALYSIS_CONCURRENCY, thread_name_prefix="gigachat")
+
+
+def _create_gigachat():
+    """Создает клиент GigaChat; SDK импортируется только здесь, а не при старте."""
+    from gigachat import GigaChat
+    return GigaChat(
+        credentials=GIGACHAT_CREDENTIALS,
+        model=os.getenv("GIGACHAT_MODEL", "GigaChat"),
+        verify_ssl_certs=False,
+        # Верхняя граница: сам запрос ограничивается адаптивным таймаутом в make_gigachat_request
+        timeout=PROVIDER_TIMEOUT_MAX
+    )
+
+
+registry.register(GIGACHAT_MODEL_NAME, _create_gigachat, close=lambda client: client.close())
+
+
+def make_gigachat_request(prompt):
+    """
+    Выполняет запрос к GigaChat API и возвращает результаты.
+
+    Задержки и ошибки учитываются так же, как для OpenRouter, и таймаут тот же
+    адаптивный (health.timeout()): ответ, не полученный за это время, считается
+    таймаутом, а запрос дорабатывает в фоне не дольше таймаута клиента.
+    """
+    health = get_provider_health(GIGACHAT_MODEL_NAME)
+    if not health.allow():
+        print(f"Провайдер {GIGACHAT_MODEL_NAME} временно отключен (circuit breaker)")
         return {
-            "model": model,
-            "response": content,
-            "reasoning_present": reasoning_present,
-            "status_code": status_code
+            "model": GIGACHAT_MODEL_NAME,
+            "response": "Провайдер временно недоступен",
+            "reasoning_present": False,
+            "status_code": STATUS_CIRCUIT_OPEN
         }
-            
-    except requests.exceptions.Timeout:
-        print(f"Таймаут для {model}")
-        return {
-            "model": model,
+
+    started_at = time.monotonic()
+    future = _gigachat_executor.submit(_gigachat_chat, prompt)
+    try:
+        result = future.result(timeout=health.timeout())
+    except FutureTimeoutError:
+        print(f"Таймаут для {GIGACHAT_MODEL_NAME}")
+        result = {
+            "model": GIGACHAT_MODEL_NAME,
             "response": "Таймаут",
             "reasoning_present": False,
             "status_code": -1
         }
-    except requests.exceptions.RequestException as e:
-        print(f"Ошибка сети для {model}: {e}")
-        return {
-            "model": model,
-            "response": f"Ошибка сети: {e}",
-            "reasoning_present": False,
-            "status_code": -2
-        }
-    except KeyError as e:
-        print(f"Ошибка в структуре ответа для {model}: {e}")
-        return {
-            "model": model,
-            "response": f"Ошибка парсинга: {e}",
-            "reasoning_present": False,
-            "status_code": 0
-        }
-    except Exception as e:
-        print(f"Неожиданная ошибка для {model}: {e}")
-        return {
-            "model": model,
-            "response": f"Неожиданная ошибка: {e}",
-            "reasoning_present": False,
-            "status_code": -3
-        }
+    health.record(result["status_code"], time.monotonic() - started_at)
+    return result
 
-def make_gigachat_request(prompt):
-    """Выполняет запрос к GigaChat API и возвращает результаты."""
-    model_name = "giga-chat"
+
+def _gigachat_chat(prompt):
+    """Отправляет запрос в GigaChat и приводит ответ к общему формату."""
+    model_name = GIGACHAT_MODEL_NAME
     try:
         print(f"=== Запрос для модели {model_name} (GigaChat) ===")
-        response = giga.chat(prompt)
+        response = registry.get(GIGACHAT_MODEL_NAME).chat(prompt)
         content = response.choices[0].message.content
         reasoning_present = False 
         
@@ -124,18 +114,125 @@ def make_gigachat_request(prompt):
             "status_code": -3
         }
 
-def save_models_results(prompt):
-    all_results = []
-    
-    # Обработка OpenRouter моделей
-    for model in OPENROUTER_MODELS:
-        result = make_openrouter_request(model, prompt)
-        print(f"Имя модели: {model}")
-        all_results.append(str(result))
-    
-    # Обработка GigaChat
-    gigachat_result = make_gigachat_request(prompt)
-    all_results.append(str(gigachat_result))
-    
-    return all_results
+def iter_models_results(prompt, deadline=None, quorum=None):
+    """
+    Запускает анализ всеми моделями параллельно и отдаёт результаты по мере готовности.
+
+    Запросы к OpenRouter моделям и GigaChat выполняются одновременно в пуле
+    потоков, поэтому общее время ожидания равно времени самой медленной модели,
+    а не сумме задержек.
+
+    Ожидание прекращается, когда получено quorum успешных ответов или истек
+    бюджет deadline (в секундах). Бюджет каждой модели отсчитывается с момента,
+    когда ее запрос начал выполняться, а не с постановки в очередь пула.
+    Модели, не успевшие ответить, отдаются в конце с кодом STATUS_LATE.
+
+    Args:
+        prompt: Промпт для анализа
+        deadline: Бюджет времени в секундах (по умолчанию ANALYSIS_DEADLINE)
+        quorum: Достаточное число успешных ответов (по умолчанию ANALYSIS_QUORUM)
+
+    Yields:
+        Кортеж (index, result), где index - позиция модели в общем порядке
+        (сначала OPENROUTER_MODELS, затем GigaChat), result - словарь ответа
+    """
+    deadline = ANALYSIS_DEADLINE if deadline is None else deadline
+    quorum = ANALYSIS_QUORUM if quorum is None else quorum
+
+    tasks = [(model, make_openrouter_request, (model, prompt)) for model in OPENROUTER_MODELS]
+    tasks.append((GIGACHAT_MODEL_NAME, make_gigachat_request, (prompt,)))
+    if quorum <= 0 or quorum > len(tasks):
+        quorum = len(tasks)
+
+    # Момент фактического начала запроса каждой модели (None - еще в очереди пула)
+    started_at = [None] * len(tasks)
+
+    def run_task(index, func, args):
+        started_at[index] = time.monotonic()
+        return func(*args)
+
+    pending = {
+        _executor.submit(run_task, index, func, args): index
+        for index, (_, func, args) in enumerate(tasks)
+    }
+    succeeded = 0
+
+    while pending and succeeded < quorum:
+        timeout = None
+        if deadline > 0:
+            # Ждем, пока бюджет есть хотя бы у одной модели; ожидающим в
+            # очереди пула он еще не начал расходоваться
+            now = time.monotonic()
+            timeout = max(
+                deadline if started_at[index] is None else deadline - (now - started_at[index])
+                for index in pending.values()
+            )
+            if timeout <= 0:
+                break
 
+        done, _ = wait(pending, timeout=timeout, return_when=FIRST_COMPLETED)
+        if not done:
+            # Бюджет пересчитывается: модели из очереди могли только что начать работу
+            continue
+
+        for future in done:
+            index = pending.pop(future)
+            result = future.result()
+            if result["status_code"] == 200:
+                succeeded += 1
+            print(f"Имя модели: {result['model']}")
+            yield index, result
+
+    # Оставшиеся модели не уложились в бюджет - не ждем их
+    for future, index in pending.items():
+        model = tasks[index][0]
+        print(f"Модель {model} не уложилась в бюджет анализа")
+        yield index, {
+            "model": model,
+            "response": "Превышен бюджет времени анализа",
+            "reasoning_present": False,
+            "status_code": STATUS_LATE
+        }
+
+
+def get_models_status(results):
+    """
+    Формирует метаданные о том, какие модели ответили, а какие нет.
+
+    Args:
+        results: Список словарей результатов моделей
+
+    Returns:
+        Словарь со списками моделей completed, failed и late
+    """
+    status = {"completed": [], "failed": [], "late": []}
+    for result in results:
+        if result["status_code"] == 200:
+            status["completed"].append(result["model"])
+        elif result["status_code"] == STATUS_LATE:
+            status["late"].append(result["model"])
+        else:
+            status["failed"].append(result["model"])
+    return status
+
+
+def analyze_models(prompt, deadline=None, quorum=None):
+    """
+    Возвращает результаты всех моделей в исходном порядке и метаданные о них.
+
+    Returns:
+        Кортеж (all_results, models_status), где all_results - список строк
+        результатов, models_status - см. get_models_status
+    """
+    results = [None] * (len(OPENROUTER_MODELS) + 1)
+
+    for index, result in iter_models_results(prompt, deadline, quorum):
+        results[index] = result
+
+    return [str(result) for result in results], get_models_status(results)
+
+
+def save_models_results(prompt, deadline=None, quorum=None):
+    """Возвращает результаты всех моделей в исходном порядке в виде строк."""
+    all_results, _ = analyze_models(prompt, deadline, quorum)
+    return all_results
@@ -1,94 +1,9 @@
-import requests
-import json
-import os
+from src.openrouter_client import make_openrouter_request, stream_openrouter_request
 
 # Конфигурация для OpenRouter
-OPENROUTER_API_KEY = os.getenv("OPENROUTER_API_KEY") or "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"
 OPENROUTER_MODEL = "deepseek/deepseek-r1-0528-qwen3-8b"
 
 
-def make_openrouter_request(model, text):
-    """Выполняет запрос к OpenRouter API для указанной модели и возвращает результаты."""
-    try:
-        print(f"=== Запрос для модели {OPENROUTER_MODEL} (OpenRouter) ===")
-        response = requests.post(
-            url="https://openrouter.ai/api/v1/chat/completions",
-            headers={
-                "Authorization": f"Bearer {OPENROUTER_API_KEY}",
-                "Content-Type": "application/json",
-            },
-            data=json.dumps({
-                "model": model,
-                "messages": [
-                    {
-                        "role": "user",
-                        "content": text
-                    }
-                ],
-                "extra_body": {"reasoning": {"enabled": True}}
-            }),
-            timeout=30
-        )
-        
-        status_code = response.status_code
-        if status_code != 200:
-            print(f"Ошибка для {model}: {status_code}")
-            print(response.text if hasattr(response, 'text') else "Нет текста ошибки")
-            return {
-                "model": model,
-                "response": f"Ошибка: {status_code}",
-                "reasoning_present": False,
-                "status_code": status_code
-            }
-        
-        data = response.json()
-        assistant_message = data['choices'][0]['message']
-        content = assistant_message.get('content', 'Нет содержимого')
-        reasoning_present = 'reasoning_details' in assistant_message
-        
-        print(f"Ответ: {content}")
-        print(f"Reasoning details присутствуют: {reasoning_present}")
-        
-        return {
-            "model": model,
-            "response": content,
-            "reasoning_present": reasoning_present,
-            "status_code": status_code
-        }
-            
-    except requests.exceptions.Timeout:
-        print(f"Таймаут для {model}")
-        return {
-            "model": model,
-            "response": "Таймаут",
-            "reasoning_present": False,
-            "status_code": -1
-        }
-    except requests.exceptions.RequestException as e:
-        print(f"Ошибка сети для {model}: {e}")
-        return {
-            "model": model,
-            "response": f"Ошибка сети: {e}",
-            "reasoning_present": False,
-            "status_code": -2
-        }
-    except KeyError as e:
-        print(f"Ошибка в структуре ответа для {model}: {e}")
-        return {
-            "model": model,
-            "response": f"Ошибка парсинга: {e}",
-            "reasoning_present": False,
-            "status_code": 0
-        }
-    except Exception as e:
-        print(f"Неожиданная ошибка для {model}: {e}")
-        return {
-            "model": model,
-            "response": f"Неожиданная ошибка: {e}",
-            "reasoning_present": False,
-            "status_code": -3
-        }
-
 def improve_analysis_with_user_query(models_analysis_results, user_query):
     """
     Улучшает анализ на основе запроса пользователя.
@@ -100,6 +15,26 @@ def improve_analysis_with_user_query(models_analysis_results, user_query):
     Returns:
         Словарь с результатом улучшенного анализа
     """
+    prompt = build_improve_prompt(models_analysis_results, user_query)
+    improved_result = make_openrouter_request(OPENROUTER_MODEL, prompt)
+    
+    return improved_result
+
+
+def stream_improved_analysis(models_analysis_results, user_query, cancel_event=None):
+    """
+    Потоковый вариант improve_analysis_with_user_query.
+
+    Yields:
+        ("delta", фрагмент текста) по мере генерации, затем
+        ("result", итоговый словарь) последним событием
+    """
+    prompt = build_improve_prompt(models_analysis_results, user_query)
+    yield from stream_openrouter_request(OPENROUTER_MODEL, prompt, cancel_event)
+
+
+def build_improve_prompt(models_analysis_results, user_query):
+    """Формирует запрос на улучшение анализа."""
     analysis_text = ''.join(models_analysis_results)
     
     prompt = f"""
@@ -137,7 +72,5 @@ def improve_analysis_with_user_query(models_analysis_results, user_query):
 УЛУЧШЕННЫЙ ОТВЕТ:
 """
     
-    improved_result = make_openrouter_request(OPENROUTER_MODEL, prompt)
-    
-    return improved_result
+    return prompt
 
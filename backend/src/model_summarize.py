@@ -1,95 +1,94 @@
-import requests
-import json
 import os
+from concurrent.futures import ThreadPoolExecutor, TimeoutError
+from src.openrouter_client import make_openrouter_request, stream_openrouter_request
+from src.summarize_local import summarize_locally
 
 # Конфигурация для OpenRouter
-OPENROUTER_API_KEY = os.getenv("OPENROUTER_API_KEY") or "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"
 OPENROUTER_MODEL = "deepseek/deepseek-r1-0528-qwen3-8b"
 
+# Режим суммаризации:
+#   - "remote" - итоговый отчет пишет модель OpenRouter;
+#   - "local"  - локальное объединение отчетов без сети (см. summarize_local.py);
+#   - "auto"   - удаленная модель, а если она не ответила за
+#                SUMMARY_REMOTE_DEADLINE секунд или с ошибкой - локальный режим.
+SUMMARY_MODES = ("remote", "local", "auto")
+SUMMARY_MODE = os.getenv("SUMMARY_MODE", "remote")
+SUMMARY_REMOTE_DEADLINE = float(os.getenv("SUMMARY_REMOTE_DEADLINE", "20"))
 
-def make_openrouter_request(model, text):
-    """Выполняет запрос к OpenRouter API для указанной модели и возвращает результаты."""
-    try:
-        print(f"=== Запрос для модели {OPENROUTER_MODEL} (OpenRouter) ===")
-        response = requests.post(
-            url="https://openrouter.ai/api/v1/chat/completions",
-            headers={
-                "Authorization": f"Bearer {OPENROUTER_API_KEY}",
-                "Content-Type": "application/json",
-            },
-            data=json.dumps({
-                "model": model,
-                "messages": [
-                    {
-                        "role": "user",
-                        "content": text
-                    }
-                ],
-                "extra_body": {"reasoning": {"enabled": True}}
-            }),
-            timeout=30
-        )
-        
-        status_code = response.status_code
-        if status_code != 200:
-            print(f"Ошибка для {model}: {status_code}")
-            print(response.text if hasattr(response, 'text') else "Нет текста ошибки")
-            return {
-                "model": model,
-                "response": f"Ошибка: {status_code}",
-                "reasoning_present": False,
-                "status_code": status_code
-            }
-        
-        data = response.json()
-        assistant_message = data['choices'][0]['message']
-        content = assistant_message.get('content', 'Нет содержимого')
-        reasoning_present = 'reasoning_details' in assistant_message
-        
-        print(f"Ответ: {content}")
-        print(f"Reasoning details присутствуют: {reasoning_present}")
-        
-        return {
-            "model": model,
-            "response": content,
-            "reasoning_present": reasoning_present,
-            "status_code": status_code
-        }
-            
-    except requests.exceptions.Timeout:
-        print(f"Таймаут для {model}")
-        return {
-            "model": model,
-            "response": "Таймаут",
-            "reasoning_present": False,
-            "status_code": -1
-        }
-    except requests.exceptions.RequestException as e:
-        print(f"Ошибка сети для {model}: {e}")
-        return {
-            "model": model,
-            "response": f"Ошибка сети: {e}",
-            "reasoning_present": False,
-            "status_code": -2
-        }
-    except KeyError as e:
-        print(f"Ошибка в структуре ответа для {model}: {e}")
-        return {
-            "model": model,
-            "response": f"Ошибка парсинга: {e}",
-            "reasoning_present": False,
-            "status_code": 0
-        }
-    except Exception as e:
-        print(f"Неожиданная ошибка для {model}: {e}")
-        return {
-            "model": model,
-            "response": f"Неожиданная ошибка: {e}",
-            "reasoning_present": False,
-            "status_code": -3
-        }
-
-def save_summarized_result(models_analysis_results):
+# Пул для удаленной суммаризации в режиме "auto": опоздавший запрос дорабатывает в фоне
+_executor = ThreadPoolExecutor(max_workers=4)
+
+
+def save_summarized_result(models_analysis_results, mode=None):
+    """
+    Строит итоговый отчет по результатам моделей выбранным способом.
+
+    Args:
+        models_analysis_results: Список результатов анализа от моделей
+        mode: Режим суммаризации из SUMMARY_MODES (по умолчанию SUMMARY_MODE)
+
+    Returns:
+        Словарь с итоговым отчетом
+    """
+    mode = mode or SUMMARY_MODE
+    if mode not in SUMMARY_MODES:
+        raise ValueError(f"неизвестный режим суммаризации: {mode}")
+
+    if mode == "local":
+        return summarize_locally(models_analysis_results)
+
+    if mode == "auto":
+        future = _executor.submit(summarize_remotely, models_analysis_results)
+        try:
+            summarized_result = future.result(timeout=SUMMARY_REMOTE_DEADLINE)
+        except TimeoutError:
+            print("Удаленная суммаризация не уложилась в срок, используем локальную")
+            return summarize_locally(models_analysis_results)
+        if summarized_result.get("status_code") != 200:
+            print("Удаленная суммаризация завершилась ошибкой, используем локальную")
+            return summarize_locally(models_analysis_results)
+        return summarized_result
+
+    return summarize_remotely(models_analysis_results)
+
+def stream_summarized_result(models_analysis_results, mode=None, cancel_event=None):
+    """
+    Потоковый вариант save_summarized_result: текст отчета отдается по мере генерации.
+
+    В режиме "local" отчет строится сразу целиком. В режиме "auto" таймаут
+    ожидания очередного фрагмента - SUMMARY_REMOTE_DEADLINE, а если модель
+    завершилась ошибкой, не выдав ни одного фрагмента, используется локальный режим.
+
+    Yields:
+        ("delta", фрагмент текста) по мере генерации, затем
+        ("result", итоговый словарь) последним событием
+    """
+    mode = mode or SUMMARY_MODE
+    if mode not in SUMMARY_MODES:
+        raise ValueError(f"неизвестный режим суммаризации: {mode}")
+
+    if mode == "local":
+        yield ("result", summarize_locally(models_analysis_results))
+        return
+
+    timeout = SUMMARY_REMOTE_DEADLINE if mode == "auto" else None
+    emitted = False
+    for event, payload in stream_openrouter_request(
+        OPENROUTER_MODEL, build_summary_prompt(models_analysis_results), cancel_event, timeout
+    ):
+        if event == "delta":
+            emitted = True
+        elif mode == "auto" and not emitted and payload.get("status_code") != 200:
+            print("Удаленная суммаризация завершилась ошибкой, используем локальную")
+            payload = summarize_locally(models_analysis_results)
+        yield (event, payload)
+
+def summarize_remotely(models_analysis_results):
+    """Запрашивает итоговый отчет у модели OpenRouter."""
+    return make_openrouter_request(OPENROUTER_MODEL, build_summary_prompt(models_analysis_results))
+
+def build_summary_prompt(models_analysis_results):
+    """Формирует запрос на итоговый отчет по результатам моделей."""
     analysis_text = ''.join(models_analysis_results)
 
     prompt =    """
@@ -141,7 +140,4 @@ def save_summarized_result(models_analysis_results):
 - Структурированный: Четко следует заданному формату.
 - Практичный: Содержит ясные выводы и предоставляет готовую основу для принятия решений.
     """
-    text = analysis_text + prompt
-    summarized_result = make_openrouter_request(OPENROUTER_MODEL, text)
-    
-    return summarized_result
\ No newline at end of file
+    return analysis_text + prompt
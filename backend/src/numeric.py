@@ -0,0 +1,209 @@
+"""numeric.py - числовое представление значений таблицы сравнения.
+
+Значения в comparison_table - свободный текст ("От 1 990 до 3 588 RUB",
+"бесплатно", "от 49.9% до 69.9%") или флаги True/False. При загрузке данных
+каждая ячейка разбирается в типизированные поля:
+    - min / max  - границы значения (NaN, если граница не указана);
+    - unit       - единица: "RUB", "%" или "" (без единицы);
+    - period     - период: "month", "year" или "";
+    - available  - 1 (есть / True), 0 (нет / False), -1 (не указано).
+
+Поля хранятся по столбцам в массивах NumPy формы (критерии x банки) рядом с
+исходным текстом, поэтому выборка значений для графика и агрегаты по банкам
+(с разбивкой по единицам) выполняются векторно. Разбирается только первое условие ячейки
+(до ";" или перевода строки): оговорки вида "бесплатно при подписке"
+остаются в исходном тексте. Исключение - "бесплатно" / "без комиссии" с
+суммой или процентом дальше в ячейке ("без комиссии до 20 000 ₽/мес.,
+далее - 1,5%"): такое значение условное и не считается нулем (available=-1).
+"""
+
+import re
+from typing import Any, Dict, List, Optional
+
+import numpy as np
+
+UNIT_RUB = "RUB"
+UNIT_PERCENT = "%"
+UNITS = ("", UNIT_RUB, UNIT_PERCENT)
+PERIODS = ("", "month", "year")
+
+_NUMBER = r"\d{1,3}(?:[  ]\d{3})+(?:[.,]\d+)?|\d+(?:[.,]\d+)?"
+_RANGE_RE = re.compile(
+    rf"(?:(?P<from>от)\s*)?(?P<a>{_NUMBER})\s*(?:%|₽|руб\.?|rub|р\.)?\s*(?:(?:до|–|—|-)\s*(?P<b>{_NUMBER}))?(?:\s*(?:%|₽|руб\.?|rub|р\.))?",
+    re.IGNORECASE,
+)
+_UPTO_RE = re.compile(rf"^до\s+(?P<b>{_NUMBER})", re.IGNORECASE)
+_FREE_RE = re.compile(r"^(бесплатно|без комиссии)", re.IGNORECASE)
+_CLAUSE_SPLIT_RE = re.compile(r"[;:\n\t]")
+
+
+def _to_float(number: str) -> float:
+    return float(number.replace(" ", "").replace(" ", "").replace(",", "."))
+
+
+def _detect_unit(text: str) -> str:
+    lowered = text.lower()
+    if "%" in lowered:
+        return UNIT_PERCENT
+    if "₽" in lowered or "руб" in lowered or "rub" in lowered:
+        return UNIT_RUB
+    return ""
+
+
+def _detect_period(text: str) -> str:
+    lowered = text.lower()
+    if "/мес" in lowered or "в месяц" in lowered:
+        return "month"
+    if "/год" in lowered or "в год" in lowered or "годов" in lowered:
+        return "year"
+    return ""
+
+
+def _has_amount(text: str) -> bool:
+    """Есть ли в тексте число с единицей (сумма или процент)"""
+    return any(_detect_unit(text[match.start():match.end() + 8]) for match in _RANGE_RE.finditer(text))
+
+
+def parse_value(raw: Any) -> Dict[str, Any]:
+    """
+    Разбирает значение ячейки таблицы сравнения.
+
+    Returns:
+        Словарь с полями min, max, unit, period, available
+    """
+    parsed = {"min": float("nan"), "max": float("nan"), "unit": "", "period": "", "available": -1}
+    if isinstance(raw, bool):
+        parsed["available"] = int(raw)
+        return parsed
+    if isinstance(raw, (int, float)):
+        parsed.update({"min": float(raw), "max": float(raw), "available": 1})
+        return parsed
+    if not isinstance(raw, str) or not raw.strip():
+        return parsed
+
+    text = raw.strip()
+    head = _CLAUSE_SPLIT_RE.split(text, maxsplit=1)[0].strip()
+
+    free = _FREE_RE.match(head)
+    if free:
+        if _has_amount(text[free.end():]):
+            # Бесплатно только при условии, иначе комиссия - значение неоднозначно
+            return parsed
+        parsed.update({"min": 0.0, "max": 0.0, "unit": UNIT_RUB, "available": 1})
+        return parsed
+
+    upto = _UPTO_RE.match(head)
+    match = upto or _RANGE_RE.search(head)
+    if not match:
+        return parsed
+
+    # Единица и период ищутся рядом с числом, а не во всем условии
+    span = head[match.start():match.end() + 8]
+    unit = _detect_unit(span)
+    if not unit:
+        # Число без единицы (например, "1 балл = 1") не сравнимо с остальными
+        return parsed
+
+    if upto:
+        parsed["max"] = _to_float(upto.group("b"))
+    else:
+        parsed["min"] = _to_float(match.group("a"))
+        if match.group("b"):
+            parsed["max"] = _to_float(match.group("b"))
+        elif not match.group("from"):
+            parsed["max"] = parsed["min"]
+    parsed.update({"unit": unit, "period": _detect_period(span), "available": 1})
+    return parsed
+
+
+class NumericTable:
+    """Столбцовое хранилище разобранных значений: массивы формы (критерии x банки)."""
+
+    def __init__(self, values: Dict[str, Dict[str, Any]]):
+        self.criteria: List[str] = list(values)
+        self.banks: List[str] = sorted({bank for row in values.values() for bank in row})
+        self._criterion_pos = {criterion: i for i, criterion in enumerate(self.criteria)}
+        self._bank_pos = {bank: j for j, bank in enumerate(self.banks)}
+
+        shape = (len(self.criteria), len(self.banks))
+        self.min = np.full(shape, np.nan)
+        self.max = np.full(shape, np.nan)
+        self.unit = np.zeros(shape, dtype=np.int8)
+        self.period = np.zeros(shape, dtype=np.int8)
+        self.available = np.full(shape, -1, dtype=np.int8)
+        self.raw = np.full(shape, None, dtype=object)
+
+        for criterion, row in values.items():
+            i = self._criterion_pos[criterion]
+            for bank, raw in row.items():
+                j = self._bank_pos[bank]
+                parsed = parse_value(raw)
+                self.min[i, j] = parsed["min"]
+                self.max[i, j] = parsed["max"]
+                self.unit[i, j] = UNITS.index(parsed["unit"])
+                self.period[i, j] = PERIODS.index(parsed["period"])
+                self.available[i, j] = parsed["available"]
+                self.raw[i, j] = raw
+
+        # Середина диапазона для графика: если известна одна граница - она сама
+        with np.errstate(invalid="ignore"):
+            self.mid = np.where(
+                np.isnan(self.min), self.max,
+                np.where(np.isnan(self.max), self.min, (self.min + self.max) / 2)
+            )
+
+    def _indices(self, criteria: List[str], banks: List[str]):
+        rows = np.array([self._criterion_pos.get(c, -1) for c in criteria], dtype=np.intp)
+        cols = np.array([self._bank_pos.get(b, -1) for b in banks], dtype=np.intp)
+        return rows, cols
+
+    def slice(self, criteria: List[str], banks: List[str]) -> Dict[str, Dict[str, Dict[str, Any]]]:
+        """Разобранные значения для критериев и банков (канонические названия)"""
+        rows, cols = self._indices(criteria, banks)
+        result = {}
+        for criterion, i in zip(criteria, rows):
+            result[criterion] = {}
+            for bank, j in zip(banks, cols):
+                if i < 0 or j < 0:
+                    result[criterion][bank] = None
+                    continue
+                result[criterion][bank] = {
+                    "min": _json_float(self.min[i, j]),
+                    "max": _json_float(self.max[i, j]),
+                    "value": _json_float(self.mid[i, j]),
+                    "unit": UNITS[self.unit[i, j]],
+                    "period": PERIODS[self.period[i, j]],
+                    "available": int(self.available[i, j]),
+                }
+        return result
+
+    def aggregate(self, criteria: List[str], banks: List[str]) -> Dict[str, Dict[str, Dict[str, Any]]]:
+        """
+        Минимум, медиана и максимум значений по выбранным банкам для каждого критерия.
+
+        Значения с разными единицами (например, % и RUB) не сравнимы, поэтому
+        агрегаты считаются отдельно для каждой единицы: {критерий: {единица: {...}}}.
+        """
+        rows, cols = self._indices(criteria, banks)
+        cols = cols[cols >= 0]
+        result = {}
+        for criterion, i in zip(criteria, rows):
+            result[criterion] = {}
+            if i < 0:
+                continue
+            values, units = self.mid[i, cols], self.unit[i, cols]
+            known = ~np.isnan(values)
+            for unit_code in np.unique(units[known]):
+                unit_values = values[known & (units == unit_code)]
+                result[criterion][UNITS[unit_code]] = {
+                    "min": _json_float(unit_values.min()),
+                    "median": _json_float(np.median(unit_values)),
+                    "max": _json_float(unit_values.max()),
+                    "count": int(unit_values.size),
+                }
+        return result
+
+
+def _json_float(value) -> Optional[float]:
+    value = float(value)
+    return None if np.isnan(value) else value
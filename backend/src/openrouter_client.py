@@ -0,0 +1,317 @@
+"""openrouter_client.py - общий HTTP-клиент для OpenRouter.
+
+Все этапы (анализ, суммаризация, улучшение) используют одну долгоживущую
+сессию requests с пулом keep-alive соединений, поэтому TLS-рукопожатие с
+openrouter.ai выполняется один раз, а не на каждый запрос.
+
+Параметры задаются переменными окружения:
+    - OPENROUTER_BASE_URL         - адрес API (например, локальной заглушки tools/mock_llm.py);
+    - OPENROUTER_POOL_SIZE        - макс. число соединений в пуле;
+    - OPENROUTER_WARM_CONNECTIONS - сколько соединений открыть при прогреве.
+
+Сессия зарегистрирована в реестре провайдеров (src/providers.py): она
+создается при первом запросе или при фоновом прогреве после старта.
+"""
+
+import json
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+from requests.adapters import HTTPAdapter
+
+from src.provider_health import get_provider_health, STATUS_CIRCUIT_OPEN, STATUS_CANCELLED
+from src.providers import registry
+
+# Конфигурация для OpenRouter
+OPENROUTER_API_KEY = os.getenv("OPENROUTER_API_KEY") or "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"
+OPENROUTER_BASE_URL = os.getenv("OPENROUTER_BASE_URL", "https://openrouter.ai/api/v1")
+OPENROUTER_CHAT_URL = f"{OPENROUTER_BASE_URL}/chat/completions"
+
+POOL_SIZE = int(os.getenv("OPENROUTER_POOL_SIZE", "10"))
+WARM_CONNECTIONS = int(os.getenv("OPENROUTER_WARM_CONNECTIONS", "3"))
+
+PROVIDER_NAME = "openrouter"
+
+
+def _create_session():
+    """Создает сессию с пулом keep-alive соединений."""
+    session = requests.Session()
+    adapter = HTTPAdapter(pool_connections=1, pool_maxsize=POOL_SIZE)
+    session.mount("https://", adapter)
+    session.mount("http://", adapter)
+    session.headers.update({
+        "Authorization": f"Bearer {OPENROUTER_API_KEY}",
+        "Content-Type": "application/json",
+    })
+    return session
+
+
+def _warm_connections(session):
+    """Заранее открывает соединения с OpenRouter, чтобы первый запрос не платил за TLS."""
+    def _open_connection(_):
+        try:
+            session.head(OPENROUTER_BASE_URL, timeout=5)
+            return True
+        except requests.exceptions.RequestException as e:
+            print(f"Не удалось прогреть соединение с OpenRouter: {e}")
+            return False
+
+    with ThreadPoolExecutor(max_workers=WARM_CONNECTIONS) as executor:
+        opened = sum(executor.map(_open_connection, range(WARM_CONNECTIONS)))
+    print(f"=== Прогрето соединений с OpenRouter: {opened}/{WARM_CONNECTIONS} ===")
+
+
+registry.register(PROVIDER_NAME, _create_session, warm=_warm_connections, close=lambda session: session.close())
+
+
+def get_session():
+    """Возвращает общую сессию, создавая её при первом обращении."""
+    return registry.get(PROVIDER_NAME)
+
+
+def make_openrouter_request(model, prompt):
+    """
+    Выполняет запрос к OpenRouter API для указанной модели и возвращает результаты.
+
+    Таймаут подбирается по истории задержек модели, а при открытом
+    выключателе запрос не отправляется вовсе.
+    """
+    health = get_provider_health(model)
+    if not health.allow():
+        print(f"Провайдер {model} временно отключен (circuit breaker)")
+        return {
+            "model": model,
+            "response": "Провайдер временно недоступен",
+            "reasoning_present": False,
+            "status_code": STATUS_CIRCUIT_OPEN
+        }
+
+    started_at = time.monotonic()
+    result = _post_chat_completion(model, prompt, health.timeout())
+    health.record(result["status_code"], time.monotonic() - started_at)
+    return result
+
+
+def _post_chat_completion(model, prompt, timeout):
+    """Отправляет запрос chat/completions и приводит ответ к общему формату."""
+    try:
+        print(f"=== Запрос для модели {model} (OpenRouter) ===")
+        response = get_session().post(
+            url=OPENROUTER_CHAT_URL,
+            data=json.dumps({
+                "model": model,
+                "messages": [
+                    {
+                        "role": "user",
+                        "content": prompt
+                    }
+                ],
+                "extra_body": {"reasoning": {"enabled": True}}
+            }),
+            timeout=timeout
+        )
+        
+        status_code = response.status_code
+        if status_code != 200:
+            print(f"Ошибка для {model}: {status_code}")
+            print(response.text if hasattr(response, 'text') else "Нет текста ошибки")
+            return {
+                "model": model,
+                "response": f"Ошибка: {status_code}",
+                "reasoning_present": False,
+                "status_code": status_code
+            }
+        
+        data = response.json()
+        assistant_message = data['choices'][0]['message']
+        content = assistant_message.get('content', 'Нет содержимого')
+        reasoning_present = 'reasoning_details' in assistant_message
+        
+        print(f"Ответ: {content}")
+        print(f"Reasoning details присутствуют: {reasoning_present}")
+        
+        return {
+            "model": model,
+            "response": content,
+            "reasoning_present": reasoning_present,
+            "status_code": status_code
+        }
+            
+    except requests.exceptions.Timeout:
+        print(f"Таймаут для {model}")
+        return {
+            "model": model,
+            "response": "Таймаут",
+            "reasoning_present": False,
+            "status_code": -1
+        }
+    except requests.exceptions.RequestException as e:
+        print(f"Ошибка сети для {model}: {e}")
+        return {
+            "model": model,
+            "response": f"Ошибка сети: {e}",
+            "reasoning_present": False,
+            "status_code": -2
+        }
+    except KeyError as e:
+        print(f"Ошибка в структуре ответа для {model}: {e}")
+        return {
+            "model": model,
+            "response": f"Ошибка парсинга: {e}",
+            "reasoning_present": False,
+            "status_code": 0
+        }
+    except Exception as e:
+        print(f"Неожиданная ошибка для {model}: {e}")
+        return {
+            "model": model,
+            "response": f"Неожиданная ошибка: {e}",
+            "reasoning_present": False,
+            "status_code": -3
+        }
+
+
+def stream_health_key(model):
+    """Ключ состояния потоковых запросов модели.
+
+    Для потока задержка - время до первого фрагмента; если учитывать ее вместе
+    с полными ответами, адаптивный таймаут непотоковых запросов той же модели
+    станет слишком коротким.
+    """
+    return f"{model}:stream"
+
+
+def stream_openrouter_request(model, prompt, cancel_event=None, timeout=None):
+    """
+    Потоковый запрос к OpenRouter (stream: true): текст отдается по мере генерации.
+
+    Если установлен cancel_event (клиент отключился), соединение закрывается
+    и OpenRouter прекращает генерацию, так что брошенные ответы не оплачиваются.
+
+    Args:
+        model: Модель OpenRouter
+        prompt: Текст запроса
+        cancel_event: threading.Event, сигнализирующий об отмене
+        timeout: Таймаут ожидания очередного фрагмента, сек. (по умолчанию адаптивный)
+
+    Yields:
+        ("delta", фрагмент текста) по мере генерации, затем
+        ("result", словарь в формате make_openrouter_request) последним событием
+    """
+    health = get_provider_health(stream_health_key(model))
+    if not health.allow():
+        print(f"Провайдер {model} временно отключен (circuit breaker)")
+        yield ("result", {
+            "model": model,
+            "response": "Провайдер временно недоступен",
+            "reasoning_present": False,
+            "status_code": STATUS_CIRCUIT_OPEN
+        })
+        return
+
+    result = yield from _stream_chat_completion(model, prompt, timeout or health.timeout(), cancel_event, health)
+    yield ("result", result)
+
+
+def _stream_chat_completion(model, prompt, timeout, cancel_event, health):
+    """
+    Читает SSE-поток chat/completions и отдает фрагменты текста.
+
+    Для адаптивного таймаута учитывается время до первого фрагмента: именно
+    его ограничивает таймаут чтения потокового запроса. Оно записывается в
+    отдельное состояние (stream_health_key), а не в состояние полных ответов.
+
+    Returns:
+        Итоговый словарь в формате make_openrouter_request
+    """
+    started_at = time.monotonic()
+    recorded = False
+    chunks = []
+    reasoning_present = False
+    status_code = 200
+    response = None
+
+    def _result(text, code):
+        return {"model": model, "response": text, "reasoning_present": reasoning_present, "status_code": code}
+
+    try:
+        print(f"=== Потоковый запрос для модели {model} (OpenRouter) ===")
+        response = get_session().post(
+            url=OPENROUTER_CHAT_URL,
+            data=json.dumps({
+                "model": model,
+                "messages": [
+                    {
+                        "role": "user",
+                        "content": prompt
+                    }
+                ],
+                "stream": True,
+                "extra_body": {"reasoning": {"enabled": True}}
+            }),
+            timeout=timeout,
+            stream=True
+        )
+
+        if response.status_code != 200:
+            print(f"Ошибка для {model}: {response.status_code}")
+            status_code = response.status_code
+            return _result(f"Ошибка: {status_code}", status_code)
+
+        for line in response.iter_lines(decode_unicode=True):
+            if cancel_event is not None and cancel_event.is_set():
+                print(f"Генерация {model} отменена клиентом")
+                status_code = STATUS_CANCELLED
+                return _result("".join(chunks), status_code)
+            # Пустые строки разделяют события, строки с ":" - комментарии keep-alive
+            if not line or not line.startswith("data:"):
+                continue
+            payload = line[len("data:"):].strip()
+            if payload == "[DONE]":
+                break
+
+            data = json.loads(payload)
+            if "error" in data:
+                print(f"Ошибка в потоке для {model}: {data['error']}")
+                status_code = -3
+                return _result(f"Ошибка: {data['error'].get('message', data['error'])}", status_code)
+
+            delta = data["choices"][0].get("delta", {})
+            if "reasoning" in delta or "reasoning_details" in delta:
+                reasoning_present = True
+            content = delta.get("content")
+            if content:
+                if not recorded:
+                    health.record(200, time.monotonic() - started_at)
+                    recorded = True
+                chunks.append(content)
+                yield ("delta", content)
+
+        content = "".join(chunks) or "Нет содержимого"
+        print(f"Ответ (поток): {content}")
+        return _result(content, 200)
+
+    except requests.exceptions.Timeout:
+        print(f"Таймаут для {model}")
+        status_code = -1
+        return _result("Таймаут", status_code)
+    except requests.exceptions.RequestException as e:
+        print(f"Ошибка сети для {model}: {e}")
+        status_code = -2
+        return _result(f"Ошибка сети: {e}", status_code)
+    except (json.JSONDecodeError, KeyError, IndexError) as e:
+        print(f"Ошибка в структуре потока для {model}: {e}")
+        status_code = 0
+        return _result(f"Ошибка парсинга: {e}", status_code)
+    except Exception as e:
+        print(f"Неожиданная ошибка для {model}: {e}")
+        status_code = -3
+        return _result(f"Неожиданная ошибка: {e}", status_code)
+    finally:
+        if response is not None:
+            # Закрытие соединения обрывает генерацию на стороне провайдера
+            response.close()
+        if not recorded:
+            health.record(status_code, time.monotonic() - started_at)
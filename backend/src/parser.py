@@ -1,42 +1,57 @@
+"""parser.py - парсер каталога карт banki.ru.
+
+Каталог сначала читается быстрым путем: страница скачивается обычным
+HTTP-клиентом (requests.Session с пулом соединений), и предложения
+извлекаются из серверного HTML или из встроенного JSON состояния страницы
+(parse_catalog_html - чистая функция, ее можно проверять на сохраненных
+страницах без сети: python parser.py --html saved_page.html). Браузер
+(Selenium + Chrome) запускается, только если быстрый путь ничего не нашел
+или для предложений нужны данные из popup "Подробнее". Selenium
+импортируется лениво, поэтому для быстрого пути он не нужен.
+
+Вместо фиксированных пауз браузер ждет явных условий (см. "Ожидания"):
+затишья изменений DOM (MutationObserver), простоя сети (журнал CDP
+Network.* из performance-логов Chrome) и стабилизации числа элементов.
+У каждого ожидания есть верхняя граница, время каждого шага пишется в лог.
+
+Из браузера не копируется весь page_source: карточки каталога извлекаются
+одним execute_script в виде JSON, а из popup передается только его
+поддерево, которое разбирается lxml (если установлен, иначе html.parser).
+Кнопка "Подробнее" продукта ищется в DOM открытой страницы по банку и
+названию (find_offer_button), а не по позиции в списке каталога.
+
+Полное обновление (scrape_parallel) распределяет работу по пулу процессов,
+у каждого из которых свой браузер: каталоги всех типов продуктов читаются
+параллельно, а popup каждого типа делятся на части между процессами.
+Результаты собираются в один CSV:
+    python parser.py --types creditcards debitcards deposits --workers 4
+"""
+
+import argparse
+import json
+import os
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import util as mp_util
 import requests
+from requests.adapters import HTTPAdapter
 from bs4 import BeautifulSoup
-from urllib.parse import urljoin
-import pandas as pd
 import time
 import re
-from typing import List, Dict, Set
-from selenium import webdriver
-from selenium.webdriver.common.by import By
-from selenium.webdriver.chrome.options import Options
-from selenium.webdriver.support.ui import WebDriverWait
-from selenium.webdriver.support import expected_conditions as EC
-from selenium.webdriver.common.action_chains import ActionChains
-from selenium.common.exceptions import TimeoutException, NoSuchElementException
-
-# Заданные множества (расширены по HTML popup)
-card_types: Set[str] = {"Дебетовая карта", "Кредитная карта"}
-banks: Set[str] = {
-    "Альфа-Банк", "ВТБ", "Газпромбанк", "Московский Кредитный Банк (МКБ)", 
-    "Промсвязьбанк (ПСБ)", "ПСБ", "Райффайзенбанк", "Россельхозбанк", 
-    "Совкомбанк", "Т-Банк", "Банк ДОМ.РФ", "ЮниКредит Банк"
-}
-criterias: Set[str] = {
-    "Стоимость обслуживания (дебетовая)", "Стоимость обслуживания (кредитная)",
-    "СМС-уведомления", "Снятие наличных в других банках",
-    "Переводы по реквизитам в другие банки", "Процент на остаток", 
-    "Кредитный лимит", "Процентные ставки", "Первоначальный взнос", 
-    "Программа лояльности (дебетовая)", "Программа лояльности (кредитная)"
-}
+from contextlib import contextmanager
+from typing import Any, List, Dict, Optional
 
-# Маппинг реальных названий из popup на criterias
-CRITERIA_MAP = {
-    'Годовое обслуживание': 'Стоимость обслуживания (кредитная)',
-    'Кредитный лимит': 'Кредитный лимит',
-    'Процентная ставка': 'Процентные ставки',
-    'Снятие наличных в любых банкоматах': 'Снятие наличных в других банках',
-    'Баллы': 'Программа лояльности (кредитная)',
-    'Льготный период': 'Льготный период',  # Можно добавить в criterias если нужно
-}
+# Быстрый парсер HTML, если установлен lxml
+try:
+    import lxml  # noqa: F401
+    HTML_PARSER = 'lxml'
+except ImportError:
+    HTML_PARSER = 'html.parser'
+
+# Критерии и индексы названий банков и критериев - в общем справочнике
+try:
+    from src.catalog import criterias, BANK_INDEX, CRITERIA_INDEX
+except ImportError:
+    from catalog import criterias, BANK_INDEX, CRITERIA_INDEX
 
 endpoints = {
     'deposits': 'https://www.banki.ru/products/deposits/',
@@ -48,7 +63,377 @@ HEADERS = {
     'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36'
 }
 
+HTTP_TIMEOUT = 15
+SCRAPE_WORKERS = min(os.cpu_count() or 1, 4)
+
+# Ожидания браузера: верхние границы и интервалы затишья, сек.
+PAGE_READY_TIMEOUT = float(os.getenv("SCRAPE_PAGE_READY_TIMEOUT", "20"))
+POPUP_READY_TIMEOUT = float(os.getenv("SCRAPE_POPUP_READY_TIMEOUT", "10"))
+DOM_QUIET_PERIOD = float(os.getenv("SCRAPE_DOM_QUIET_PERIOD", "0.5"))
+NETWORK_IDLE_PERIOD = float(os.getenv("SCRAPE_NETWORK_IDLE_PERIOD", "0.5"))
+# Сколько незавершенных запросов еще считается простоем (как networkidle2):
+# long-poll и аналитика могут не завершаться никогда
+NETWORK_IDLE_MAX_IN_FLIGHT = int(os.getenv("SCRAPE_NETWORK_IDLE_MAX_IN_FLIGHT", "2"))
+# Типы запросов CDP, которые не завершаются по своей природе и не учитываются
+NETWORK_IGNORED_TYPES = {"WebSocket", "EventSource", "Ping"}
+WAIT_POLL_INTERVAL = float(os.getenv("SCRAPE_WAIT_POLL_INTERVAL", "0.1"))
+# Пауза между продуктами (вежливость к сайту), по умолчанию без паузы
+PRODUCT_DELAY = float(os.getenv("SCRAPE_PRODUCT_DELAY", "0"))
+
+# Скрипты со встроенным состоянием страницы (Next.js и window.__STATE__ = {...})
+STATE_SCRIPT_RE = re.compile(r"window\.__[A-Z_]+__\s*=\s*(\{.*\})\s*;?\s*$", re.DOTALL)
+# Ключи, под которыми в состоянии страницы лежат банк и название продукта
+STATE_BANK_KEYS = ("bankName", "companyName", "bank", "company", "organization")
+STATE_NAME_KEYS = ("productName", "name", "title")
+STATE_FEATURE_KEYS = ("features", "parameters", "characteristics")
+
+_http_session: Optional[requests.Session] = None
+
+
+def get_http_session() -> requests.Session:
+    """Общая HTTP-сессия с пулом соединений для быстрого пути"""
+    global _http_session
+    if _http_session is None:
+        session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=4, pool_maxsize=8, max_retries=2)
+        session.mount('https://', adapter)
+        session.mount('http://', adapter)
+        session.headers.update(HEADERS)
+        session.headers.update({'Accept-Language': 'ru-RU,ru;q=0.9'})
+        _http_session = session
+    return _http_session
+
+
+def product_type_label(product_type: str) -> str:
+    return "Кредитная карта" if 'creditcards' in product_type else "Дебетовая карта" if 'debitcards' in product_type else 'Вклад'
+
+
+def _state_text(value: Any) -> Optional[str]:
+    """Строковое значение поля состояния: сама строка или поле name/title вложенного объекта"""
+    if isinstance(value, str):
+        return value.strip() or None
+    if isinstance(value, dict):
+        for key in ("name", "title", "shortName"):
+            if isinstance(value.get(key), str):
+                return value[key].strip() or None
+    return None
+
+
+def _state_details(offer: Dict[str, Any]) -> Dict[str, str]:
+    """Критерии предложения из состояния страницы: список {title, value}"""
+    details = {}
+    for key in STATE_FEATURE_KEYS:
+        features = offer.get(key)
+        if not isinstance(features, list):
+            continue
+        for feature in features:
+            if not isinstance(feature, dict):
+                continue
+            title = _state_text(feature.get("title") or feature.get("name"))
+            value = feature.get("value") or feature.get("text")
+            if title and isinstance(value, (str, int, float)):
+                mapped = CRITERIA_INDEX.resolve(title, fuzzy=False) or title
+                details[mapped] = str(value).strip()
+    return details
+
+
+def _iter_state_offers(node: Any):
+    """Обходит состояние страницы и отдает объекты, похожие на предложения (банк + название)"""
+    stack = [node]
+    while stack:
+        current = stack.pop()
+        if isinstance(current, dict):
+            bank_name = next((_state_text(current.get(key)) for key in STATE_BANK_KEYS if _state_text(current.get(key))), None)
+            product_name = next((current[key] for key in STATE_NAME_KEYS if isinstance(current.get(key), str)), None)
+            if bank_name and product_name:
+                yield bank_name, product_name.strip(), current
+                continue
+            stack.extend(reversed(list(current.values())))
+        elif isinstance(current, list):
+            stack.extend(reversed(current))
+
+
+def _load_page_state(soup: BeautifulSoup) -> List[Any]:
+    """Встроенные JSON-состояния страницы (__NEXT_DATA__, application/json, window.__STATE__)"""
+    states = []
+    for script in soup.find_all('script'):
+        text = script.string or script.get_text()
+        if not text:
+            continue
+        if script.get('type') in ('application/json', 'application/ld+json') or script.get('id') == '__NEXT_DATA__':
+            payload = text
+        else:
+            match = STATE_SCRIPT_RE.search(text.strip())
+            if not match:
+                continue
+            payload = match.group(1)
+        try:
+            states.append(json.loads(payload))
+        except ValueError:
+            continue
+    return states
+
+
+def parse_catalog_html(html: str, product_type: str) -> List[Dict]:
+    """
+    Извлекает предложения нужных банков из HTML страницы каталога без браузера.
+
+    Сначала разбирается серверная разметка (те же data-test, что и в
+    Selenium-пути), затем встроенное JSON-состояние страницы. Из состояния
+    дополнительно берутся критерии предложения (поле details), если они там есть.
+
+    Returns:
+        Список продуктов {bank, name, type[, details]}; popup продукта в браузере
+        находится по банку и названию (find_offer_button)
+    """
+    soup = BeautifulSoup(html, HTML_PARSER)
+    label = product_type_label(product_type)
+    products = []
+
+    for item in soup.find_all('div', {'data-test': 'offers-grouped-list-item'}):
+        bank_elem = item.select_one('[data-test="offer-company"]')
+        bank = BANK_INDEX.resolve(bank_elem.get_text(strip=True), fuzzy=False) if bank_elem else None
+        if not bank:
+            continue
+        name_elem = item.select_one('[data-test="offer-product-name"]')
+        products.append({
+            'bank': bank,
+            'name': name_elem.get_text(' ', strip=True) if name_elem else 'N/A',
+            'type': label,
+        })
+    if products:
+        return products
+
+    seen = set()
+    for state in _load_page_state(soup):
+        for bank_name, product_name, offer in _iter_state_offers(state):
+            bank = BANK_INDEX.resolve(bank_name, fuzzy=False)
+            if not bank or (bank, product_name) in seen:
+                continue
+            seen.add((bank, product_name))
+            product = {'bank': bank, 'name': product_name, 'type': label}
+            details = _state_details(offer)
+            if details:
+                product['details'] = details
+            products.append(product)
+    return products
+
+
+def catalog_page_url(url: str, page: int = 1) -> str:
+    return url if page <= 1 else f"{url}?page={page}"
+
+
+def fetch_catalog_html(url: str, page: int = 1) -> Optional[str]:
+    """Скачивает страницу каталога обычным HTTP-запросом; None при ошибке или блокировке"""
+    params = {'page': page} if page > 1 else None
+    try:
+        response = get_http_session().get(url, params=params, timeout=HTTP_TIMEOUT)
+    except requests.exceptions.RequestException as e:
+        print(f"⚠️ HTTP-запрос каталога не удался: {e}")
+        return None
+    if response.status_code != 200:
+        print(f"⚠️ HTTP {response.status_code} для {response.url}")
+        return None
+    return response.text
+
+
+def parse_catalog_http(url: str, product_type: str, max_pages: int = 2) -> List[Dict]:
+    """Быстрый путь: каталог через HTTP без браузера; у продуктов указана страница каталога (page)"""
+    products = []
+    for page in range(1, max_pages + 1):
+        started_at = time.monotonic()
+        html = fetch_catalog_html(url, page)
+        if html is None:
+            break
+        page_products = parse_catalog_html(html, product_type)
+        print(f"⚡ Стр. {page}: {len(page_products)} продуктов по HTTP за {time.monotonic() - started_at:.1f} с")
+        if not page_products:
+            break
+        for product in page_products:
+            product['page'] = page
+        products.extend(page_products)
+    return products
+
+
+def parse_catalog(url: str, product_type: str, max_pages: int = 2, driver_factory=None):
+    """
+    Каталог быстрым путем, при пустом результате - через Selenium.
+
+    Returns:
+        (продукты, driver): driver создается только для Selenium-пути, иначе None
+    """
+    products = parse_catalog_http(url, product_type, max_pages)
+    if products:
+        return products, None
+    print("⚠️ Быстрый путь ничего не нашел, запускаем браузер")
+    driver = (driver_factory or setup_driver)()
+    return parse_catalog_selenium(driver, url, product_type, max_pages), driver
+
+
+# --- Ожидания ---
+
+@contextmanager
+def timed_step(name: str):
+    """Пишет в лог, сколько занял шаг"""
+    started_at = time.monotonic()
+    try:
+        yield
+    finally:
+        print(f"⏱ {name}: {time.monotonic() - started_at:.2f} с")
+
+
+def _poll_until(check, timeout: float) -> bool:
+    """Вызывает check до успеха или истечения timeout; True, если условие выполнено"""
+    deadline = time.monotonic() + timeout
+    while True:
+        if check():
+            return True
+        if time.monotonic() >= deadline:
+            return False
+        time.sleep(WAIT_POLL_INTERVAL)
+
+
+# Отметка времени последнего изменения DOM (в мс performance.now())
+MUTATION_OBSERVER_SCRIPT = """
+    if (!window.__scrapeObserver) {
+        window.__lastMutation = performance.now();
+        window.__scrapeObserver = new MutationObserver(function () {
+            window.__lastMutation = performance.now();
+        });
+        window.__scrapeObserver.observe(document, {childList: true, subtree: true, attributes: true, characterData: true});
+    }
+    return performance.now() - window.__lastMutation;
+"""
+
+
+def wait_dom_quiet(driver, quiet: float = DOM_QUIET_PERIOD, timeout: float = PAGE_READY_TIMEOUT) -> bool:
+    """Ждет, пока DOM не меняется quiet секунд (не дольше timeout)"""
+    return _poll_until(lambda: driver.execute_script(MUTATION_OBSERVER_SCRIPT) >= quiet * 1000, timeout)
+
+
+def _network_in_flight(driver, pending: set) -> Optional[int]:
+    """Число незавершенных запросов по событиям CDP из performance-лога; None, если лог недоступен"""
+    try:
+        entries = driver.get_log('performance')
+    except Exception:
+        return None
+    for entry in entries:
+        try:
+            message = json.loads(entry['message'])['message']
+        except (KeyError, ValueError):
+            continue
+        method = message.get('method', '')
+        request_id = message.get('params', {}).get('requestId')
+        if method == 'Network.requestWillBeSent':
+            if message['params'].get('type') not in NETWORK_IGNORED_TYPES:
+                pending.add(request_id)
+        elif method in ('Network.loadingFinished', 'Network.loadingFailed'):
+            pending.discard(request_id)
+    return len(pending)
+
+
+def wait_network_idle(driver, idle: float = NETWORK_IDLE_PERIOD, timeout: float = PAGE_READY_TIMEOUT) -> bool:
+    """
+    Ждет, пока у страницы не больше NETWORK_IDLE_MAX_IN_FLIGHT незавершенных
+    запросов idle секунд (не дольше timeout).
+
+    Запросы считаются по событиям Network.* CDP (WebSocket, EventSource и
+    ping-запросы не учитываются); если performance-лог
+    недоступен - по стабилизации числа загруженных ресурсов (Resource Timing).
+    """
+    pending = set()
+    state = {"count": None, "idle_since": time.monotonic()}
+
+    def check():
+        in_flight = _network_in_flight(driver, pending)
+        if in_flight is None:
+            in_flight = driver.execute_script("return performance.getEntriesByType('resource').length")
+            busy = in_flight != state["count"]
+            state["count"] = in_flight
+        else:
+            busy = in_flight > NETWORK_IDLE_MAX_IN_FLIGHT
+        now = time.monotonic()
+        if busy:
+            state["idle_since"] = now
+        return now - state["idle_since"] >= idle
+
+    return _poll_until(check, timeout)
+
+
+def wait_count_stable(driver, css: str, stable: float = DOM_QUIET_PERIOD, timeout: float = PAGE_READY_TIMEOUT) -> int:
+    """Ждет, пока число элементов css больше нуля и не меняется stable секунд; возвращает его"""
+    state = {"count": -1, "since": time.monotonic()}
+
+    def check():
+        count = driver.execute_script("return document.querySelectorAll(arguments[0]).length", css)
+        now = time.monotonic()
+        if count != state["count"]:
+            state["count"], state["since"] = count, now
+        return count > 0 and now - state["since"] >= stable
+
+    _poll_until(check, timeout)
+    return max(state["count"], 0)
+
+
+# Карточки каталога одним вызовом: банк, название и номер кнопки "Подробнее" среди всех кнопок страницы
+CATALOG_EXTRACT_SCRIPT = """
+    var buttons = Array.from(document.querySelectorAll('button[data-test="offer-info-button"]'));
+    return Array.from(document.querySelectorAll('div[data-test="offers-grouped-list-item"]')).map(function (item) {
+        var text = function (selector) {
+            var el = item.querySelector(selector);
+            return el ? el.textContent.trim() : null;
+        };
+        var button = item.querySelector('button[data-test="offer-info-button"]');
+        return {
+            company: text('[data-test="offer-company"]'),
+            name: text('[data-test="offer-product-name"]'),
+            buttonIndex: button ? buttons.indexOf(button) : -1
+        };
+    });
+"""
+
+def _offer_name_key(name: str) -> str:
+    """Название для сравнения: get_text и textContent по-разному склеивают вложенные теги"""
+    return re.sub(r'\s+', '', name).casefold()
+
+
+def find_offer_button(items: List[Dict], bank: str, name: str) -> int:
+    """
+    Номер кнопки "Подробнее" предложения банка bank с названием name.
+
+    Args:
+        items: Карточки текущей страницы браузера (результат CATALOG_EXTRACT_SCRIPT)
+
+    Returns:
+        Номер кнопки среди всех кнопок страницы или -1, если карточки на странице нет
+        (например, продукт со следующей страницы каталога)
+    """
+    name_key = _offer_name_key(name)
+    for item in items:
+        if item.get('buttonIndex', -1) < 0 or not item.get('company'):
+            continue
+        if _offer_name_key(item.get('name') or 'N/A') != name_key:
+            continue
+        if BANK_INDEX.resolve(item['company'], fuzzy=False) == bank:
+            return item['buttonIndex']
+    return -1
+
+
+def locate_offer_button(driver, bank: str, name: str) -> int:
+    """Ищет кнопку "Подробнее" продукта в DOM открытой страницы (см. find_offer_button)"""
+    return find_offer_button(driver.execute_script(CATALOG_EXTRACT_SCRIPT) or [], bank, name)
+
+
+POPUP_EXTRACT_SCRIPT = """
+    var popup = document.querySelector('[data-test="detailed-popup"]');
+    return popup ? popup.outerHTML : null;
+"""
+
+
 def setup_driver(headless=True):
+    from selenium import webdriver
+    from selenium.webdriver.chrome.options import Options
+
     options = Options()
     if headless:
         options.add_argument('--headless=new')  # New headless mode (less detectable)
@@ -61,6 +446,8 @@ def setup_driver(headless=True):
     options.add_experimental_option("excludeSwitches", ["enable-automation"])
     options.add_experimental_option('useAutomationExtension', False)
     options.add_argument(f'--user-agent={HEADERS["User-Agent"]}')
+    # События Network.* CDP для wait_network_idle
+    options.set_capability('goog:loggingPrefs', {'performance': 'ALL'})
     driver = webdriver.Chrome(options=options)
     driver.execute_script("Object.defineProperty(navigator, 'webdriver', {get: () => undefined})")
     driver.execute_script("Object.defineProperty(navigator, 'plugins', {get: () => [1, 2, 3, 4, 5]})")
@@ -68,71 +455,69 @@ def setup_driver(headless=True):
     return driver
 
 def parse_catalog_selenium(driver, url: str, product_type: str, max_pages: int = 2) -> List[Dict]:
+    from selenium.webdriver.common.by import By
+    from selenium.webdriver.support.ui import WebDriverWait
+    from selenium.webdriver.support import expected_conditions as EC
+    from selenium.common.exceptions import TimeoutException
+
     products = []
-    driver.get(url)
+    offers_css = 'div[data-test="offers-grouped-list-item"]'
+    with timed_step("Загрузка страницы"):
+        driver.get(url)
     
-    # Шаг 1: Ждем базовую загрузку страницы (title или body)
-    WebDriverWait(driver, 15).until(
-        lambda d: d.execute_script("return document.readyState") == "complete"
-    )
-    time.sleep(5)  # Доп. пауза для JS modules
+    # Шаг 1: Ждем базовую загрузку страницы и окончание запросов JS-модулей
+    with timed_step("Готовность страницы"):
+        WebDriverWait(driver, PAGE_READY_TIMEOUT).until(
+            lambda d: d.execute_script("return document.readyState") == "complete"
+        )
+        wait_network_idle(driver)
     
     # Шаг 2: Ждем счетчик предложений (раньше list-item)
     try:
-        WebDriverWait(driver, 20).until(
-            EC.presence_of_element_located((By.CSS_SELECTOR, '[data-test="offers-count"]'))
-        )
+        with timed_step("Счетчик предложений"):
+            WebDriverWait(driver, PAGE_READY_TIMEOUT).until(
+                EC.presence_of_element_located((By.CSS_SELECTOR, '[data-test="offers-count"]'))
+            )
         print("✅ Счетчик предложений загружен")
     except TimeoutException:
         print("⚠️ Счетчик не найден, пробуем прямой поиск list-item")
     
-    # Шаг 3: Скролл вниз для lazy-load
-    driver.execute_script("window.scrollTo(0, document.body.scrollHeight / 2);")
-    time.sleep(3)
-    driver.execute_script("window.scrollTo(0, document.body.scrollHeight);")
-    time.sleep(5)
+    # Шаг 3: Скролл вниз для lazy-load - ждем, пока число карточек перестанет расти
+    with timed_step("Lazy-load предложений"):
+        driver.execute_script("window.scrollTo(0, document.body.scrollHeight / 2);")
+        wait_count_stable(driver, offers_css)
+        driver.execute_script("window.scrollTo(0, document.body.scrollHeight);")
+        wait_count_stable(driver, offers_css)
     
     # Основной парсинг (несколько попыток)
     for attempt in range(3):
-        soup = BeautifulSoup(driver.page_source, 'html.parser')
-        product_items = soup.find_all('div', {'data-test': 'offers-grouped-list-item'})
+        product_items = driver.execute_script(CATALOG_EXTRACT_SCRIPT) or []
         
         if product_items:
             print(f"✅ Найдено {len(product_items)} продуктов на стр. 1")
             break
         print(f"Попытка {attempt+1}: list-item не найдены, повторный скролл...")
-        driver.execute_script("window.scrollTo(0, document.body.scrollHeight);")
-        time.sleep(3)
+        with timed_step("Повторный скролл"):
+            driver.execute_script("window.scrollTo(0, document.body.scrollHeight);")
+            wait_count_stable(driver, offers_css)
     else:
         print("❌ Продукты не загружены. Сайт заблокировал?")
         return []
     
     # Парсим найденные
     for item in product_items:
-        bank_elem = item.select_one('[data-test="offer-company"]')
-        if not bank_elem or bank_elem.get_text(strip=True) not in banks:
+        bank = BANK_INDEX.resolve(item['company'], fuzzy=False) if item.get('company') else None
+        if not bank:
             continue
         
-        name_elem = item.select_one('[data-test="offer-product-name"]')
-        product_name = name_elem.get_text(strip=True) if name_elem else 'N/A'
-        
-        # Кнопка "Подробнее" (Selenium WebElement для клика)
-        try:
-            info_button = driver.execute_script("""
-                var btn = arguments[0].querySelector('button[data-test="offer-info-button"]');
-                return btn ? {element: btn} : null;
-            """, item)
-            if not info_button:
-                continue
-        except:
+        # Без кнопки "Подробнее" popup не открыть
+        if item.get('buttonIndex', -1) < 0:
             continue
         
         products.append({
-            'bank': bank_elem.get_text(strip=True),
-            'name': product_name,
-            'type': "Кредитная карта" if 'creditcards' in product_type else "Дебетовая карта" if 'debitcards' in product_type else 'Вклад',
-            'item_selector': item,  # Для позиционирования
-            'info_button_script': f'document.querySelectorAll("[data-test=\\"offer-info-button\\"]")[{len(products)}]'  # Индекс для скрипта
+            'bank': bank,
+            'name': item.get('name') or 'N/A',
+            'type': product_type_label(product_type),
         })
     
     # Пагинация (осторожно, 1-2 стр. хватит)
@@ -142,7 +527,9 @@ def parse_catalog_selenium(driver, url: str, product_type: str, max_pages: int =
                 EC.element_to_be_clickable((By.CSS_SELECTOR, 'a[href*="page=' + str(page) + '"]'))
             )
             driver.execute_script("arguments[0].scrollIntoView(true); arguments[0].click();", next_btn)
-            time.sleep(5)
+            with timed_step(f"Стр. {page}"):
+                wait_network_idle(driver)
+                wait_dom_quiet(driver)
             # Повтор парсинга...
         except TimeoutException:
             break
@@ -150,6 +537,12 @@ def parse_catalog_selenium(driver, url: str, product_type: str, max_pages: int =
     return products
 
 def parse_product_details_from_popup(driver, product_index: int) -> Dict[str, str]:
+    from selenium.webdriver.common.by import By
+    from selenium.webdriver.common.keys import Keys
+    from selenium.webdriver.support.ui import WebDriverWait
+    from selenium.webdriver.support import expected_conditions as EC
+    from selenium.common.exceptions import TimeoutException
+
     data = {}
     try:
         # Клик по кнопке "Подробнее" по индексу (поскольку элементы динамичны)
@@ -167,14 +560,19 @@ def parse_product_details_from_popup(driver, product_index: int) -> Dict[str, st
             print("❌ Кнопка Подробнее не найдена")
             return data
         
-        # Ждем popup
-        WebDriverWait(driver, 15).until(
-            EC.presence_of_element_located((By.CSS_SELECTOR, '[data-test="detailed-popup"]'))
-        )
-        time.sleep(3)  # Стабилизация
+        # Ждем popup и окончания его отрисовки
+        with timed_step("Popup"):
+            WebDriverWait(driver, POPUP_READY_TIMEOUT).until(
+                EC.presence_of_element_located((By.CSS_SELECTOR, '[data-test="detailed-popup"]'))
+            )
+            wait_network_idle(driver, timeout=POPUP_READY_TIMEOUT)
+            wait_dom_quiet(driver, timeout=POPUP_READY_TIMEOUT)
         
-        soup = BeautifulSoup(driver.page_source, 'html.parser')
-        popup = soup.find('div', {'data-test': 'detailed-popup'})
+        # Из браузера передается только поддерево popup
+        popup_html = driver.execute_script(POPUP_EXTRACT_SCRIPT)
+        if not popup_html:
+            return data
+        popup = BeautifulSoup(popup_html, HTML_PARSER).find(attrs={'data-test': 'detailed-popup'})
         if not popup:
             return data
         
@@ -184,7 +582,7 @@ def parse_product_details_from_popup(driver, product_index: int) -> Dict[str, st
                 title = fdiv['data-test'].replace('detailed-popup-feature-', '')
                 value_elem = fdiv.select_one('.Text__sc-vycpdy-0.dSyfCQ, [data-test="text"].dSyfCQ')
                 value = value_elem.get_text(strip=True) if value_elem else 'N/A'
-                mapped = CRITERIA_MAP.get(title, title)
+                mapped = CRITERIA_INDEX.resolve(title, fuzzy=False) or title
                 data[mapped] = value
         
         # Таблица Тарифы (первый details open)
@@ -197,7 +595,7 @@ def parse_product_details_from_popup(driver, product_index: int) -> Dict[str, st
                 if th and td:
                     criterion = th.get_text(strip=True).strip()
                     value = td.get_text(separator=' ', strip=True)
-                    mapped = CRITERIA_MAP.get(criterion, criterion)
+                    mapped = CRITERIA_INDEX.resolve(criterion, fuzzy=False) or criterion
                     if mapped in criterias:
                         data[mapped] = value
         
@@ -215,44 +613,232 @@ def parse_product_details_from_popup(driver, product_index: int) -> Dict[str, st
                 driver.execute_script("arguments[0].click();", close_btns[0])
             else:
                 driver.find_element(By.TAG_NAME, 'body').send_keys(Keys.ESCAPE)
-            time.sleep(1)
+            WebDriverWait(driver, POPUP_READY_TIMEOUT).until(
+                EC.invisibility_of_element_located((By.CSS_SELECTOR, '[data-test="detailed-popup"]'))
+            )
         except:
             pass
     
     return data
 
+# Поля продукта, по которым процесс пула находит его popup (см. scrape_details_task)
+OFFER_IDENTITY_KEYS = ('bank', 'name', 'type', 'page')
+
+# Браузер процесса-обработчика: создается при первой задаче и живет до конца процесса
+_worker_state: Dict[str, Any] = {"driver": None, "url": None, "headless": True}
+
+
+def _init_scrape_worker(headless: bool):
+    _worker_state["headless"] = headless
+
+
+def _get_worker_driver():
+    """Браузер текущего процесса (создается при первом обращении)"""
+    if _worker_state["driver"] is None:
+        driver = setup_driver(headless=_worker_state["headless"])
+        _worker_state["driver"] = driver
+        # Закрыть браузер при завершении процесса пула
+        mp_util.Finalize(None, driver.quit, exitpriority=10)
+    return _worker_state["driver"]
+
+
+def _open_worker_page(url: str, prod_type: str, page: int = 1, max_pages: int = 1) -> List[Dict]:
+    """Открывает страницу page каталога в браузере процесса и разбирает ее (один раз)"""
+    page_url = catalog_page_url(url, page)
+    products = parse_catalog_selenium(_get_worker_driver(), page_url, prod_type, max_pages)
+    # После перехода по пагинации браузер показывает уже другую страницу
+    _worker_state["url"] = page_url if max_pages <= 1 else None
+    return products
+
+
+def _get_worker_page(url: str, prod_type: str, page: int = 1):
+    """Браузер текущего процесса, открытый на странице page каталога url"""
+    if _worker_state["driver"] is None or _worker_state["url"] != catalog_page_url(url, page):
+        _open_worker_page(url, prod_type, page)
+    return _worker_state["driver"]
+
+
+def scrape_catalog_task(prod_type: str, max_pages: int) -> List[Dict]:
+    """Задача пула: каталог одного типа продуктов (быстрый путь, иначе браузер процесса)"""
+    url = endpoints[prod_type]
+    products = parse_catalog_http(url, prod_type, max_pages)
+    if products:
+        return products
+    print(f"⚠️ [{prod_type}] быстрый путь ничего не нашел, читаем каталог в браузере")
+    return _open_worker_page(url, prod_type, max_pages=max_pages)
+
+
+def scrape_details_task(prod_type: str, shard: List[Dict]) -> List[Dict]:
+    """
+    Задача пула: popup части продуктов одного типа в браузере процесса.
+
+    Продукты передаются идентичностью (банк, название, страница каталога):
+    кнопка "Подробнее" ищется в DOM браузера этого процесса, номера кнопок
+    из другого браузера или HTTP-ответа здесь не годятся.
+    """
+    rows = []
+    for prod in sorted(shard, key=lambda prod: prod.get('page', 1)):
+        driver = _get_worker_page(endpoints[prod_type], prod_type, prod.get('page', 1))
+        button_index = locate_offer_button(driver, prod['bank'], prod['name'])
+        if button_index < 0:
+            print(f"⚠️ [{prod_type}] {prod['bank']} - {prod['name']}: карточки нет на странице, popup пропущен")
+            continue
+        details = parse_product_details_from_popup(driver, button_index)
+        row = {'type': prod['type'], 'bank': prod['bank'], 'product': prod['name']}
+        row.update(details)
+        rows.append(row)
+    return rows
+
+
+def _split(items: List[Any], parts: int) -> List[List[Any]]:
+    parts = max(1, min(parts, len(items)))
+    return [items[i::parts] for i in range(parts)]
+
+
+def scrape_parallel(prod_types: List[str], workers: int = SCRAPE_WORKERS, max_pages: int = 1,
+                    limit: int = 0, headless: bool = True) -> List[Dict]:
+    """
+    Полное обновление данных несколькими процессами.
+
+    Args:
+        prod_types: Типы продуктов (ключи endpoints)
+        workers: Число процессов (у каждого свой браузер)
+        max_pages: Сколько страниц каталога читать
+        limit: Сколько продуктов каждого типа разбирать подробно (0 - все)
+        headless: Запускать браузеры без окна
+
+    Returns:
+        Строки {type, bank, product, <критерии>...} всех типов продуктов
+    """
+    started_at = time.monotonic()
+    rows = []
+    with ProcessPoolExecutor(max_workers=workers, initializer=_init_scrape_worker, initargs=(headless,)) as pool:
+        # Этап 1: каталоги всех типов параллельно
+        catalog_futures = {prod_type: pool.submit(scrape_catalog_task, prod_type, max_pages) for prod_type in prod_types}
+        detail_futures = []
+        for prod_type, future in catalog_futures.items():
+            try:
+                products = future.result()
+            except Exception as e:
+                print(f"❌ [{prod_type}] каталог не получен: {type(e).__name__}: {e}")
+                continue
+            if limit:
+                products = products[:limit]
+            print(f"[{prod_type}] продуктов: {len(products)}")
+
+            # Критерии из состояния страницы уже есть - браузер не нужен
+            need_popup = []
+            for prod in products:
+                if prod.get('details') is not None:
+                    row = {'type': prod['type'], 'bank': prod['bank'], 'product': prod['name']}
+                    row.update(prod['details'])
+                    rows.append(row)
+                else:
+                    need_popup.append(prod)
+
+            # Этап 2: popup типа делятся между процессами
+            need_popup = [{key: prod[key] for key in OFFER_IDENTITY_KEYS if key in prod} for prod in need_popup]
+            for shard in _split(need_popup, workers):
+                detail_futures.append((prod_type, pool.submit(scrape_details_task, prod_type, shard)))
+
+        for prod_type, future in detail_futures:
+            try:
+                rows.extend(future.result())
+            except Exception as e:
+                print(f"❌ [{prod_type}] часть popup не обработана: {type(e).__name__}: {e}")
+
+    print(f"✅ Собрано {len(rows)} продуктов за {time.monotonic() - started_at:.1f} с ({workers} процессов)")
+    return rows
+
+
+def save_rows(rows: List[Dict], path: str, store: bool = False):
+    import pandas as pd
+
+    df = pd.DataFrame(rows).fillna('N/A').sort_values(['type', 'bank'])
+    print(df.to_markdown(index=False))
+    df.to_csv(path, index=False, encoding='utf-8')
+    print(f"\n✅ Данные сохранены в {path}")
+
+    if store:
+        # Снимок в хранилище продуктов бэкенда (история для /api/history)
+        try:
+            from src.store import import_rows
+        except ImportError:
+            print("❌ Хранилище недоступно: запустите из директории backend (python -m src.parser ... --store)")
+            return
+        import_rows(rows, os.path.basename(path))
+
+
 def main():
-    driver = setup_driver(headless=False)  # NON-headless для дебага (уберите False для прод)
+    arg_parser = argparse.ArgumentParser(description="Парсер каталога карт banki.ru")
+    arg_parser.add_argument("--type", default="creditcards", choices=sorted(endpoints))
+    arg_parser.add_argument("--types", nargs="+", choices=sorted(endpoints),
+                            help="Полное обновление нескольких типов продуктов в пуле процессов")
+    arg_parser.add_argument("--workers", type=int, default=SCRAPE_WORKERS, help="Число процессов для --types")
+    arg_parser.add_argument("--pages", type=int, default=1)
+    arg_parser.add_argument("--limit", type=int, default=None,
+                            help="Сколько продуктов разобрать подробно (по умолчанию 3, для --types - все)")
+    arg_parser.add_argument("--output", default="banki_test_data.csv")
+    arg_parser.add_argument("--store", action="store_true", help="Сохранить результат снимком в хранилище продуктов")
+    arg_parser.add_argument("--html", help="Разобрать сохраненную страницу каталога без сети и браузера")
+    args = arg_parser.parse_args()
+
+    if args.types:
+        rows = scrape_parallel(args.types, args.workers, args.pages, args.limit or 0)
+        if rows:
+            save_rows(rows, args.output, args.store)
+        else:
+            print("❌ Нет данных")
+        return
+
+    prod_type = args.type
+    url = endpoints[prod_type]
+    print(f"\n=== {prod_type.upper()} ===")
+
+    if args.html:
+        with open(args.html, 'r', encoding='utf-8') as f:
+            catalog_products = parse_catalog_html(f.read(), prod_type)
+        print(f"Найдено {len(catalog_products)} продуктов от нужных банков")
+        print(json.dumps(catalog_products, ensure_ascii=False, indent=2))
+        return
+
+    # NON-headless для дебага (уберите False для прод)
+    make_driver = lambda: setup_driver(headless=False)
+    catalog_products, driver = parse_catalog(url, prod_type, max_pages=args.pages, driver_factory=make_driver)
+    print(f"Найдено {len(catalog_products)} продуктов от нужных банков")
     try:
         all_data = []
-        
-        # Тестируем только creditcards сначала
-        prod_type = 'creditcards'
-        url = endpoints[prod_type]
-        print(f"\n=== {prod_type.upper()} ===")
-        
-        catalog_products = parse_catalog_selenium(driver, url, prod_type, max_pages=1)
-        print(f"Найдено {len(catalog_products)} продуктов от нужных банков")
-        
-        for idx, prod in enumerate(catalog_products[:3]):  # Топ-3 для теста
+        opened_page = 1
+
+        for idx, prod in enumerate(catalog_products[:args.limit or 3]):
             print(f"\n[{idx}] {prod['bank']} - {prod['name']}")
-            details = parse_product_details_from_popup(driver, idx)
+            details = prod.get('details')
+            if details is None:
+                # Критериев нет в HTML - открываем popup в браузере
+                page = prod.get('page', 1)
+                if driver is None or page != opened_page:
+                    driver = driver or make_driver()
+                    parse_catalog_selenium(driver, catalog_page_url(url, page), prod_type, max_pages=1)
+                    opened_page = page
+                button_index = locate_offer_button(driver, prod['bank'], prod['name'])
+                if button_index < 0:
+                    print("⚠️ Карточки нет на открытой странице каталога, popup пропущен")
+                    continue
+                details = parse_product_details_from_popup(driver, button_index)
+                time.sleep(PRODUCT_DELAY)
             row = {'type': prod['type'], 'bank': prod['bank'], 'product': prod['name']}
             row.update(details)
             all_data.append(row)
-            time.sleep(3)
-        
+
         if all_data:
-            df = pd.DataFrame(all_data).fillna('N/A').sort_values('bank')
-            print(df.to_markdown(index=False))
-            df.to_csv('banki_test_data.csv', index=False, encoding='utf-8')
-            print("\n✅ Данные сохранены!")
+            save_rows(all_data, args.output, args.store)
         else:
             print("❌ Нет данных")
-    
+
     finally:
-        input("Нажмите Enter для закрытия браузера...")  # Для дебага
-        driver.quit()
+        if driver is not None:
+            input("Нажмите Enter для закрытия браузера...")  # Для дебага
+            driver.quit()
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    main()
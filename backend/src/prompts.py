@@ -1,217 +1,75 @@
+import hashlib
+import json
+from functools import lru_cache
 
-def get_product_analysis_prompt(banks, card_types, criteria):
-    data = """
-    {
-    "analysis_parameters": {
-      "banks": ["Альфа-Банк", 
-               "ВТБ", 
-               "Газпромбанк", 
-               "Московский Кредитный Банк (МКБ)", 
-               "Промсвязьбанк (ПСБ)", 
-               "ПСБ", 
-               "Райффайзенбанк", 
-               "Россельхозбанк", 
-               "Совкомбанк", 
-               "Т-Банк", 
-               "Банк ДОМ.РФ"],
-      "card_types": ["Дебетовая карта", "Кредитная карта"],
-      "criterias": [
-        "Стоимость обслуживания (дебетовая)", 
-        "Стоимость обслуживания (кредитная)",
-        "СМС-уведомления", 
-        "Снятие наличных в других банках",
-        "Переводы по реквизитам в другие банки", 
-        "Процент на остаток", 
-        "Кредитный лимит", 
-        "Процентные ставки", 
-        "Первоначальный взнос", 
-        "Программа лояльности (дебетовая)", 
-        "Программа лояльности (кредитная)"
-      ]
-    },
-    "comparison_table": [
-      {
-        "criteria": "Стоимость обслуживания (дебетовая)",
-        "info": {
-          "Сбербанк": "бесплатно",
-          "Альфа-Банк": "бесплатно",
-          "ВТБ": "бесплатно",
-          "Газпромбанк": "бесплатно",
-          "Московский Кредитный Банк (МКБ)": "бесплатно",
-          "Промсвязьбанк (ПСБ)": "бесплатно",
-          "Райффайзенбанк": "бесплатно",
-          "Россельхозбанк": "бесплатно",
-          "Совкомбанк": "бесплатно",
-          "Т-Банк": "От 1 990 до 3 588 RUB",
-          "Банк ДОМ.РФ": "От 0 до 2388 RUB"
-        }
-      },
-      {
-        "criteria": "Стоимость обслуживания (кредитная)",
-        "info": {
-          "Сбербанк": "От 0 до 48 000 RUB",
-          "Альфа-Банк": "От 0 до 990 RUB",
-          "ВТБ": "бесплатно",
-          "Газпромбанк": "От 0 до 990 RUB",
-          "Московский Кредитный Банк (МКБ)": "590 RUB",
-          "Промсвязьбанк (ПСБ)": "бесплатно",
-          "Райффайзенбанк": false,
-          "Россельхозбанк": "бесплатно",
-          "Совкомбанк": "бесплатно",
-          "Т-Банк": "От 0 до 1490 RUB",
-          "Банк ДОМ.РФ": "999 RUB"
-        }
-      },
-      {
-        "criterion": "СМС-уведомления",
-        "info": {
-          "Сбербанк": "99 РУБ/мес.; бесплатно при наличии любой подписки «СберПрайм»",
-          "Альфа-Банк": "99 РУБ/мес.",
-          "ВТБ": "99 РУБ/мес. - пакет 'Карты+'; бесплатно — пакет «Базовый» или при оформлении подписки «ВТБ Плюс»;",
-          "Газпромбанк": "99 РУБ/мес. со второго месяца; бесплатно с сервисом Газпром Бонус «Плюс»",
-          "Московский Кредитный Банк (МКБ)": "бесплатно",
-          "Промсвязьбанк (ПСБ)": "99 РУБ/мес. со второго месяца",
-          "Райффайзенбанк": false,
-          "Россельхозбанк": "99 РУБ/мес.",
-          "Совкомбанк": "бесплатно",
-          "Т-Банк": "бесплатно",
-          "Банк ДОМ.РФ": "99 РУБ/мес."
-        }
-      },
-      {
-        "criterion": "Снятие наличных в других банках",
-        "info": {
-          "Сбербанк": "2% от суммы (мин. 200 ₽)",
-          "Альфа-Банк": "без комиссии при снятии до 100 000 ₽/мес. (комиссия за снятие наличных будет списана и возвращена на счет до конца следующего месяца); без комиссии в банкоматах банков-партнеров; 1,99% от суммы (мин. 199 ₽) при снятии свыше 100 000 ₽/мес.",
-          "ВТБ": "без комиссии в банкоматах банков-партнеров; 1% от суммы (мин. 300 ₽)",
-          "Газпромбанк": "Без Газпром Бонус «Плюс»: без комиссии до 100 000 ₽/мес.; 1% от суммы (мин. 300 ₽) при снятии от 100 000,01 ₽/мес. до 300 000 ₽/мес.; 450 ₽ за операцию при снятии за пределами РФ. С Газпром Бонус «Плюс»: без комиссии до 200 000 ₽/мес.; 1% от суммы (мин. 300 ₽) при снятии от 200 000,01 ₽/мес. до 300 000 ₽/мес.",
-          "Московский Кредитный Банк (МКБ)": "без комиссии в банкоматах банков-партнеров; без комиссии при снятии от 3 000 ₽ за операцию до 30 000 ₽/мес.; 1,95% от суммы снятия (мин. 300 ₽) при снятии менее 3 000 ₽ за операцию или свыше 30 000 ₽/мес.",
-          "Промсвязьбанк (ПСБ)": "без комиссии при снятии от 3 000 ₽ за операцию (не более 30 000 ₽/мес.), иначе — 1,99% от суммы (мин. 299 ₽); без комиссии до 150 000 ₽/мес. при зачислении заработной платы от 18 000 ₽/мес.; без комиссии в банкоматах банков-партнеров (Альфа-Банка, Россельхозбанка, УБРиР)",
-          "Райффайзенбанк": false,
-          "Россельхозбанк": "без комиссии в банкоматах банков-партнеров; 1% от суммы (мин. 199 ₽)",
-          "Совкомбанк": "99 ₽ при снятии до 3 000 ₽ за операцию; без комиссии до 150 000 ₽/мес., далее — 1,9% от суммы превышения",
-          "Т-Банк": "без комиссии при снятии от 3 000 ₽ за операцию, но не более 100 000 ₽/мес., иначе — 2% от суммы (мин. 90 ₽)",
-          "Банк ДОМ.РФ": "без комиссии в банкоматах банков-партнеров; без комиссии при снятии до 20 000 ₽/мес., далее — 1,5% от суммы (мин. 150 ₽)"
-        }
-      },
-      {
-        "criterion": "Переводы по реквизитам в другие банки",
-        "info": {
-          "Сбербанк": true,
-          "Альфа-Банк": true,
-          "ВТБ": true,
-          "Газпромбанк": true,
-          "Московский Кредитный Банк (МКБ)": true,
-          "Промсвязьбанк (ПСБ)": true,
-          "Райффайзенбанк": true,
-          "Россельхозбанк": true,
-          "Совкомбанк": true,
-          "Т-Банк": true,
-          "Банк ДОМ.РФ": true
-        }
-      },
-      {
-        "criterion": "Процент на остаток",
-        "info": {
-          "Сбербанк": false,
-          "Альфа-Банк": false,
-          "ВТБ": false,
-          "Газпромбанк": false,
-          "Московский Кредитный Банк (МКБ)": "7%",
-          "Промсвязьбанк (ПСБ)": false,
-          "Райффайзенбанк": false,
-          "Россельхозбанк": false,
-          "Совкомбанк": false,
-          "Т-Банк": false,
-          "Банк ДОМ.РФ": false
-        }
-      },
-      {
-        "criterion": "Кредитный лимит",
-        "info": {
-          "Сбербанк": "от 10 000 до 100 000 ₽",
-          "Альфа-Банк": "от 10 000 до 1 000 000 ₽",
-          "ВТБ": "от 30 000 до 1 000 000 ₽ до 100 000 ₽ для неработающих пенсионеров; до 300 000 ₽ при оформлении по паспорту; до 1 000 000 ₽ с подтверждением дохода",
-          "Газпромбанк": "от 9 999 до 1 000 000 ₽",
-          "Московский Кредитный Банк (МКБ)": "от 29 000 до 1 000 000 ₽",
-          "Промсвязьбанк (ПСБ)": "от 10 000 до 1 000 000 ₽",
-          "Райффайзенбанк": false,
-          "Россельхозбанк": "от 10 000 до 1 000 000 ₽",
-          "Совкомбанк": "от 45 000 до 500 000 ₽",
-          "Т-Банк": "до 1 000 000 ₽",
-          "Банк ДОМ.РФ": "от 10 000 до 750 000 ₽"
-        }
-      },
-      {
-        "criterion": "Процентные ставки",
-        "info": {
-          "Сбербанк": "49.8%",
-          "Альфа-Банк": "от 49.99% до 58.99%",
-          "ВТБ": "от 49.9% до 69.9%",
-          "Газпромбанк": "от 56.49% до 59.99%",
-          "Московский Кредитный Банк (МКБ)": "58.9%",
-          "Промсвязьбанк (ПСБ)": "59.99%",
-          "Райффайзенбанк": false,
-          "Россельхозбанк": "54.5%",
-          "Совкомбанк": "39.9%",
-          "Т-Банк": "от 29.9% до 61.9%",
-          "Банк ДОМ.РФ": "58.9%"
-        }
-      },
-      {
-        "criterion": "Первоначальный взнос",
-        "info": {
-          "Сбербанк": false,
-          "Альфа-Банк": false,
-          "ВТБ": false,
-          "Газпромбанк": false,
-          "Московский Кредитный Банк (МКБ)": false,
-          "Промсвязьбанк (ПСБ)": false,
-          "ПСБ": false,
-          "Райффайзенбанк": false,
-          "Россельхозбанк": false,
-          "Совкомбанк": false,
-          "Т-Банк": false,
-          "Банк ДОМ.РФ": false,
-          "ЮниКредит Банк": false
-        }
-      },
-      {
-        "criterion": "Программа лояльности (дебетовая)",
-        "info": {
-          "Сбербанк": "Конвертация\t Зависит от выбранного варианта трат. Порядок начисления\t до 10% от суммы покупки за каждые 100 ₽ Баллы до 10% начисляются в 3 выбранных категориях или в 5 категориях с подпиской «СберПрайм» или «СберПрайм+» из 8, предложенных банком,. Максимальное количество баллов в месяц: стандартный тариф — до 2000 баллов; с подпиской «СберПрайм Старт» — до 5000 баллов; с подпиской «СберПрайм» — до 10000 баллов; с подпиской «СберПрайм+» — до 15000 баллов. Максимальное вознаграждение в месяц\t 15 000 баллов Категории баллов\t13",
-          "Альфа-Банк": "Баллы Программ Программа лояльности «Альфа-банка» Конвертации1 балл = 1 Порядок начисления\t 1–100% от суммы покупки Вариант начисления баллов выбирается ежемесячно: до 30% в 3 выбранных категориях; до 30% в 2 выбранных категориях + 1% за остальные покупки. Дополнительно до 100% на случайную категорию. Максимальное вознаграждение в месяц\t 5 000 баллов Категории баллов\t16",
-          "ВТБ": "Кэшбэк\nРазмер кэшбэка\nдо 100%\nставка кэшбэка 100% доступна новым клиентам при выборе категории «Супермаркеты» с максимальным лимитом 1 000 ₽ до 30.11.2025;\nкэшбэк начисляется за покупки в 4 категориях из 8, предложенных банком, при регулярном автопополнении карты с карты любого банка на сумму от 15 000 ₽/мес. или в 3 категориях при невыполнении условия.\nдля клиентов со сбережениями более 50 000 ₽ будут предложены специальные категории, помеченные знаком «звездочка» в разделе категорий кэшбэка\nДополнительные условия с подпиской «ВТБ Плюс»:\nдо 10% в сервисах «Яндекса»;\n+1 категория каждые выходные;\n+2 дополнительные категории каждый месяц.\nДополнительные условия при подключении услуги Группа «Близкие»:\nдо 3% на покупки в супермаркетах для каждого близкого в группе;\nподписка «ВТБ Плюс» за 0 ₽;\nскидка 20% на страховые продукты и сотовую связь «ВТБ Мобайл».\nдо 50% на покупки у партнёров\nМаксимальное вознаграждение в месяц\n3 000 ₽",
-          "Газпромбанк": "Баллы\nПрограммы\nПрограмма лояльности «Уровневый кешбэк»\nКонвертация\n* 1 балл = от 0,5 ₽ до 0,8 ₽ без Газпром Бонус «Плюс»; * 1 балл = от 1 ₽ с Газпром Бонус «Плюс»\nПорядок начисления\nдо 6% баллами за каждые 100 ₽\nБаллы начисляются в 5 выбранных категориях из 7, предложенных банком, в зависимости от суммы остатка в предыдущем месяце:\n1-й уровень: 1% — от 10 000 ₽ до 29 999,9 ₽ (макс. 5000 баллов/мес.);\n2-й уровень: 3% — от 30 000 ₽ до 59 999,9 ₽ (макс. 5000 баллов/мес.);\n3-й уровень: 4% — от 60 000 ₽ до 119 999,99 ₽ (макс. 5000 баллов/мес.);\n4-й уровень: 6% — от 120 000 ₽ (макс. 10000 баллов/мес.).\nПри подключении сервиса Газпром Бонус «Плюс» баллы начисляются в 6 выбранных категориях из 10, предложенных банком, в зависимости от суммы остатка в предыдущем месяце:\n1-й уровень: 1% — от 10 000 ₽ до 29 999,9 ₽ (макс. 10000 баллов/мес.);\n2-й уровень: 3% — от 30 000 ₽ до 59 999,9 ₽ (макс. 10000 баллов/мес.);\n3-й уровень: 4% — от 60 000 ₽ до 119 999,99 ₽ (макс. 10000 баллов/мес.);\n4-й уровень: 6% — от 120 000 ₽ (макс. 20000 баллов/мес.).\nМаксимальное вознаграждение в месяц",
-          "Московский Кредитный Банк (МКБ)": "Баллы\nПрограммы\nПрограмма лояльности «МКБ Бонус»\nКонвертация\n1 балл = 1 ₽\nПорядок начисления\nдо 10% от суммы покупки\nБаллы начисляются за покупки в 3 категориях из 13, предложенных банком, с возможностью ежеквартального переключения.\nКатегории в IV квартале 2025 года:\n10% за оплату ж/д и авиабилетов, за бронирование отелей, за покупку билетов на автобусы и аренду авто через сервис «МКБ Travel»;\n5% в категориях: «Городской транспорт», «Такси», «АЗС», «Автопутешествия», «Спортивные клубы», «Бытовые услуги», «Развлечения», «Домашние питомцы», «Дьюти-фри», «Бургер Кинг», «Аптека и оптика»;\n1% на все покупки.\nДополнительно: 300 приветственных баллов.\nМаксимальное вознаграждение в месяц",
-          "Промсвязьбанк (ПСБ)": "Баллы\nПрограммы\nПрограмма лояльности «Кэшбэк на все»\nПрограмма лояльности «Кэшбэк на выбор»\nКонвертация\n1 балл = 1 ₽\nПорядок начисления\nдо 1,5% баллами за любые покупки\nМаксимальное вознаграждение в месяц\n3 000 баллов",
-          "Райффайзенбанк": false,
-          "Россельхозбанк": "Баллы\nПрограммы\nПрограмма лояльности Россельхозбанка\nКонвертация\nКурс конвертации баллов на витрине 1 балл = 1 ₽. Курс конвертации в рубли будет зависеть от суммы покупок в предыдущем месяце: * от 10 000 ₽ до 29 999,99 ₽ — 1 балл = 0,5 ₽; * от 30 000 ₽ до 74 999,99 ₽ — 1 балл = 0,65 ₽; * от 75 000 ₽ — 1 балл = 0,85 ₽.\nПорядок начисления\nДо 15% баллами от суммы покупки\nбаллы до 15% начисляются в 5 выбранных категориях, предложенных банком;\nбаллы начисляются за покупки за границей и в РФ\nМаксимальное вознаграждение в месяц\n5 000 баллов",
-          "Совкомбанк": "Кэшбэк\nРазмер кэшбэка\n1% на любые покупки\nдо 30%\nКэшбэк начисляется за покупки в 5 категориях из 8, предложенных банком.\nМаксимальное вознаграждение в месяц\n5 000 ₽",
-          "Т-Банк": "Кэшбэк\nРазмер кэшбэка\n1%–15%\nВариант начисления баллов выбирается ежемесячно:\nдо 15% в 4 выбранных категориях из 8, предложенных банком;\nдо 15% в 3 выбранных категориях + 1% за остальные покупки.\nДополнительно: до 15% за покупки через сервис «Город».\nдо 30% на покупки у партнёров\nМаксимальное вознаграждение в месяц\n5 000 ₽",
-          "Банк ДОМ.РФ": "Кэшбэк\nРазмер кэшбэка\n1%–5%\nКэшбэк начисляется за покупки в 4 из 7 категорий на выбор, предлагаемых банком ежеквартально:\n5% в 4 выбранных категориях;\n5% в 3 выбранных категориях + 1% за остальные покупки.\nМаксимальное вознаграждение в месяц\n2 000 ₽"
-        }
-      },
-      {
-        "criterion": "Программа лояльности (кредитная)",
-        "info": {
-          "Сбербанк": "Конвертация\tЗависит от выбранного варианта трат.Порядок начисления\tдо 10% от суммы покупки за каждые 100 ₽ Баллы до 10% начисляются в 3 выбранных категориях из 8, предложенных банком. Максимальное вознаграждение в месяц\t 2 000 баллов Категории баллов\t16",
-          "Альфа-Банк": "Баллы Программ Программа лояльности «Альфа-банка» Конвертации1 балл = 1RUB Порядок начисления\t 1–100% от суммы покупки Вариант начисления баллов выбирается ежемесячно: до 30% в 3 выбранных категориях; до 30% в 2 выбранных категориях + 1% за остальные покупки. Дополнительно до 100% на случайную категорию. Максимальное вознаграждение в месяц\t 5 000 баллов Категории баллов\t16",
-          "ВТБ": "Размер кэшбэка до 15% кэшбэк начисляется за покупки в 3 категориях из 8, предложенных банком; категории кэшбэка выбираются ежемесячно в ВТБ Онлайн; для клиентов со сбережениями более 50 000 ₽ будут предложены специальные категории, помеченные знаком «звездочка» в разделе категорий кешбэка до 50% на покупки у партнёров Максимальное вознаграждение в месяц\t 3 000 РУБ. Категории кэшбэка 16",
-          "Газпромбанк": false,
-          "Московский Кредитный Банк (МКБ)": "Конвертация\t1 балл = 1RUB Порядок начисления до 10% от суммы покупки Баллы начисляются за покупки в 3 категориях из 12, предложенных банком, с возможностью ежеквартального переключения. Категории в IV квартале 2025 года: 10% за оплату ж/д и авиабилетов, за бронирование отелей, за покупку билетов на автобусы и аренду авто через сервис «МКБ Travel»; 5% в категориях: «Городской транспорт», «Такси», «АЗС», «Автопутешествия», «Спортивные клубы», «Бытовые услуги», «Развлечения», «Домашние питомцы», «Дьюти-фри», «Бургер Кинг»; 1% на все покупки. Дополнительно: 300 приветственных баллов. Максимальное вознаграждение в месяц 3 000 баллов, Категории баллов:\t3",
-          "Промсвязьбанк (ПСБ)": "Конвертация\t1 балл = 1RUB Порядок начисления\t до 1% за любые покупки В рамках акции начисляется 10% в категории «Маркетплейсы» при оформлении карты до 31.10.2025 и подтверждении участия в акции, а также совершении покупок от 20 000 РУБ в ноябре. Максимальная сумма вознаграждения 1000 баллов. Максимальное вознаграждение в месяц\t без ограничений Категории баллов 16",
-          "Райффайзенбанк": false,
-          "Россельхозбанк": "Конвертация Курс конвертации баллов на витрине 1 балл = 1РУБ. Курс конвертации в рубли будет зависеть от суммы покупок в предыдущем месяце: * от 10 000 ₽ до 29 999,99 ₽ — 1 балл = 0,5РУБ; * от 30 000РУБ до 74 999,99 РУБ — 1 балл = 0,65 РУБ; * от 75 000 РУБ — 1 балл = 0,85 РУБ. Порядок начисления\t До 15% баллами от суммы покупки Баллы до 15% начисляются в 5 выбранных категориях, предложенных банком. При оформлении карты в рамках акции до 20.10.2025 начисляется 25% кэшбэк баллами в выбранных категориях (за исключением категории «1% на все») 3 месяца при совершении не менее 5 покупок на общую сумму от 25 000 ₽. Максимальное вознаграждение в месяц 5 000 баллов Категории баллов 16",
-          "Совкомбанк": false,
-          "Т-Банк": "Конвертация 1 балл = 1 РУБ Порядок начислениядо 15% от суммы покупки Вариант начисления баллов выбирается ежемесячно: до 15% в 4 выбранных категориях; до 15% в 3 выбранных категориях + 1% за остальные покупки. Максимальное вознаграждение в месяц\t3 000 баллов Категории баллов 16",
-          "Банк ДОМ.РФ": "Размер кэшбэка\t 1%–5% Кэшбэк начисляется за покупки в 4 из 7 категорий на выбор, предлагаемых банком ежеквартально: 5% в 4 выбранных категориях; 5% в 3 выбранных категориях + 1% за остальные покупки. Максимальное вознаграждение в месяц 2000 РУБ, Категории кэшбэка 16",
-        }
-      }
-    ]
-  }
-  
+from src.dataset import get_dataset_version, get_comparison_data_for_criteria
+
+# Банк, продукт которого всегда участвует в сравнении
+BASE_BANK = "Сбербанк"
+
+# Критерии, относящиеся только к одному типу карт
+CARD_TYPE_MARKERS = {
+    "(дебетовая)": "Дебетовая карта",
+    "(кредитная)": "Кредитная карта",
+}
+
+
+def _criterion_matches_card_types(criterion, card_types):
+    """Отбрасывает критерии, относящиеся к невыбранному типу карт."""
+    for marker, card_type in CARD_TYPE_MARKERS.items():
+        if marker in criterion:
+            return card_type in card_types
+    return True
+
+
+@lru_cache(maxsize=256)
+def _render_data_fragment(banks, card_types, criteria, dataset_version):
+    """
+    Строит JSON с данными только по выбранным банкам (и Сбербанку), типам карт и критериям.
+
+    Результат кэшируется для каждой комбинации параметров и версии данных.
     """
+    selected_criteria = [c for c in criteria if _criterion_matches_card_types(c, card_types)]
+    selected_banks = [BASE_BANK] + [bank for bank in banks if bank != BASE_BANK]
+    comparison_data = get_comparison_data_for_criteria(selected_banks, selected_criteria)
+
+    data = {
+        "analysis_parameters": {
+            "banks": list(banks),
+            "card_types": list(card_types),
+            "criterias": selected_criteria,
+        },
+        "comparison_table": [
+            {"criteria": criterion, "info": info}
+            for criterion, info in comparison_data.items()
+        ],
+    }
+    return json.dumps(data, ensure_ascii=False, indent=2)
+
+
+def get_analysis_data_digest(banks, card_types, criteria):
+    """
+    Отпечаток данных, которые попадают в промпт анализа.
+
+    Меняется, только если изменились ячейки выбранных банков и критериев,
+    поэтому по нему кэшируются результаты анализа.
+    """
+    data = _render_data_fragment(
+        tuple(sorted(set(banks))),
+        tuple(sorted(set(card_types))),
+        tuple(sorted(set(criteria))),
+        get_dataset_version(),
+    )
+    return hashlib.sha256(data.encode("utf-8")).hexdigest()
+
+
+def get_product_analysis_prompt(banks, card_types, criteria):
+    data = _render_data_fragment(
+        tuple(sorted(set(banks))),
+        tuple(sorted(set(card_types))),
+        tuple(sorted(set(criteria))),
+        get_dataset_version(),
+    )
 
     product_analyst_prompt = f"""
     Роль: Ты — продуктовый аналитик в компании Сбер. Твоя задача — проводить объективный сравнительный анализ банковских продуктов, предоставляя структурированную и легкочитаемую информацию.
@@ -222,11 +80,9 @@ def get_product_analysis_prompt(banks, card_types, criteria):
 
 
     Описание JSON:
-    - competitors - банки конкуренты
-    - product - продукт, который сравнивается у банков
-    - criteria - критерии, по которым сравнивается продукт
-    - comparison - массив, где для каждого критерия (criterion) указаны баллы или значение критерия для каждого банка
-    - conclusions - объект, описывающий лучший банк по критериям
+    - analysis_parameters - выбранные банки-конкуренты (banks), типы карт (card_types) и критерии (criterias)
+    - comparison_table - массив, где для каждого критерия (criteria) в info указано значение критерия для каждого банка
+    - "Нет данных" - значение отсутствует в исходных данных
 
     Инструкции по выполнению анализа:
 
@@ -0,0 +1,189 @@
+"""provider_health.py - учет задержек и автоматический выключатель для LLM-провайдеров.
+
+Для каждого провайдера (модели OpenRouter, GigaChat) хранится:
+    1. LatencyTracker: скользящее окно задержек успешных ответов, по которому
+       считаются p50/p95 и подбирается таймаут следующего запроса.
+    2. CircuitBreaker: после серии ошибок (429/5xx, таймауты, сетевые сбои)
+       провайдер пропускается на время охлаждения, затем пропускается один
+       пробный запрос (half-open); успех закрывает выключатель, ошибка - снова
+       открывает его.
+
+Параметры задаются переменными окружения:
+    - PROVIDER_LATENCY_WINDOW     - размер окна задержек;
+    - PROVIDER_TIMEOUT_DEFAULT    - таймаут, пока статистики недостаточно, сек.;
+    - PROVIDER_TIMEOUT_MIN / _MAX - границы адаптивного таймаута, сек.;
+    - PROVIDER_TIMEOUT_FACTOR     - множитель к p95;
+    - PROVIDER_FAILURE_THRESHOLD  - число ошибок подряд для открытия выключателя;
+    - PROVIDER_COOLDOWN           - время охлаждения, сек.
+"""
+
+import os
+import threading
+import time
+from collections import deque
+
+PROVIDER_LATENCY_WINDOW = int(os.getenv("PROVIDER_LATENCY_WINDOW", "50"))
+PROVIDER_TIMEOUT_DEFAULT = float(os.getenv("PROVIDER_TIMEOUT_DEFAULT", "30"))
+PROVIDER_TIMEOUT_MIN = float(os.getenv("PROVIDER_TIMEOUT_MIN", "5"))
+PROVIDER_TIMEOUT_MAX = float(os.getenv("PROVIDER_TIMEOUT_MAX", "60"))
+PROVIDER_TIMEOUT_FACTOR = float(os.getenv("PROVIDER_TIMEOUT_FACTOR", "1.5"))
+PROVIDER_FAILURE_THRESHOLD = int(os.getenv("PROVIDER_FAILURE_THRESHOLD", "3"))
+PROVIDER_COOLDOWN = float(os.getenv("PROVIDER_COOLDOWN", "60"))
+
+# Минимальное число замеров, после которого таймаут начинает адаптироваться
+MIN_SAMPLES = 5
+
+# Код статуса для запросов, не отправленных из-за открытого выключателя
+STATUS_CIRCUIT_OPEN = -5
+# Код статуса для потоковых запросов, отмененных клиентом
+STATUS_CANCELLED = -6
+
+CLOSED = "closed"
+OPEN = "open"
+HALF_OPEN = "half_open"
+
+
+def is_provider_failure(status_code):
+    """Считается ли код ответа отказом провайдера (а не ошибкой запроса)."""
+    return status_code == 429 or status_code >= 500 or status_code < 0
+
+
+class LatencyTracker:
+    """Скользящее окно задержек и адаптивный таймаут на его основе."""
+
+    def __init__(self, window=PROVIDER_LATENCY_WINDOW):
+        self._samples = deque(maxlen=window)
+        self._lock = threading.Lock()
+
+    def record(self, seconds):
+        with self._lock:
+            self._samples.append(seconds)
+
+    def percentile(self, p):
+        """Возвращает p-й перцентиль задержки (0-100) или None, если замеров нет."""
+        with self._lock:
+            samples = sorted(self._samples)
+        if not samples:
+            return None
+        rank = min(len(samples) - 1, max(0, int(round(p / 100 * (len(samples) - 1)))))
+        return samples[rank]
+
+    def timeout(self):
+        """Таймаут следующего запроса: p95 * множитель в заданных границах."""
+        with self._lock:
+            enough = len(self._samples) >= MIN_SAMPLES
+        if not enough:
+            return PROVIDER_TIMEOUT_DEFAULT
+        adaptive = self.percentile(95) * PROVIDER_TIMEOUT_FACTOR
+        return min(PROVIDER_TIMEOUT_MAX, max(PROVIDER_TIMEOUT_MIN, adaptive))
+
+    def snapshot(self):
+        with self._lock:
+            count = len(self._samples)
+        return {
+            "samples": count,
+            "p50": self.percentile(50),
+            "p95": self.percentile(95),
+            "timeout": self.timeout(),
+        }
+
+
+class CircuitBreaker:
+    """Автоматический выключатель: closed -> open -> half_open -> closed/open."""
+
+    def __init__(self, failure_threshold=PROVIDER_FAILURE_THRESHOLD, cooldown=PROVIDER_COOLDOWN):
+        self.failure_threshold = failure_threshold
+        self.cooldown = cooldown
+        self.state = CLOSED
+        self.failures = 0
+        self.opened_at = 0.0
+        self._probe_in_flight = False
+        self._lock = threading.Lock()
+
+    def allow(self):
+        """Можно ли сейчас обращаться к провайдеру."""
+        with self._lock:
+            if self.state == CLOSED:
+                return True
+            if self.state == OPEN and time.monotonic() - self.opened_at >= self.cooldown:
+                self.state = HALF_OPEN
+            if self.state == HALF_OPEN and not self._probe_in_flight:
+                # Пропускаем ровно один пробный запрос
+                self._probe_in_flight = True
+                return True
+            return False
+
+    def record_success(self):
+        with self._lock:
+            self.state = CLOSED
+            self.failures = 0
+            self._probe_in_flight = False
+
+    def release_probe(self):
+        """Освобождает пробный запрос, не завершившийся ни успехом, ни ошибкой (отмена)."""
+        with self._lock:
+            self._probe_in_flight = False
+
+    def record_failure(self):
+        with self._lock:
+            self.failures += 1
+            if self.state == HALF_OPEN or self.failures >= self.failure_threshold:
+                self.state = OPEN
+                self.opened_at = time.monotonic()
+            self._probe_in_flight = False
+
+    def snapshot(self):
+        with self._lock:
+            return {"state": self.state, "consecutiveFailures": self.failures}
+
+
+class ProviderHealth:
+    """Состояние одного провайдера: задержки и выключатель."""
+
+    def __init__(self, name):
+        self.name = name
+        self.latency = LatencyTracker()
+        self.breaker = CircuitBreaker()
+
+    def allow(self):
+        return self.breaker.allow()
+
+    def timeout(self):
+        return self.latency.timeout()
+
+    def record(self, status_code, seconds):
+        """Учитывает результат запроса к провайдеру."""
+        if status_code == STATUS_CANCELLED:
+            # Отмена клиентом ничего не говорит о здоровье провайдера
+            self.breaker.release_probe()
+        elif is_provider_failure(status_code):
+            self.breaker.record_failure()
+        else:
+            if status_code == 200:
+                self.latency.record(seconds)
+            self.breaker.record_success()
+
+    def snapshot(self):
+        snapshot = {"provider": self.name}
+        snapshot.update(self.latency.snapshot())
+        snapshot.update(self.breaker.snapshot())
+        return snapshot
+
+
+_providers = {}
+_providers_lock = threading.Lock()
+
+
+def get_provider_health(name):
+    """Возвращает состояние провайдера, создавая его при первом обращении."""
+    with _providers_lock:
+        if name not in _providers:
+            _providers[name] = ProviderHealth(name)
+        return _providers[name]
+
+
+def get_providers_snapshot():
+    """Состояние всех известных провайдеров."""
+    with _providers_lock:
+        providers = list(_providers.values())
+    return [provider.snapshot() for provider in providers]
@@ -0,0 +1,131 @@
+"""providers.py - ленивый реестр клиентов LLM-провайдеров.
+
+Клиенты (GigaChat, HTTP-сессия OpenRouter) создаются не при импорте модулей,
+а при первом обращении или в фоновом прогреве после старта приложения.
+Благодаря этому процесс начинает принимать запросы за доли секунды, а
+готовность провайдеров отслеживается отдельно (см. /ready в main.py).
+
+Каждый провайдер регистрируется с:
+    - factory - функция, создающая клиент;
+    - warm    - необязательная функция прогрева (например, открытие соединений);
+    - close   - необязательная функция закрытия при остановке.
+"""
+
+import threading
+import time
+
+PENDING = "pending"
+WARMING = "warming"
+READY = "ready"
+FAILED = "failed"
+
+
+class ProviderRegistry:
+    """Реестр провайдеров с ленивым созданием и фоновым прогревом."""
+
+    def __init__(self):
+        self._providers = {}
+        self._lock = threading.Lock()
+
+    def register(self, name, factory, warm=None, close=None):
+        with self._lock:
+            self._providers[name] = {
+                "factory": factory,
+                "warm": warm,
+                "close": close,
+                "instance": None,
+                "status": PENDING,
+                "error": None,
+                "createSeconds": None,
+                "warmSeconds": None,
+                "lock": threading.Lock(),
+            }
+
+    def get(self, name):
+        """Возвращает клиент провайдера, создавая его при первом обращении."""
+        provider = self._providers[name]
+        if provider["instance"] is None:
+            with provider["lock"]:
+                if provider["instance"] is None:
+                    started_at = time.monotonic()
+                    provider["instance"] = provider["factory"]()
+                    provider["createSeconds"] = round(time.monotonic() - started_at, 3)
+        return provider["instance"]
+
+    def warm_up(self, name):
+        """Создает и прогревает провайдер; ошибки не пробрасываются, а запоминаются."""
+        provider = self._providers[name]
+        provider["status"] = WARMING
+        started_at = time.monotonic()
+        try:
+            instance = self.get(name)
+            if provider["warm"] is not None:
+                provider["warm"](instance)
+            provider["status"] = READY
+        except Exception as e:
+            print(f"Не удалось прогреть провайдер {name}: {e}")
+            provider["status"] = FAILED
+            provider["error"] = str(e)
+        provider["warmSeconds"] = round(time.monotonic() - started_at, 3)
+        print(f"=== Провайдер {name}: {provider['status']} за {provider['warmSeconds']} с ===")
+
+    def warm_up_all(self):
+        """Прогревает все провайдеры параллельно и ждет завершения."""
+        threads = [
+            threading.Thread(target=self.warm_up, args=(name,), daemon=True)
+            for name in list(self._providers)
+        ]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+    def start_warm_up(self):
+        """Запускает прогрев в фоне, не блокируя старт приложения."""
+        thread = threading.Thread(target=self.warm_up_all, name="providers-warm-up", daemon=True)
+        thread.start()
+        return thread
+
+    def overall_status(self):
+        """
+        Общее состояние провайдеров.
+
+        Returns:
+            READY - все провайдеры готовы; FAILED - прогрев хотя бы одного
+            завершился ошибкой; WARMING - остальные еще прогреваются
+        """
+        statuses = [provider["status"] for provider in self._providers.values()]
+        if all(status == READY for status in statuses):
+            return READY
+        if FAILED in statuses:
+            return FAILED
+        return WARMING
+
+    def is_ready(self):
+        """Все ли провайдеры успешно прошли прогрев."""
+        return self.overall_status() == READY
+
+    def close_all(self):
+        for name, provider in self._providers.items():
+            if provider["instance"] is not None and provider["close"] is not None:
+                try:
+                    provider["close"](provider["instance"])
+                except Exception as e:
+                    print(f"Ошибка при закрытии провайдера {name}: {e}")
+            provider["instance"] = None
+            provider["status"] = PENDING
+
+    def status(self):
+        return {
+            name: {
+                "status": provider["status"],
+                "error": provider["error"],
+                "createSeconds": provider["createSeconds"],
+                "warmSeconds": provider["warmSeconds"],
+            }
+            for name, provider in self._providers.items()
+        }
+
+
+# Общий реестр приложения
+registry = ProviderRegistry()
@@ -0,0 +1,199 @@
+"""result_cache.py - кэш результатов анализа и суммаризации.
+
+Одинаковые сравнения (те же банки, типы карт и критерии, в любом порядке)
+не должны заново проходить весь LLM-пайплайн. Кэш хранит результаты в памяти
+с ограничением размера (LRU) и временем жизни (TTL), а при заданной директории
+дублирует их на диск, чтобы они переживали перезапуск сервера. Дисковый
+уровень ограничен так же: при каждой записи удаляются устаревшие файлы и
+самые старые сверх RESULT_CACHE_SIZE.
+
+Параметры задаются переменными окружения:
+    - RESULT_CACHE_SIZE - макс. число записей в памяти и на диске;
+    - RESULT_CACHE_TTL  - время жизни записи в секундах;
+    - RESULT_CACHE_DIR  - директория дискового уровня (пусто - без диска).
+"""
+
+import hashlib
+import json
+import os
+import threading
+import time
+from collections import OrderedDict
+
+RESULT_CACHE_SIZE = int(os.getenv("RESULT_CACHE_SIZE", "256"))
+RESULT_CACHE_TTL = float(os.getenv("RESULT_CACHE_TTL", "3600"))
+RESULT_CACHE_DIR = os.getenv("RESULT_CACHE_DIR", "")
+
+
+def make_cache_key(stage, card_types, banks, criteria, version):
+    """
+    Строит ключ кэша по каноническому виду запроса.
+
+    Списки сортируются и очищаются от дубликатов, поэтому порядок выбора
+    банков и критериев на фронтенде не влияет на ключ.
+
+    Args:
+        stage: Этап пайплайна ("analysis", "summary" и т.п.)
+        card_types: Типы карт
+        banks: Банки
+        criteria: Критерии
+        version: Хэш версии входных данных этапа (набора данных
+            или результатов анализа моделей)
+
+    Returns:
+        Строка-ключ (sha256)
+    """
+    canonical = json.dumps({
+        "stage": stage,
+        "cardType": sorted(set(card_types)),
+        "banks": sorted(set(banks)),
+        "criteria": sorted(set(criteria)),
+        "version": version,
+    }, ensure_ascii=False, sort_keys=True)
+    return hashlib.sha256(canonical.encode("utf-8")).hexdigest()
+
+
+class ResultCache:
+    """LRU-кэш с TTL, необязательным дисковым уровнем и счетчиками попаданий."""
+
+    def __init__(self, max_size=RESULT_CACHE_SIZE, ttl=RESULT_CACHE_TTL, cache_dir=RESULT_CACHE_DIR):
+        self.max_size = max_size
+        self.ttl = ttl
+        self.cache_dir = cache_dir or None
+        self._entries = OrderedDict()  # key -> (expires_at, value)
+        self._lock = threading.Lock()
+        self._prune_lock = threading.Lock()
+        self.hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+
+        if self.cache_dir:
+            os.makedirs(self.cache_dir, exist_ok=True)
+
+    def _disk_path(self, key):
+        return os.path.join(self.cache_dir, f"{key}.json")
+
+    def _read_disk(self, key):
+        """Читает запись с диска; возвращает (expires_at, value) или None."""
+        if not self.cache_dir:
+            return None
+        try:
+            with open(self._disk_path(key), 'r', encoding='utf-8') as f:
+                record = json.load(f)
+            return record["expires_at"], record["value"]
+        except (OSError, ValueError, KeyError):
+            return None
+
+    def _write_disk(self, key, expires_at, value):
+        """Атомарно записывает запись на диск (через временный файл)."""
+        if not self.cache_dir:
+            return
+        path = self._disk_path(key)
+        tmp_path = f"{path}.{threading.get_ident()}.tmp"
+        try:
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                json.dump({"expires_at": expires_at, "value": value}, f, ensure_ascii=False)
+            os.replace(tmp_path, path)
+        except (OSError, TypeError) as e:
+            print(f"Не удалось сохранить запись кэша на диск: {e}")
+
+    def _remove_disk(self, key):
+        if not self.cache_dir:
+            return
+        self._remove_file(self._disk_path(key))
+
+    def _prune_disk(self):
+        """Удаляет с диска устаревшие записи и самые старые сверх max_size."""
+        if not self.cache_dir or not self._prune_lock.acquire(blocking=False):
+            # Очистку уже выполняет другой поток
+            return
+        try:
+            # Файл записывается при set(), поэтому запись устарела, если mtime старше TTL
+            stale_before = time.time() - self.ttl
+            records = []
+            with os.scandir(self.cache_dir) as entries:
+                for entry in entries:
+                    try:
+                        mtime = entry.stat().st_mtime
+                    except OSError:
+                        continue
+                    if mtime < stale_before:
+                        # Устаревшие записи и временные файлы прерванных записей
+                        self._remove_file(entry.path)
+                    elif entry.name.endswith(".json"):
+                        records.append((mtime, entry.path))
+            records.sort()
+            for _, path in records[:max(0, len(records) - self.max_size)]:
+                self._remove_file(path)
+        finally:
+            self._prune_lock.release()
+
+    @staticmethod
+    def _remove_file(path):
+        try:
+            os.remove(path)
+        except OSError:
+            pass
+
+    def get(self, key):
+        """Возвращает значение по ключу или None, если записи нет или она устарела."""
+        now = time.time()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                expires_at, value = entry
+                if expires_at > now:
+                    self._entries.move_to_end(key)
+                    self.hits += 1
+                    return value
+                del self._entries[key]
+
+        # Промах в памяти - пробуем дисковый уровень
+        entry = self._read_disk(key)
+        with self._lock:
+            if entry is not None and entry[0] > now:
+                self._store(key, *entry)
+                self.hits += 1
+                self.disk_hits += 1
+                return entry[1]
+            self.misses += 1
+
+        if entry is not None:
+            self._remove_disk(key)
+        return None
+
+    def _store(self, key, expires_at, value):
+        """Кладет запись в память с вытеснением самых старых (вызывать под блокировкой)."""
+        self._entries[key] = (expires_at, value)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_size:
+            self._entries.popitem(last=False)
+
+    def set(self, key, value):
+        """Сохраняет значение в памяти и, если включен, на диске."""
+        expires_at = time.time() + self.ttl
+        with self._lock:
+            self._store(key, expires_at, value)
+        self._write_disk(key, expires_at, value)
+        self._prune_disk()
+
+    def invalidate(self, key):
+        """Удаляет запись из памяти и с диска."""
+        with self._lock:
+            self._entries.pop(key, None)
+        self._remove_disk(key)
+
+    def stats(self):
+        """Возвращает счетчики попаданий и промахов."""
+        with self._lock:
+            total = self.hits + self.misses
+            return {
+                "size": len(self._entries),
+                "maxSize": self.max_size,
+                "ttl": self.ttl,
+                "persistent": self.cache_dir is not None,
+                "hits": self.hits,
+                "diskHits": self.disk_hits,
+                "misses": self.misses,
+                "hitRate": round(self.hits / total, 4) if total else 0.0,
+            }
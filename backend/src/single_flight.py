@@ -0,0 +1,139 @@
+"""single_flight.py - объединение одинаковых одновременных запросов.
+
+Если несколько пользователей одновременно запрашивают одно и то же сравнение,
+пайплайн запускается один раз: первый запрос ("лидер") выполняет работу, а
+остальные ждут его результата. Все ожидающие освобождаются одновременно и
+получают тот же результат или то же исключение.
+
+Для потоковых этапов (генераторов) есть stream(): генератор выполняется один
+раз в фоновом потоке, а все запросы с тем же ключом получают его элементы по
+мере появления. Отключение одного из клиентов не прерывает работу для остальных.
+"""
+
+import threading
+
+
+class _Call:
+    """Выполняющийся вызов, результата которого ждут остальные запросы."""
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+        self.waiters = 0
+        # Для stream(): уже полученные элементы генератора
+        self.items = []
+        self.changed = threading.Condition()
+
+
+class SingleFlight:
+    """Гарантирует, что для каждого ключа одновременно выполняется не более одного вызова."""
+
+    def __init__(self):
+        self._calls = {}
+        self._lock = threading.Lock()
+        self.leaders = 0
+        self.coalesced = 0
+
+    def do(self, key, func, *args, **kwargs):
+        """
+        Выполняет func(*args, **kwargs) или дожидается уже выполняющегося вызова с тем же ключом.
+
+        Returns:
+            Результат func
+
+        Raises:
+            Исключение, выброшенное func (в том числе всем ожидающим)
+        """
+        with self._lock:
+            call, leader = self._join(key)
+
+        if not leader:
+            call.done.wait()
+            if call.error is not None:
+                raise call.error
+            return call.result
+
+        try:
+            call.result = func(*args, **kwargs)
+        except Exception as e:
+            call.error = e
+            raise
+        finally:
+            # Снимаем ключ до освобождения ожидающих, чтобы новые запросы
+            # после завершения запускали свежий вызов
+            with self._lock:
+                del self._calls[key]
+            call.done.set()
+
+        return call.result
+
+    def _join(self, key):
+        """Возвращает (вызов, лидер ли это) для ключа (вызывать под блокировкой)."""
+        call = self._calls.get(key)
+        if call is not None:
+            call.waiters += 1
+            self.coalesced += 1
+            return call, False
+        call = _Call()
+        self._calls[key] = call
+        self.leaders += 1
+        return call, True
+
+    def stream(self, key, func, *args, **kwargs):
+        """
+        Отдает элементы генератора func(*args, **kwargs), выполняя его не более одного раза на ключ.
+
+        Ключи stream() и do() не должны совпадать.
+
+        Yields:
+            Элементы генератора; присоединившийся позже сначала получает уже готовые
+
+        Raises:
+            Исключение, выброшенное func (каждому подписчику после полученных элементов)
+        """
+        with self._lock:
+            call, leader = self._join(key)
+        if leader:
+            threading.Thread(
+                target=self._produce, args=(key, call, func, args, kwargs),
+                name="single-flight-stream", daemon=True
+            ).start()
+
+        position = 0
+        while True:
+            with call.changed:
+                while position == len(call.items) and not call.done.is_set():
+                    call.changed.wait()
+                items = call.items[position:]
+                finished = call.done.is_set()
+            position += len(items)
+            yield from items
+            if finished and position == len(call.items):
+                break
+        if call.error is not None:
+            raise call.error
+
+    def _produce(self, key, call, func, args, kwargs):
+        """Выполняет генератор лидера stream() и раздает его элементы подписчикам."""
+        try:
+            for item in func(*args, **kwargs):
+                with call.changed:
+                    call.items.append(item)
+                    call.changed.notify_all()
+        except Exception as e:
+            call.error = e
+        finally:
+            with self._lock:
+                del self._calls[key]
+            with call.changed:
+                call.done.set()
+                call.changed.notify_all()
+
+    def stats(self):
+        with self._lock:
+            return {
+                "inFlight": len(self._calls),
+                "leaders": self.leaders,
+                "coalesced": self.coalesced,
+            }
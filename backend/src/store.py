@@ -0,0 +1,329 @@
+"""store.py - хранилище продуктов банков в SQLite (SQLAlchemy).
+
+Хранит историю данных сравнения: каждый импорт (JSON из src/data или CSV
+парсера banki.ru) становится снимком, а значения критериев привязаны к
+снимку и продукту. Таблицы:
+    - banks / criteria      - справочники с уникальными названиями;
+    - products              - продукт банка (название, тип карты);
+    - snapshots             - факт импорта: время и источник;
+    - product_values        - значение критерия продукта в снимке: исходный
+                              текст (JSON) и разобранные min/max/unit/period.
+
+Запросы по банку, критерию и дате идут по индексам и не читают весь набор.
+
+Снимки пополняются автоматически: бэкенд импортирует каждую загруженную
+версию analysis_data.json (sync_dataset, повторно версия не импортируется),
+а парсер с флагом --store - результаты обхода banki.ru. Чтение (get_history)
+не создает файл БД: пока снимков нет, история пуста.
+
+Параметры задаются переменными окружения:
+    - PRODUCT_STORE_URL - адрес БД SQLAlchemy (по умолчанию src/data/products.db).
+
+Импорт из командной строки (из директории backend):
+    python -m src.store import-json [src/data/analysis_data.json]
+    python -m src.store import-csv banki_test_data.csv
+"""
+
+import argparse
+import csv
+import json
+import os
+import threading
+from datetime import datetime, timezone
+from typing import Any, Dict, Iterable, List, Optional
+
+from sqlalchemy import (
+    Float, ForeignKey, Index, Integer, SmallInteger, String, Text, DateTime,
+    UniqueConstraint, create_engine, make_url, select,
+)
+from sqlalchemy.orm import DeclarativeBase, Mapped, Session, mapped_column
+
+from src.catalog import NameIndex, BANK_ALIASES, CRITERIA_ALIASES
+from src.dataset import ANALYSIS_DATA_PATH
+from src.numeric import parse_value
+
+PRODUCT_STORE_URL = os.getenv(
+    "PRODUCT_STORE_URL",
+    "sqlite:///" + os.path.join(os.path.dirname(__file__), "data", "products.db"),
+)
+
+# Название продукта для сводных данных без разбивки по продуктам (analysis_data.json)
+SUMMARY_PRODUCT = "Сводные данные"
+
+# Служебные колонки CSV парсера; остальные колонки - критерии
+CSV_COLUMNS = {"type", "bank", "product"}
+
+
+class Base(DeclarativeBase):
+    pass
+
+
+class Bank(Base):
+    __tablename__ = "banks"
+
+    id: Mapped[int] = mapped_column(Integer, primary_key=True)
+    name: Mapped[str] = mapped_column(String(200), unique=True, index=True)
+
+
+class Criterion(Base):
+    __tablename__ = "criteria"
+
+    id: Mapped[int] = mapped_column(Integer, primary_key=True)
+    name: Mapped[str] = mapped_column(String(200), unique=True, index=True)
+
+
+class Product(Base):
+    __tablename__ = "products"
+    __table_args__ = (UniqueConstraint("bank_id", "name", "card_type"),)
+
+    id: Mapped[int] = mapped_column(Integer, primary_key=True)
+    bank_id: Mapped[int] = mapped_column(ForeignKey("banks.id"), index=True)
+    name: Mapped[str] = mapped_column(String(300))
+    card_type: Mapped[str] = mapped_column(String(100), default="")
+
+
+class Snapshot(Base):
+    __tablename__ = "snapshots"
+
+    id: Mapped[int] = mapped_column(Integer, primary_key=True)
+    created_at: Mapped[datetime] = mapped_column(DateTime, index=True)
+    source: Mapped[str] = mapped_column(String(300))
+
+
+class ProductValue(Base):
+    __tablename__ = "product_values"
+    __table_args__ = (
+        Index("ix_values_criterion_product_snapshot", "criterion_id", "product_id", "snapshot_id"),
+        Index("ix_values_snapshot", "snapshot_id"),
+    )
+
+    id: Mapped[int] = mapped_column(Integer, primary_key=True)
+    snapshot_id: Mapped[int] = mapped_column(ForeignKey("snapshots.id"))
+    product_id: Mapped[int] = mapped_column(ForeignKey("products.id"))
+    criterion_id: Mapped[int] = mapped_column(ForeignKey("criteria.id"))
+    value_json: Mapped[str] = mapped_column(Text)
+    value_min: Mapped[Optional[float]] = mapped_column(Float, nullable=True)
+    value_max: Mapped[Optional[float]] = mapped_column(Float, nullable=True)
+    unit: Mapped[str] = mapped_column(String(10), default="")
+    period: Mapped[str] = mapped_column(String(10), default="")
+    available: Mapped[int] = mapped_column(SmallInteger, default=-1)
+
+
+_engine = {"engine": None}
+_engine_lock = threading.Lock()
+_sync_lock = threading.Lock()
+
+
+def _store_exists() -> bool:
+    """Есть ли уже БД: для SQLite - файл, остальные БД считаются созданными"""
+    url = make_url(PRODUCT_STORE_URL)
+    if url.get_backend_name() == "sqlite" and url.database not in (None, "", ":memory:"):
+        return os.path.exists(url.database)
+    return True
+
+
+def get_engine(create: bool = True):
+    """
+    Возвращает движок БД, создавая таблицы при первом обращении.
+
+    При create=False (чтение) файл БД не создается: если его еще нет, возвращается None.
+    """
+    if _engine["engine"] is None:
+        if not create and not _store_exists():
+            return None
+        with _engine_lock:
+            if _engine["engine"] is None:
+                engine = create_engine(PRODUCT_STORE_URL)
+                Base.metadata.create_all(engine)
+                _engine["engine"] = engine
+    return _engine["engine"]
+
+
+def _nan_to_none(value: float) -> Optional[float]:
+    return None if value != value else value
+
+
+class _Importer:
+    """Добавляет строки одного снимка, переиспользуя записи справочников."""
+
+    def __init__(self, session: Session, source: str):
+        self.session = session
+        self.snapshot = Snapshot(created_at=datetime.now(timezone.utc).replace(tzinfo=None), source=source)
+        session.add(self.snapshot)
+        session.flush()
+
+        self._banks = {bank.name: bank for bank in session.scalars(select(Bank))}
+        self._criteria = {criterion.name: criterion for criterion in session.scalars(select(Criterion))}
+        self._products = {
+            (product.bank_id, product.name, product.card_type): product
+            for product in session.scalars(select(Product))
+        }
+        # Названия приводятся к каноническим, чтобы "ПСБ" и "Промсвязьбанк (ПСБ)" были одним банком
+        self._bank_names = NameIndex(list(self._banks), BANK_ALIASES)
+        self._criterion_names = NameIndex(list(self._criteria), CRITERIA_ALIASES)
+        self.count = 0
+
+    def _get(self, cache, model, name):
+        if name not in cache:
+            cache[name] = model(name=name)
+            self.session.add(cache[name])
+            self.session.flush()
+        return cache[name]
+
+    def add(self, bank_name: str, product_name: str, card_type: str, criterion_name: str, raw: Any):
+        bank = self._get(self._banks, Bank, self._bank_names.resolve(bank_name, fuzzy=False) or bank_name)
+        criterion = self._get(
+            self._criteria, Criterion,
+            self._criterion_names.resolve(criterion_name, fuzzy=False) or criterion_name
+        )
+        product_key = (bank.id, product_name, card_type)
+        if product_key not in self._products:
+            self._products[product_key] = Product(bank_id=bank.id, name=product_name, card_type=card_type)
+            self.session.add(self._products[product_key])
+            self.session.flush()
+
+        parsed = parse_value(raw)
+        self.session.add(ProductValue(
+            snapshot_id=self.snapshot.id,
+            product_id=self._products[product_key].id,
+            criterion_id=criterion.id,
+            value_json=json.dumps(raw, ensure_ascii=False),
+            value_min=_nan_to_none(parsed["min"]),
+            value_max=_nan_to_none(parsed["max"]),
+            unit=parsed["unit"],
+            period=parsed["period"],
+            available=parsed["available"],
+        ))
+        self.count += 1
+
+
+def import_comparison_data(data: Dict[str, Any], source: str) -> int:
+    """
+    Импортирует данные в формате analysis_data.json как новый снимок.
+
+    Returns:
+        id снимка
+    """
+    with Session(get_engine()) as session, session.begin():
+        importer = _Importer(session, source)
+        for item in data.get("comparison_table", []):
+            criterion_name = item.get("criteria") or item.get("criterion")
+            if not criterion_name:
+                continue
+            for bank_name, raw in item.get("info", {}).items():
+                importer.add(bank_name, SUMMARY_PRODUCT, "", criterion_name, raw)
+        print(f"=== Импортировано значений: {importer.count} (снимок {importer.snapshot.id}) ===")
+        return importer.snapshot.id
+
+
+def sync_dataset(data: Dict[str, Any], version: str) -> Optional[int]:
+    """
+    Импортирует версию analysis_data.json как снимок, если ее еще нет в хранилище.
+
+    Returns:
+        id нового снимка или None, если версия уже импортирована
+    """
+    source = f"{os.path.basename(ANALYSIS_DATA_PATH)}@{version[:12]}"
+    with _sync_lock:
+        with Session(get_engine()) as session:
+            if session.scalar(select(Snapshot.id).where(Snapshot.source == source)) is not None:
+                return None
+        return import_comparison_data(data, source)
+
+
+def import_json(path: str) -> int:
+    with open(path, 'r', encoding='utf-8') as f:
+        return import_comparison_data(json.load(f), os.path.basename(path))
+
+
+def import_rows(rows: Iterable[Dict[str, Any]], source: str) -> int:
+    """
+    Импортирует строки парсера (type, bank, product и колонки критериев) как новый снимок.
+
+    Returns:
+        id снимка
+    """
+    with Session(get_engine()) as session, session.begin():
+        importer = _Importer(session, source)
+        for row in rows:
+            for column, raw in row.items():
+                if column in CSV_COLUMNS or raw in (None, "", "N/A"):
+                    continue
+                importer.add(row["bank"], row.get("product") or SUMMARY_PRODUCT, row.get("type") or "", column, raw)
+        print(f"=== Импортировано значений: {importer.count} (снимок {importer.snapshot.id}) ===")
+        return importer.snapshot.id
+
+
+def import_csv(path: str) -> int:
+    with open(path, 'r', encoding='utf-8', newline='') as f:
+        return import_rows(csv.DictReader(f), os.path.basename(path))
+
+
+def _resolve_names(session: Session, model, aliases: Dict[str, List[str]], names: List[str],
+                   fuzzy: bool = True) -> Dict[str, str]:
+    """Сопоставляет названия из запроса с названиями в справочнике БД"""
+    index = NameIndex(session.scalars(select(model.name)).all(), aliases)
+    resolved = {}
+    for name in names:
+        canonical = index.resolve(name, fuzzy=fuzzy)
+        if canonical is not None:
+            resolved[name] = canonical
+    return resolved
+
+
+def get_history(bank: str, criterion: str, since: Optional[datetime] = None) -> List[Dict[str, Any]]:
+    """История значений критерия банка по снимкам (от старых к новым)"""
+    engine = get_engine(create=False)
+    if engine is None:
+        return []
+    with Session(engine) as session:
+        bank = _resolve_names(session, Bank, BANK_ALIASES, [bank], fuzzy=False).get(bank, bank)
+        criterion = _resolve_names(session, Criterion, CRITERIA_ALIASES, [criterion]).get(criterion, criterion)
+
+    query = (
+        select(Snapshot.created_at, Snapshot.source, Product.name, ProductValue)
+        .join(Product, Product.id == ProductValue.product_id)
+        .join(Bank, Bank.id == Product.bank_id)
+        .join(Criterion, Criterion.id == ProductValue.criterion_id)
+        .join(Snapshot, Snapshot.id == ProductValue.snapshot_id)
+        .where(Bank.name == bank, Criterion.name == criterion)
+        .order_by(ProductValue.snapshot_id, Product.id, ProductValue.id)
+    )
+    if since is not None:
+        query = query.where(Snapshot.created_at >= since)
+
+    with Session(engine) as session:
+        return [
+            {
+                "date": created_at.isoformat(),
+                "source": source,
+                "product": product_name,
+                "value": json.loads(value.value_json),
+                "min": value.value_min,
+                "max": value.value_max,
+                "unit": value.unit,
+                "period": value.period,
+            }
+            for created_at, source, product_name, value in session.execute(query)
+        ]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Импорт данных в хранилище продуктов")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+    json_parser = subparsers.add_parser("import-json", help="Импорт analysis_data.json")
+    json_parser.add_argument(
+        "path", nargs="?", default=os.path.join(os.path.dirname(__file__), "data", "analysis_data.json")
+    )
+    csv_parser = subparsers.add_parser("import-csv", help="Импорт CSV парсера banki.ru")
+    csv_parser.add_argument("path")
+    args = parser.parse_args()
+
+    if args.command == "import-json":
+        import_json(args.path)
+    else:
+        import_csv(args.path)
+
+
+if __name__ == "__main__":
+    main()
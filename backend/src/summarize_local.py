@@ -0,0 +1,264 @@
+"""summarize_local.py - локальная суммаризация без обращения к сети.
+
+Объединяет отчеты моделей в итоговый отчет той же структуры, что и
+удаленный суммаризатор (см. model_summarize.py):
+    1. Экстрактивный режим (по умолчанию): отчеты разбиваются на разделы по
+       заголовкам, каждый раздел сопоставляется с пунктом итоговой структуры,
+       а из всех отчетов отбираются наиболее подтвержденные пункты и
+       предложения без повторов.
+    2. Режим локальной модели: текстовые разделы дополнительно сжимаются
+       моделью из MODEL_CONFIG с параметрами GENERATION_PRESETS. Требует
+       transformers; если модель недоступна, используется экстрактивный режим.
+
+Режим задается переменной окружения SUMMARY_LOCAL_BACKEND ("extractive" или "model").
+"""
+
+import ast
+import os
+import re
+import threading
+
+from src.config import MODEL_CONFIG, GENERATION_PRESETS
+
+SUMMARY_LOCAL_BACKEND = os.getenv("SUMMARY_LOCAL_BACKEND", "extractive")
+LOCAL_MODEL_NAME = "local-extractive"
+
+# Пункты итогового отчета: (заголовок, ключевые слова заголовков исходных разделов, список?)
+SECTIONS = [
+    ("1. Общее описание и концепция", ("обзор", "описан", "концепц", "введен", "общ"), False),
+    ("2. Потенциал и ценность", ("потенциал", "ценност", "выгод", "возможност"), False),
+    ("3. Ключевые преимущества", ("преимущ", "сильн", "конкурентн", "выигрыв", "плюс"), True),
+    ("4. Ключевые риски и ограничения", ("риск", "огранич", "недостат", "слаб", "отста", "минус", "уступ"), True),
+    ("5. Целевая аудитория", ("аудитор", "целев", "клиент", "сегмент", "позиционир"), False),
+    ("6. Рекомендации и выводы", ("рекоменд", "вывод", "итог", "заключ", "развит", "улучш"), False),
+]
+
+MAX_BULLETS = 5
+MAX_SENTENCES = 3
+SIMILARITY_THRESHOLD = 0.5
+
+_HEADER_RE = re.compile(r"^\s*(#{1,6}\s+.+|\*\*[^*]+\*\*:?\s*)$")
+_BULLET_RE = re.compile(r"^\s*(?:[-*•]|\d+[.)])\s+(.+)$")
+_SENTENCE_SPLIT_RE = re.compile(r"(?<=[.!?])\s+(?=[А-ЯЁA-Z«\"])")
+_WORD_RE = re.compile(r"[а-яёa-z0-9]+")
+
+
+def _clean(text):
+    """Убирает markdown-разметку."""
+    text = re.sub(r"[*_`#>]+", "", text)
+    return re.sub(r"\s+", " ", text).strip()
+
+
+def _tokens(text):
+    """Набор нормализованных основ слов для сравнения фрагментов."""
+    return {word[:6] for word in _WORD_RE.findall(text.lower()) if len(word) > 3}
+
+
+def _similarity(a, b):
+    if not a or not b:
+        return 0.0
+    return len(a & b) / len(a | b)
+
+
+def _classify(header):
+    """Возвращает индекс пункта итоговой структуры для заголовка или None."""
+    header = header.lower()
+    best_index, best_position = None, len(header)
+    # Побеждает ключевое слово, стоящее в заголовке раньше остальных
+    for index, (_, keywords, _) in enumerate(SECTIONS):
+        for keyword in keywords:
+            position = header.find(keyword)
+            if position != -1 and position < best_position:
+                best_index, best_position = index, position
+    return best_index
+
+
+def parse_model_results(models_analysis_results):
+    """
+    Извлекает тексты успешных ответов моделей.
+
+    Args:
+        models_analysis_results: Список строк вида str(dict) из save_models_results
+
+    Returns:
+        Список текстов ответов со status_code 200
+    """
+    texts = []
+    for item in models_analysis_results:
+        if isinstance(item, str):
+            try:
+                item = ast.literal_eval(item)
+            except (ValueError, SyntaxError):
+                continue
+        if isinstance(item, dict) and item.get("status_code") == 200 and item.get("response"):
+            texts.append(item["response"])
+    return texts
+
+
+def split_report(text):
+    """
+    Разбивает отчет на пункты итоговой структуры.
+
+    Подзаголовки без ключевых слов наследуют раздел родительского заголовка.
+    Строки-вводки, оканчивающиеся двоеточием, тоже могут переключить раздел.
+
+    Returns:
+        Список длины len(SECTIONS) из пар (bullets, sentences)
+    """
+    sections = [([], []) for _ in SECTIONS]
+    current = 0
+
+    for line in text.splitlines():
+        if not line.strip():
+            continue
+        if _HEADER_RE.match(line):
+            index = _classify(_clean(line))
+            if index is not None:
+                current = index
+            continue
+
+        bullets, sentences = sections[current]
+        bullet = _BULLET_RE.match(line)
+        if bullet:
+            cleaned = _clean(bullet.group(1))
+            if cleaned:
+                bullets.append(cleaned)
+        else:
+            cleaned = _clean(line)
+            if cleaned.endswith(":"):
+                index = _classify(cleaned)
+                if index is not None:
+                    current = index
+            elif cleaned:
+                sentences.extend(s for s in _SENTENCE_SPLIT_RE.split(cleaned) if len(s) > 20)
+
+    return sections
+
+
+def select_fragments(fragments_by_report, limit):
+    """
+    Отбирает наиболее подтвержденные фрагменты без повторов.
+
+    Фрагмент ценнее, если похожие на него встречаются в других отчетах;
+    при равенстве сохраняется исходный порядок.
+
+    Args:
+        fragments_by_report: Список списков фрагментов (по одному на отчет)
+        limit: Макс. число фрагментов
+
+    Returns:
+        Список выбранных фрагментов
+    """
+    candidates = []
+    for report_index, fragments in enumerate(fragments_by_report):
+        for position, fragment in enumerate(fragments):
+            candidates.append((report_index, position, fragment, _tokens(fragment)))
+
+    scored = []
+    for report_index, position, fragment, tokens in candidates:
+        support = {
+            other_report for other_report, _, _, other_tokens in candidates
+            if other_report != report_index and _similarity(tokens, other_tokens) >= SIMILARITY_THRESHOLD
+        }
+        centrality = sum(_similarity(tokens, other[3]) for other in candidates)
+        scored.append((-len(support), -centrality, position, report_index, fragment, tokens))
+    scored.sort(key=lambda item: item[:4])
+
+    selected = []
+    for *_, fragment, tokens in scored:
+        if all(_similarity(tokens, chosen_tokens) < SIMILARITY_THRESHOLD for _, chosen_tokens in selected):
+            selected.append((fragment, tokens))
+        if len(selected) >= limit:
+            break
+    return [fragment for fragment, _ in selected]
+
+
+_local_model = {"pipeline": None, "failed": False}
+_local_model_lock = threading.Lock()
+
+
+def _get_local_pipeline(config_name="primary"):
+    """Лениво загружает локальную модель суммаризации; None, если она недоступна."""
+    with _local_model_lock:
+        if _local_model["pipeline"] is None and not _local_model["failed"]:
+            try:
+                from transformers import pipeline
+                _local_model["pipeline"] = pipeline(
+                    "summarization", model=MODEL_CONFIG[config_name]["model_name"]
+                )
+            except Exception as e:
+                print(f"Локальная модель суммаризации недоступна: {e}")
+                _local_model["failed"] = True
+        return _local_model["pipeline"]
+
+
+def summarize_with_local_model(text, config_name="primary", preset="general"):
+    """Сжимает текст локальной моделью; возвращает None, если модель недоступна."""
+    summarizer = _get_local_pipeline(config_name)
+    if summarizer is None:
+        return None
+    config = MODEL_CONFIG[config_name]
+    try:
+        output = summarizer(
+            text,
+            max_length=config["max_output_length"],
+            min_length=config["min_output_length"],
+            truncation=True,
+            **GENERATION_PRESETS[preset],
+        )
+        return output[0]["summary_text"].strip()
+    except Exception as e:
+        print(f"Ошибка локальной модели суммаризации: {e}")
+        return None
+
+
+def summarize_locally(models_analysis_results, backend=None):
+    """
+    Строит итоговый отчет по результатам моделей без обращения к сети.
+
+    Args:
+        models_analysis_results: Список результатов анализа от моделей
+        backend: "extractive" или "model" (по умолчанию SUMMARY_LOCAL_BACKEND)
+
+    Returns:
+        Словарь в формате make_openrouter_request
+    """
+    backend = backend or SUMMARY_LOCAL_BACKEND
+    texts = parse_model_results(models_analysis_results)
+    if not texts:
+        return {
+            "model": LOCAL_MODEL_NAME,
+            "response": "Нет успешных результатов анализа для суммаризации",
+            "reasoning_present": False,
+            "status_code": -3
+        }
+
+    reports = [split_report(text) for text in texts]
+    lines = ["ИТОГОВЫЙ АНАЛИЗ ПРОДУКТА: продукт Сбера", ""]
+
+    for index, (title, _, is_list) in enumerate(SECTIONS):
+        bullets = [report[index][0] for report in reports]
+        sentences = [report[index][1] for report in reports]
+        lines.append(f"{title}:")
+
+        if is_list:
+            items = select_fragments(bullets, MAX_BULLETS) or select_fragments(sentences, MAX_BULLETS)
+            lines.extend(f"- {item}" for item in items)
+        else:
+            items = select_fragments(sentences, MAX_SENTENCES) or select_fragments(bullets, MAX_SENTENCES)
+            paragraph = " ".join(items)
+            if backend == "model" and paragraph:
+                paragraph = summarize_with_local_model(paragraph) or paragraph
+            if paragraph:
+                lines.append(paragraph)
+
+        if not items:
+            lines.append("Недостаточно данных в исходных отчетах.")
+        lines.append("")
+
+    return {
+        "model": LOCAL_MODEL_NAME,
+        "response": "\n".join(lines).strip(),
+        "reasoning_present": False,
+        "status_code": 200
+    }
@@ -0,0 +1,50 @@
+"""Тесты сопоставления названий банков и критериев с данными сравнения."""
+
+from src.catalog import NameIndex, BANK_ALIASES
+from src.dataset import DatasetIndex, NO_DATA, get_comparison_data_for_criteria
+
+DATA = {
+    "comparison_table": [
+        {"criteria": "Кредитный лимит", "info": {"Т-Банк": "до 1 000 000 ₽", "ВТБ": "до 1 500 000 ₽"}},
+        {"criterion": "Стоимость обслуживания", "info": {"Т-Банк": "От 1 990 до 3 588 RUB"}},
+    ]
+}
+
+
+def make_index():
+    return DatasetIndex(DATA, "test", 0.0)
+
+
+def test_unknown_bank_has_no_data():
+    index = make_index()
+
+    # Общие триграммы "банк" не делают ОТП Банк и МТС Банк Т-Банком
+    assert index.get_value("Кредитный лимит", "ОТП Банк") == NO_DATA
+    assert index.get_value("Стоимость обслуживания", "МТС Банк") == NO_DATA
+
+
+def test_bank_aliases_still_resolve():
+    index = make_index()
+
+    assert index.get_value("Кредитный лимит", "Тинькофф") == "до 1 000 000 ₽"
+    assert index.get_value("Кредитный лимит", "т-банк") == "до 1 000 000 ₽"
+
+
+def test_criterion_typo_resolves_fuzzily():
+    assert make_index().get_value("Кредитный лимт", "ВТБ") == "до 1 500 000 ₽"
+
+
+def test_fuzzy_match_needs_clear_margin():
+    index = NameIndex(["Т-Банк", "Альфа-Банк"], BANK_ALIASES)
+
+    assert index.resolve("ОТП Банк") is None
+    assert index.resolve("МТС Банк") is None
+
+
+def test_comparison_data_for_unknown_bank():
+    data = get_comparison_data_for_criteria(["ОТП Банк"], ["Кредитный лимит", "Стоимость обслуживания (кредитная)"])
+
+    assert data == {
+        "Кредитный лимит": {"ОТП Банк": NO_DATA},
+        "Стоимость обслуживания (кредитная)": {"ОТП Банк": NO_DATA},
+    }
@@ -0,0 +1,31 @@
+"""Тесты разбора значений ячеек таблицы сравнения."""
+
+import math
+
+import pytest
+
+from src.numeric import parse_value
+
+
+@pytest.mark.parametrize("raw", ["бесплатно", "Бесплатно", "Бесплатно при подписке"])
+def test_free_is_zero(raw):
+    parsed = parse_value(raw)
+
+    assert (parsed["min"], parsed["max"], parsed["unit"], parsed["available"]) == (0.0, 0.0, "RUB", 1)
+
+
+@pytest.mark.parametrize("raw", [
+    "без комиссии в банкоматах банков-партнеров; 1% от суммы (мин. 300 ₽)",
+    "Без комиссии при снятии до 20 000 ₽/мес., далее — 1,5% от суммы (мин. 150 ₽)",
+])
+def test_conditional_free_is_ambiguous(raw):
+    parsed = parse_value(raw)
+
+    assert parsed["available"] == -1
+    assert math.isnan(parsed["min"]) and math.isnan(parsed["max"])
+
+
+def test_range_with_unit():
+    parsed = parse_value("От 1 990 до 3 588 RUB")
+
+    assert (parsed["min"], parsed["max"], parsed["unit"]) == (1990.0, 3588.0, "RUB")
@@ -0,0 +1,160 @@
+"""Тесты быстрого пути парсера каталога на сохраненных страницах (без сети и браузера)."""
+
+import os
+
+import pytest
+
+from src import parser
+
+FIXTURES = os.path.join(os.path.dirname(__file__), "fixtures")
+
+
+def load_fixture(name):
+    with open(os.path.join(FIXTURES, name), 'r', encoding='utf-8') as f:
+        return f.read()
+
+
+def test_cards_bank_names_are_canonical():
+    products = parser.parse_catalog_html(load_fixture("catalog_cards.html"), "creditcards")
+
+    assert [(prod['bank'], prod['name']) for prod in products] == [
+        ("Т-Банк", "Платинум"),
+        ("Промсвязьбанк (ПСБ)", "Двойной кешбэк"),
+        ("Альфа-Банк", "100 дней без %"),
+    ]
+    assert all(prod['type'] == "Кредитная карта" for prod in products)
+    # Критериев в серверной разметке нет - нужен popup
+    assert all('details' not in prod for prod in products)
+
+
+def test_next_data_offers_with_details():
+    products = parser.parse_catalog_html(load_fixture("catalog_next_data.html"), "debitcards")
+
+    assert [(prod['bank'], prod['name']) for prod in products] == [
+        ("Т-Банк", "Black"),
+        ("Промсвязьбанк (ПСБ)", "Твой кешбэк"),
+    ]
+    assert products[0]['type'] == "Дебетовая карта"
+    assert products[0]['details'] == {"Кэшбэк": "до 30%", "Обслуживание": "0 ₽"}
+    assert 'details' not in products[1]
+
+
+def test_blocked_page_has_no_products():
+    assert parser.parse_catalog_html(load_fixture("catalog_blocked.html"), "creditcards") == []
+
+
+# Карточки, как их возвращает CATALOG_EXTRACT_SCRIPT на странице браузера
+BROWSER_ITEMS = [
+    {"company": "Почта Банк", "name": "Платинум", "buttonIndex": 0},
+    {"company": "Тинькофф Банк", "name": "Платинум", "buttonIndex": 1},
+    {"company": "ПСБ", "name": "Двойной\n  кешбэк", "buttonIndex": -1},
+    {"company": "Промсвязьбанк", "name": "Двойной кешбэк", "buttonIndex": 2},
+]
+
+
+@pytest.mark.parametrize("bank, name, expected", [
+    ("Т-Банк", "Платинум", 1),
+    ("Промсвязьбанк (ПСБ)", "Двойной кешбэк", 2),
+    # Продукт со следующей страницы каталога: карточки в DOM нет
+    ("Альфа-Банк", "100 дней без %", -1),
+])
+def test_find_offer_button_by_bank_and_name(bank, name, expected):
+    assert parser.find_offer_button(BROWSER_ITEMS, bank, name) == expected
+
+
+def test_catalog_uses_http_when_cards_found(monkeypatch):
+    monkeypatch.setattr(parser, "fetch_catalog_html", lambda url, page=1: load_fixture("catalog_cards.html"))
+
+    def driver_factory():
+        raise AssertionError("браузер не нужен")
+
+    products, driver = parser.parse_catalog(parser.endpoints['creditcards'], "creditcards", 1, driver_factory)
+
+    assert driver is None
+    assert len(products) == 3
+
+
+def test_catalog_falls_back_to_browser_on_blocked_page(monkeypatch):
+    monkeypatch.setattr(parser, "fetch_catalog_html", lambda url, page=1: load_fixture("catalog_blocked.html"))
+    browser_products = [{"bank": "Т-Банк", "name": "Платинум", "type": "Кредитная карта"}]
+    calls = []
+    monkeypatch.setattr(
+        parser, "parse_catalog_selenium",
+        lambda driver, url, product_type, max_pages=2: calls.append(driver) or browser_products
+    )
+    driver = object()
+
+    products, returned_driver = parser.parse_catalog(
+        parser.endpoints['creditcards'], "creditcards", 1, lambda: driver
+    )
+
+    assert calls == [driver]
+    assert returned_driver is driver
+    assert products == browser_products
+
+
+def test_details_worker_finds_offers_in_own_browser(monkeypatch):
+    pages = {
+        parser.endpoints['creditcards']: BROWSER_ITEMS,
+        parser.endpoints['creditcards'] + "?page=2": [
+            {"company": "Альфа Банк", "name": "100 дней без %", "buttonIndex": 0},
+        ],
+    }
+
+    class FakeDriver:
+        url = None
+
+        def execute_script(self, script):
+            return pages[self.url]
+
+        def quit(self):
+            pass
+
+    def open_page(driver, url, product_type, max_pages=2):
+        driver.url = url
+        return []
+
+    monkeypatch.setitem(parser._worker_state, "driver", FakeDriver())
+    monkeypatch.setitem(parser._worker_state, "url", None)
+    monkeypatch.setattr(parser, "parse_catalog_selenium", open_page)
+    monkeypatch.setattr(
+        parser, "parse_product_details_from_popup",
+        lambda driver, button_index: {"Страница": driver.url, "Кнопка": str(button_index)}
+    )
+    shard = [
+        {"bank": "Альфа-Банк", "name": "100 дней без %", "type": "Кредитная карта", "page": 2},
+        {"bank": "Т-Банк", "name": "Платинум", "type": "Кредитная карта", "page": 1},
+        {"bank": "ВТБ", "name": "Возьми", "type": "Кредитная карта", "page": 1},
+    ]
+
+    rows = parser.scrape_details_task("creditcards", shard)
+
+    assert [(row['bank'], row['Страница'], row['Кнопка']) for row in rows] == [
+        ("Т-Банк", parser.endpoints['creditcards'], "1"),
+        ("Альфа-Банк", parser.endpoints['creditcards'] + "?page=2", "0"),
+    ]
+
+
+def test_catalog_worker_parses_browser_page_once(monkeypatch):
+    opened = []
+    monkeypatch.setattr(parser, "parse_catalog_http", lambda url, product_type, max_pages=2: [])
+    monkeypatch.setattr(
+        parser, "parse_catalog_selenium",
+        lambda driver, url, product_type, max_pages=2: opened.append((url, max_pages)) or []
+    )
+    monkeypatch.setitem(parser._worker_state, "driver", object())
+    monkeypatch.setitem(parser._worker_state, "url", None)
+
+    parser.scrape_catalog_task("creditcards", 1)
+    assert opened == [(parser.endpoints['creditcards'], 1)]
+    assert parser._worker_state["url"] == parser.endpoints['creditcards']
+
+    # Страница уже открыта - popup-задачам повторная загрузка не нужна
+    parser._get_worker_page(parser.endpoints['creditcards'], "creditcards")
+    assert len(opened) == 1
+
+    # После пагинации открытая страница неизвестна - следующая задача загрузит нужную
+    parser.scrape_catalog_task("creditcards", 2)
+    assert parser._worker_state["url"] is None
+    parser._get_worker_page(parser.endpoints['creditcards'], "creditcards")
+    assert opened[1:] == [(parser.endpoints['creditcards'], 2), (parser.endpoints['creditcards'], 1)]
@@ -0,0 +1,24 @@
+"""Тесты дискового уровня кэша результатов."""
+
+import os
+import time
+
+from src.result_cache import ResultCache
+
+
+def test_disk_tier_is_bounded(tmp_path):
+    stale = tmp_path / "stale.json"
+    stale.write_text("{}", encoding="utf-8")
+    os.utime(stale, (0, 0))
+    cache = ResultCache(max_size=3, ttl=100, cache_dir=str(tmp_path))
+
+    started_at = time.time() - 50
+    for i in range(6):
+        cache.set(f"k{i}", i)
+        # Разные mtime, чтобы порядок записей был однозначным
+        os.utime(tmp_path / f"k{i}.json", (started_at + i, started_at + i))
+
+    assert sorted(os.listdir(tmp_path)) == ["k3.json", "k4.json", "k5.json"]
+
+    restarted = ResultCache(max_size=3, ttl=100, cache_dir=str(tmp_path))
+    assert [restarted.get(f"k{i}") for i in range(6)] == [None, None, None, 3, 4, 5]
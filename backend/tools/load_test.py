@@ -0,0 +1,141 @@
+"""load_test.py - нагрузочный тест бэкенда по записанной смеси запросов.
+
+Файл смеси - JSONL, по одному запросу в строке:
+    {"endpoint": "/api/params", "body": {"cardType": [...], "banks": [...], "criteria": [...]}}
+    {"endpoint": "/api/improve", "body": {"userQuery": "..."}}
+
+Строка без "endpoint" считается телом /api/params. Для /api/improve без
+analysisId подставляется id из последнего успешного ответа /api/params;
+пока ни один /api/params не завершился, такие запросы не отправляются и
+считаются пропущенными.
+
+Запуск (из директории backend, бэкенд подключен к tools/mock_llm.py):
+    python -m tools.load_test tools/sample_requests.jsonl --base-url http://localhost:8000 \\
+        --concurrency 8 --requests 200
+
+Отчет: пропускная способность, p50/p95/p99 задержки, доля ошибок сервера
+(5xx, таймауты, обрыв соединения), доля отказов (4xx и ответы со
+status "error") и число пропущенных запросов - всего и по каждому эндпоинту.
+"""
+
+import argparse
+import itertools
+import json
+import threading
+import time
+from collections import Counter, defaultdict
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+
+
+def load_request_mix(path):
+    """Читает смесь запросов из JSONL-файла."""
+    mix = []
+    with open(path, 'r', encoding='utf-8') as f:
+        for line in f:
+            line = line.strip()
+            if not line:
+                continue
+            item = json.loads(line)
+            if "endpoint" not in item:
+                item = {"endpoint": "/api/params", "body": item}
+            mix.append(item)
+    return mix
+
+
+def percentile(sorted_values, p):
+    if not sorted_values:
+        return 0.0
+    rank = min(len(sorted_values) - 1, max(0, int(round(p / 100 * (len(sorted_values) - 1)))))
+    return sorted_values[rank]
+
+
+class LoadTest:
+    def __init__(self, base_url, mix, timeout):
+        self.base_url = base_url.rstrip("/")
+        self.mix = mix
+        self.timeout = timeout
+        self.session = requests.Session()
+        self.results = defaultdict(list)  # endpoint -> [(latency, outcome)]
+        self.skipped = Counter()  # endpoint -> запросов не отправлено
+        self.last_analysis_id = None
+        self._lock = threading.Lock()
+
+    def send(self, item):
+        endpoint = item["endpoint"]
+        body = dict(item.get("body", {}))
+        if endpoint == "/api/improve" and "analysisId" not in body and "modelsAnalysisResults" not in body:
+            if self.last_analysis_id is None:
+                # Улучшать еще нечего: такой запрос сервер отклонил бы, это не ошибка сервера
+                with self._lock:
+                    self.skipped[endpoint] += 1
+                return
+            body["analysisId"] = self.last_analysis_id
+
+        started_at = time.monotonic()
+        try:
+            response = self.session.post(f"{self.base_url}{endpoint}", json=body, timeout=self.timeout)
+            if response.status_code >= 500:
+                outcome = "server"
+            elif response.status_code != 200 or response.json().get("status") == "error":
+                outcome = "client"
+            else:
+                outcome = "ok"
+                if endpoint == "/api/params":
+                    analysis_id = response.json().get("data", {}).get("analysisId")
+                    self.last_analysis_id = analysis_id or self.last_analysis_id
+        except (requests.exceptions.RequestException, ValueError):
+            outcome = "server"
+        latency = time.monotonic() - started_at
+
+        with self._lock:
+            self.results[endpoint].append((latency, outcome))
+
+    def run(self, total, concurrency):
+        items = itertools.islice(itertools.cycle(self.mix), total)
+        started_at = time.monotonic()
+        with ThreadPoolExecutor(max_workers=concurrency) as executor:
+            list(executor.map(self.send, items))
+        return time.monotonic() - started_at
+
+    def report(self, elapsed):
+        rows = {endpoint: self.results.get(endpoint, []) for endpoint in [*self.results, *self.skipped]}
+        rows["ВСЕГО"] = [result for results in self.results.values() for result in results]
+        skipped = dict(self.skipped, ВСЕГО=sum(self.skipped.values()))
+
+        print(f"Время теста: {elapsed:.2f} с")
+        print(
+            f"{'Эндпоинт':<16}{'Запросов':>10}{'RPS':>9}{'p50, с':>9}{'p95, с':>9}{'p99, с':>9}"
+            f"{'Ошибки':>9}{'Отказы':>9}{'Пропущено':>11}"
+        )
+        for endpoint, results in rows.items():
+            latencies = sorted(latency for latency, _ in results)
+            outcomes = Counter(outcome for _, outcome in results)
+            sent = len(results) or 1
+            print(
+                f"{endpoint:<16}{len(results):>10}{len(results) / elapsed:>9.2f}"
+                f"{percentile(latencies, 50):>9.2f}{percentile(latencies, 95):>9.2f}"
+                f"{percentile(latencies, 99):>9.2f}{outcomes['server'] / sent:>9.1%}"
+                f"{outcomes['client'] / sent:>9.1%}{skipped.get(endpoint, 0):>11}"
+            )
+        print("Ошибки - 5xx, таймауты и обрывы соединения; отказы - 4xx и ответы со status \"error\"")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Нагрузочный тест бэкенда")
+    parser.add_argument("mix", help="JSONL-файл со смесью запросов")
+    parser.add_argument("--base-url", default="http://localhost:8000")
+    parser.add_argument("--concurrency", type=int, default=4)
+    parser.add_argument("--requests", type=int, default=0, help="Сколько запросов отправить (по умолчанию - весь файл)")
+    parser.add_argument("--timeout", type=float, default=300)
+    args = parser.parse_args()
+
+    mix = load_request_mix(args.mix)
+    test = LoadTest(args.base_url, mix, args.timeout)
+    elapsed = test.run(args.requests or len(mix), args.concurrency)
+    test.report(elapsed)
+
+
+if __name__ == "__main__":
+    main()
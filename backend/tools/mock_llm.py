@@ -0,0 +1,187 @@
+"""mock_llm.py - локальная заглушка LLM-провайдеров для нагрузочного тестирования.
+
+Имитирует API chat/completions OpenRouter и GigaChat (формат ответа подходит
+обоим), позволяя гонять /api/params и /api/improve без расхода квоты.
+
+Поведение настраивается аргументами:
+    - --latency-median / --latency-sigma - логнормальное распределение задержки, сек.;
+    - --model-latency MODEL=SECONDS      - медиана задержки для отдельной модели;
+    - --error-rate                       - доля ответов 500;
+    - --burst-period / --burst-length    - каждые burst-period секунд в течение
+                                           burst-length секунд все ответы - 429;
+    - --token-delay                      - пауза между фрагментами потокового
+                                           ответа (stream: true), сек.
+
+Запуск (из директории backend):
+    python -m tools.mock_llm --port 9000 --latency-median 2 --error-rate 0.05
+
+Подключение бэкенда к заглушке:
+    OPENROUTER_BASE_URL=http://localhost:9000/api/v1
+    GIGACHAT_BASE_URL=http://localhost:9000/api/v1
+    GIGACHAT_ACCESS_TOKEN=mock
+"""
+
+import argparse
+import asyncio
+import json
+import random
+import re
+import time
+import uuid
+
+import uvicorn
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse, Response, StreamingResponse
+
+MOCK_RESPONSE = """## Анализ и выводы
+
+### Преимущества продукта Сбера
+- Бесплатное обслуживание карты и СМС-уведомления по подписке.
+- Развитая программа лояльности с баллами в выбранных категориях.
+
+### Недостатки и риски
+- Высокая комиссия за снятие наличных в других банках.
+- Кредитный лимит ниже, чем у ряда конкурентов.
+
+### Целевая аудитория
+Активные пользователи экосистемы Сбера со средним уровнем дохода.
+
+### Рекомендации
+Снизить комиссию за снятие наличных и расширить кредитный лимит для клиентов с подтвержденным доходом."""
+
+config = {
+    "latency_median": 1.0,
+    "latency_sigma": 0.5,
+    "model_latency": {},
+    "error_rate": 0.0,
+    "burst_period": 0.0,
+    "burst_length": 0.0,
+    "token_delay": 0.05,
+}
+stats = {"requests": 0, "ok": 0, "errors": 0, "rate_limited": 0, "cancelled": 0}
+started_at = time.monotonic()
+
+app = FastAPI()
+
+
+def sample_latency(model):
+    """Случайная задержка ответа для модели (логнормальное распределение)."""
+    median = config["model_latency"].get(model, config["latency_median"])
+    if median <= 0:
+        return 0.0
+    return random.lognormvariate(0, config["latency_sigma"]) * median
+
+
+def in_rate_limit_burst():
+    """Находимся ли сейчас в окне всплеска 429."""
+    if config["burst_period"] <= 0:
+        return False
+    return (time.monotonic() - started_at) % config["burst_period"] < config["burst_length"]
+
+
+def build_completion(model, content):
+    """Ответ в формате, общем для OpenRouter и GigaChat."""
+    return {
+        "id": uuid.uuid4().hex,
+        "object": "chat.completion",
+        "created": int(time.time()),
+        "model": model,
+        "choices": [{
+            "index": 0,
+            "finish_reason": "stop",
+            "message": {"role": "assistant", "content": content},
+        }],
+        "usage": {"prompt_tokens": 0, "completion_tokens": len(content.split()), "total_tokens": len(content.split())},
+    }
+
+
+async def stream_completion(model, content):
+    """Потоковый ответ в формате SSE OpenRouter: по слову в событии, затем [DONE]."""
+    completion_id = uuid.uuid4().hex
+    try:
+        yield ": OPENROUTER PROCESSING\n\n"
+        for word in re.findall(r"\S+\s*", content):
+            await asyncio.sleep(config["token_delay"])
+            chunk = {
+                "id": completion_id,
+                "object": "chat.completion.chunk",
+                "model": model,
+                "choices": [{"index": 0, "delta": {"content": word}, "finish_reason": None}],
+            }
+            yield f"data: {json.dumps(chunk, ensure_ascii=False)}\n\n"
+        yield "data: [DONE]\n\n"
+        stats["ok"] += 1
+    except asyncio.CancelledError:
+        # Клиент закрыл соединение - генерация прекращается
+        stats["cancelled"] += 1
+        raise
+
+
+@app.api_route("/api/v1", methods=["GET", "HEAD"])
+async def root():
+    """Используется при прогреве соединений."""
+    return Response(status_code=200)
+
+
+@app.post("/api/v1/chat/completions")
+async def chat_completions(request: Request):
+    body = await request.json()
+    model = body.get("model") or "GigaChat"
+    stats["requests"] += 1
+
+    await asyncio.sleep(sample_latency(model))
+
+    if in_rate_limit_burst():
+        stats["rate_limited"] += 1
+        return JSONResponse(status_code=429, content={"error": {"message": "Rate limit exceeded"}})
+    if random.random() < config["error_rate"]:
+        stats["errors"] += 1
+        return JSONResponse(status_code=500, content={"error": {"message": "Internal error"}})
+
+    if body.get("stream"):
+        return StreamingResponse(stream_completion(model, MOCK_RESPONSE), media_type="text/event-stream")
+
+    stats["ok"] += 1
+    return build_completion(model, MOCK_RESPONSE)
+
+
+@app.get("/stats")
+async def get_stats():
+    return stats
+
+
+def parse_model_latency(values):
+    result = {}
+    for value in values or []:
+        model, _, seconds = value.rpartition("=")
+        result[model] = float(seconds)
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Заглушка LLM-провайдеров")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=9000)
+    parser.add_argument("--latency-median", type=float, default=config["latency_median"])
+    parser.add_argument("--latency-sigma", type=float, default=config["latency_sigma"])
+    parser.add_argument("--model-latency", action="append", metavar="MODEL=SECONDS")
+    parser.add_argument("--error-rate", type=float, default=config["error_rate"])
+    parser.add_argument("--burst-period", type=float, default=config["burst_period"])
+    parser.add_argument("--burst-length", type=float, default=config["burst_length"])
+    parser.add_argument("--token-delay", type=float, default=config["token_delay"])
+    args = parser.parse_args()
+
+    config.update({
+        "latency_median": args.latency_median,
+        "latency_sigma": args.latency_sigma,
+        "model_latency": parse_model_latency(args.model_latency),
+        "error_rate": args.error_rate,
+        "burst_period": args.burst_period,
+        "burst_length": args.burst_length,
+        "token_delay": args.token_delay,
+    })
+    uvicorn.run(app, host=args.host, port=args.port)
+
+
+if __name__ == "__main__":
+    main()
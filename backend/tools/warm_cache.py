@@ -0,0 +1,205 @@
+"""warm_cache.py - заблаговременный прогрев кэша сравнений.
+
+Первый пользователь, запросивший популярное сравнение, ждет полный анализ
+всеми моделями. Скрипт заранее прогоняет пайплайн /api/params (промпт ->
+анализ моделями -> суммаризация) для списка популярных комбинаций и
+сохраняет результаты в кэш результатов с дисковым уровнем, откуда их
+отдает запущенный бэкенд.
+
+Источники комбинаций:
+    - JSONL-файл, по одной комбинации в строке (формат tools/sample_requests.jsonl,
+      строки других эндпоинтов пропускаются):
+          {"cardType": [...], "banks": [...], "criteria": [...]}
+    - лог бэкенда (--from-log): строки "Типы карт: / Банки: / Критерии:",
+      которые печатает /api/params; берутся самые частые комбинации.
+
+Порядок банков, критериев и типов карт не важен: одинаковые комбинации
+объединяются. Уже закэшированные сравнения пропускаются.
+
+Запуск (из директории backend, с теми же переменными окружения, что у бэкенда):
+    RESULT_CACHE_DIR=/var/cache/hak python -m tools.warm_cache tools/sample_requests.jsonl \\
+        --concurrency 2 --rate 10
+    RESULT_CACHE_DIR=/var/cache/hak python -m tools.warm_cache --from-log backend.log --top 20
+"""
+
+import argparse
+import ast
+import json
+import os
+import threading
+import time
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+
+
+def _canonical(combo):
+    return (
+        tuple(sorted(set(combo["cardType"]))),
+        tuple(sorted(set(combo["banks"]))),
+        tuple(sorted(set(combo["criteria"]))),
+    )
+
+
+def load_combinations(path):
+    """Читает комбинации из JSONL-файла."""
+    combos = []
+    with open(path, 'r', encoding='utf-8') as f:
+        for line in f:
+            line = line.strip()
+            if not line:
+                continue
+            item = json.loads(line)
+            if "endpoint" in item:
+                if item["endpoint"] not in ("/api/params", "/api/params/stream", "/api/jobs"):
+                    continue
+                item = item.get("body", {})
+            if item.get("cardType") and item.get("banks") and item.get("criteria"):
+                combos.append(item)
+    return combos
+
+
+def load_combinations_from_log(path):
+    """Собирает комбинации из лога бэкенда (строки, которые печатает /api/params)."""
+    prefixes = {"Типы карт: ": "cardType", "Банки: ": "banks", "Критерии: ": "criteria"}
+    combos = []
+    current = {}
+    with open(path, 'r', encoding='utf-8', errors='replace') as f:
+        for line in f:
+            line = line.strip()
+            for prefix, field in prefixes.items():
+                if line.startswith(prefix):
+                    try:
+                        current[field] = ast.literal_eval(line[len(prefix):])
+                    except (ValueError, SyntaxError):
+                        current = {}
+                        break
+                    if field == "criteria":
+                        if current.get("cardType") and current.get("banks") and current["criteria"]:
+                            combos.append(current)
+                        current = {}
+                    break
+    return combos
+
+
+def rank_combinations(combos, top=0):
+    """Объединяет одинаковые комбинации и сортирует их по частоте."""
+    counts = Counter(_canonical(combo) for combo in combos)
+    ranked = [
+        {"cardType": list(card_types), "banks": list(banks), "criteria": list(criteria), "count": count}
+        for (card_types, banks, criteria), count in counts.most_common()
+    ]
+    return ranked[:top] if top else ranked
+
+
+class RateBudget:
+    """Не чаще rate запусков в минуту (0 - без ограничения)."""
+
+    def __init__(self, rate):
+        self.interval = 60.0 / rate if rate else 0.0
+        self._next_at = time.monotonic()
+        self._lock = threading.Lock()
+
+    def acquire(self):
+        with self._lock:
+            now = time.monotonic()
+            wait = self._next_at - now
+            self._next_at = max(now, self._next_at) + self.interval
+        if wait > 0:
+            time.sleep(wait)
+
+
+class CacheWarmer:
+    def __init__(self, app_module, concurrency, rate, summary_mode=None):
+        self.app = app_module
+        self.concurrency = concurrency
+        self.budget = RateBudget(rate)
+        self.summary_mode = summary_mode
+        self.stats = Counter()
+        self._lock = threading.Lock()
+
+    def is_cached(self, combo):
+        """Есть ли в кэше и анализ, и итоговый результат комбинации."""
+        card_types, banks, criteria = combo["cardType"], combo["banks"], combo["criteria"]
+        key = self.app.make_cache_key(
+            "analysis", card_types, banks, criteria,
+            self.app.get_analysis_data_digest(banks, card_types, criteria)
+        )
+        models_results = self.app.result_cache.get(key)
+        if models_results is None:
+            return False
+        models_results_list = [str(result) for result in models_results]
+        summary_key = self.app.summary_cache_key(card_types, banks, criteria, models_results_list, self.summary_mode)
+        return self.app.result_cache.get(summary_key) is not None
+
+    def warm(self, combo):
+        label = f"{combo['cardType']} {combo['banks']} {combo['criteria']}"
+        if self.is_cached(combo):
+            self._count("cached")
+            print(f"[в кэше] {label}")
+            return
+
+        self.budget.acquire()
+        started_at = time.monotonic()
+        try:
+            data = self.app.run_coalesced_comparison(
+                combo["cardType"], combo["banks"], combo["criteria"], summary_mode=self.summary_mode
+            )
+        except Exception as e:
+            self._count("error")
+            print(f"[ошибка] {label}: {type(e).__name__}: {e}")
+            return
+
+        elapsed = time.monotonic() - started_at
+        failed = data["modelsStatus"]["failed"] + data["modelsStatus"]["late"]
+        if failed:
+            # Неполный анализ не кэшируется (см. iter_cached_models_results)
+            self._count("incomplete")
+            print(f"[не сохранено, модели без ответа: {', '.join(failed)}] {label} ({elapsed:.1f} с)")
+        else:
+            self._count("warmed")
+            print(f"[прогрето] {label} ({elapsed:.1f} с)")
+
+    def run(self, combos):
+        with ThreadPoolExecutor(max_workers=self.concurrency) as executor:
+            list(executor.map(self.warm, combos))
+
+    def _count(self, outcome):
+        with self._lock:
+            self.stats[outcome] += 1
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Прогрев кэша популярных сравнений")
+    parser.add_argument("combinations", nargs="?", help="JSONL-файл с комбинациями")
+    parser.add_argument("--from-log", help="Лог бэкенда, из которого берутся популярные комбинации")
+    parser.add_argument("--top", type=int, default=0, help="Сколько самых частых комбинаций прогреть (0 - все)")
+    parser.add_argument("--concurrency", type=int, default=2, help="Сколько сравнений выполнять одновременно")
+    parser.add_argument("--rate", type=float, default=0, help="Макс. число запусков пайплайна в минуту (0 - без ограничения)")
+    parser.add_argument("--summary-mode", help="Режим суммаризации: remote, local или auto")
+    args = parser.parse_args()
+
+    combos = []
+    if args.combinations:
+        combos += load_combinations(args.combinations)
+    if args.from_log:
+        combos += load_combinations_from_log(args.from_log)
+    if not combos:
+        parser.error("не найдено ни одной комбинации: укажите файл комбинаций или --from-log")
+
+    if not os.getenv("RESULT_CACHE_DIR"):
+        print("Внимание: RESULT_CACHE_DIR не задан - результаты останутся только в памяти этого процесса")
+
+    # Импорт бэкенда после разбора аргументов: ключи кэша и пайплайн те же, что у /api/params
+    import main as app_module
+
+    ranked = rank_combinations(combos, args.top)
+    print(f"Комбинаций к прогреву: {len(ranked)}")
+    warmer = CacheWarmer(app_module, args.concurrency, args.rate, args.summary_mode)
+    started_at = time.monotonic()
+    warmer.run(ranked)
+    print(f"Готово за {time.monotonic() - started_at:.1f} с: " +
+          ", ".join(f"{outcome} {count}" for outcome, count in sorted(warmer.stats.items())))
+
+
+if __name__ == "__main__":
+    main()
@@ -26,6 +26,16 @@ ChartJS.register(
 );
 
 // Типы для шаблонов
+// Разобранное бэкендом значение ячейки (comparisonNumeric)
+interface NumericValue {
+  min: number | null;
+  max: number | null;
+  value: number | null;
+  unit: string;
+  period: string;
+  available: number;
+}
+
 interface Template {
   id: string;
   name: string;
@@ -57,7 +67,8 @@ function App() {
   const [isLoading, setIsLoading] = useState(false);
   const [summarizedResult, setSummarizedResult] = useState<string>("");
   const [comparisonData, setComparisonData] = useState<Record<string, Record<string, string | boolean | number>>>({});
-  const [modelsAnalysisResults, setModelsAnalysisResults] = useState<string[]>([]);
+  const [comparisonNumeric, setComparisonNumeric] = useState<Record<string, Record<string, NumericValue | null>>>({});
+  const [analysisId, setAnalysisId] = useState<string>("");
   const [userQuery, setUserQuery] = useState<string>("");
   const [isImproving, setIsImproving] = useState(false);
 
@@ -130,6 +141,16 @@ function App() {
     return maxValue;
   };
 
+  // Значение для графика: разобранное бэкендом, а если его нет - извлеченное из текста
+  const getChartValue = (criterion: string, bank: string): number | null => {
+    const numeric = comparisonNumeric[criterion]?.[bank];
+    if (numeric) {
+      // Разбор сервера: null - значение неоднозначно (например, бесплатно только при условии), столбец не рисуем
+      return numeric.value;
+    }
+    return extractNumericValue(comparisonData[criterion]?.[bank]);
+  };
+
   const toggleSection = (section: keyof typeof openSections) => {
     setOpenSections((prev) => ({ ...prev, [section]: !prev[section] }));
   };
@@ -307,7 +328,7 @@ function App() {
           labels: selected.banks,
           datasets: selected.criteria.map((criterion) => ({
             label: criterion,
-            data: selected.banks.map(() => Math.round(Math.random() * 900 + 100))
+            data: selected.banks.map((bank) => getChartValue(criterion, bank))
           }))
         }
       }
@@ -410,11 +431,30 @@ function App() {
     setIsLoading(true);
     setSummarizedResult(""); // Сбрасываем предыдущий результат
     setComparisonData({}); // Сбрасываем данные для графика
-    setModelsAnalysisResults([]); // Сбрасываем результаты анализа моделей
+    setComparisonNumeric({});
+    setAnalysisId(""); // Сбрасываем сессию анализа моделей
     setUserQuery(""); // Сбрасываем запрос пользователя
 
+    // Данные для графика и таблицы запрашиваем отдельно: они не ждут моделей
+    // и кэшируются браузером (ETag)
+    const comparisonParams = new URLSearchParams();
+    selected.cardType.forEach((cardType) => comparisonParams.append("cardType", cardType));
+    selected.banks.forEach((bank) => comparisonParams.append("banks", bank));
+    selected.criteria.forEach((criterion) => comparisonParams.append("criteria", criterion));
+    fetch(`/api/comparison?${comparisonParams.toString()}`)
+      .then((response) => (response.ok ? response.json() : null))
+      .then((data) => {
+        if (data?.data?.comparisonData) {
+          setComparisonData(data.data.comparisonData);
+        }
+        if (data?.data?.comparisonNumeric) {
+          setComparisonNumeric(data.data.comparisonNumeric);
+        }
+      })
+      .catch((error) => console.error("Ошибка загрузки данных сравнения:", error));
+
     try {
-      const response = await fetch("http://localhost:8000/api/params", {
+      const response = await fetch("/api/params", {
         method: "POST",
         headers: {
           "Content-Type": "application/json",
@@ -439,11 +479,14 @@ function App() {
         console.log("Получены данные для сравнения:", data.data.comparisonData);
         setComparisonData(data.data.comparisonData);
       }
+      if (data.data?.comparisonNumeric) {
+        setComparisonNumeric(data.data.comparisonNumeric);
+      }
 
-      // Сохраняем результаты анализа моделей для улучшения
-      if (data.data?.modelsAnalysisResults) {
-        console.log("Получены результаты анализа моделей:", data.data.modelsAnalysisResults.length);
-        setModelsAnalysisResults(data.data.modelsAnalysisResults);
+      // Сохраняем id сессии анализа моделей для улучшения (сами результаты хранятся на сервере)
+      if (data.data?.analysisId) {
+        console.log("Получен id сессии анализа:", data.data.analysisId);
+        setAnalysisId(data.data.analysisId);
       }
 
       // Сохраняем результат анализа - проверяем несколько возможных путей
@@ -850,32 +893,61 @@ function App() {
                   <form
                     onSubmit={async (e) => {
                       e.preventDefault();
-                      if (!userQuery.trim() || modelsAnalysisResults.length === 0) {
+                      if (!userQuery.trim() || !analysisId) {
                         return;
                       }
 
                       setIsImproving(true);
                       try {
-                        const response = await fetch("http://localhost:8000/api/improve", {
+                        const response = await fetch("/api/improve/stream", {
                           method: "POST",
                           headers: {
                             "Content-Type": "application/json",
                           },
                           body: JSON.stringify({
                             userQuery: userQuery.trim(),
-                            modelsAnalysisResults: modelsAnalysisResults,
+                            analysisId: analysisId,
                           }),
                         });
 
-                        if (!response.ok) {
+                        if (!response.ok || !response.body) {
                           throw new Error("Ошибка при отправке запроса");
                         }
 
-                        const data = await response.json();
-                        console.log("Ответ от сервера (улучшение):", data);
+                        // Читаем ответ по мере генерации (Server-Sent Events)
+                        const reader = response.body.getReader();
+                        const decoder = new TextDecoder();
+                        let buffer = "";
+                        let improvedText = "";
+                        let succeeded = false;
+
+                        while (true) {
+                          const { done, value } = await reader.read();
+                          if (done) break;
+                          buffer += decoder.decode(value, { stream: true });
+
+                          const events = buffer.split("\n\n");
+                          buffer = events.pop() || "";
+                          for (const rawEvent of events) {
+                            const eventName = rawEvent.match(/^event: (.+)$/m)?.[1];
+                            const eventData = rawEvent.match(/^data: (.+)$/m)?.[1];
+                            if (!eventName || !eventData) continue;
+                            const data = JSON.parse(eventData);
+
+                            if (eventName === "improveDelta") {
+                              improvedText += data.text;
+                              setSummarizedResult(improvedText);
+                            } else if (eventName === "improvedResult") {
+                              setSummarizedResult(data.improvedResult);
+                            } else if (eventName === "done") {
+                              succeeded = true;
+                            } else if (eventName === "error") {
+                              console.error("Ошибка от сервера (улучшение):", data);
+                            }
+                          }
+                        }
 
-                        if (data.status === "success" && data.data?.improvedResult) {
-                          setSummarizedResult(data.data.improvedResult);
+                        if (succeeded) {
                           setUserQuery(""); // Очищаем поле ввода
                         } else {
                           alert("Не удалось улучшить анализ. Попробуйте еще раз.");
@@ -894,12 +966,12 @@ function App() {
                       placeholder="Напишите ваш вопрос..."
                       value={userQuery}
                       onChange={(e) => setUserQuery(e.target.value)}
-                      disabled={isImproving || modelsAnalysisResults.length === 0}
+                      disabled={isImproving || !analysisId}
                       className="flex-1 px-5 py-4 rounded-xl border border-gray-300 focus:outline-none focus:ring-2 focus:ring-blue-500 disabled:bg-gray-100 disabled:cursor-not-allowed"
                     />
                     <button
                       type="submit"
-                      disabled={!userQuery.trim() || isImproving || modelsAnalysisResults.length === 0}
+                      disabled={!userQuery.trim() || isImproving || !analysisId}
                       className="px-6 py-4 bg-blue-600 text-white rounded-xl hover:bg-blue-700 disabled:bg-gray-400 disabled:cursor-not-allowed transition-colors font-semibold"
                     >
                       {isImproving ? "Обработка..." : "Отправить"}
@@ -1015,7 +1087,8 @@ function App() {
                                     const criterion = selected.criteria[context.datasetIndex];
                                     const bank = selected.banks[context.dataIndex];
                                     const value = context.raw;
-                                    return `${criterion}: ${value} (${bank})`;
+                                    const unit = comparisonNumeric[criterion]?.[bank]?.unit;
+                                    return `${criterion}: ${value}${unit ? ` ${unit}` : ''} (${bank})`;
                                   },
                                 },
                               },
@@ -1055,10 +1128,7 @@ function App() {
                             labels: selected.banks,
                             datasets: selected.criteria.map((criterion, index) => ({
                               label: criterion,
-                              data: selected.banks.map((bank) => {
-                                const value = comparisonData[criterion]?.[bank];
-                                return extractNumericValue(value);
-                              }),
+                              data: selected.banks.map((bank) => getChartValue(criterion, bank)),
                               backgroundColor: [
                                 'rgba(59, 130, 246, 0.8)',
                                 'rgba(34, 197, 94, 0.8)',